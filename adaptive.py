@@ -0,0 +1,95 @@
+"""
+自适应轮询 - 按到最近武装阈值的距离和近期已实现波动率决定下一次检查的时间
+价格近似布朗运动：t 秒内的典型位移约为 sigma * sqrt(t)。要在价格有 z 个标准差的
+可能走到阈值之前再检查一次，下次检查的间隔取 (相对距离 / (z * sigma))^2，并限制在 [floor, ceiling]。
+离所有阈值都很远时少发请求，贴近阈值时加密检查。
+"""
+import math
+import time
+import logging
+from typing import Callable, Dict, Optional, Tuple
+
+from btc_monitor import MonitorApp, strategy_symbol
+from engine import MonitorJob
+
+
+class RealizedVolatility:
+    """
+    每个交易对的已实现波动率：对数收益的平方按时间归一化（方差率，1/秒），再做 EWMA。
+    halflife 为以秒计的半衰期，采样间隔不均匀时也能正确加权。
+    """
+    def __init__(self, halflife: float = 600.0):
+        self.halflife = halflife
+        self._last: Dict[str, Tuple[float, float]] = {}      # symbol -> (ts, price)
+        self._variance: Dict[str, float] = {}                # symbol -> 方差率
+
+    def update(self, symbol: str, price: float, ts: float) -> None:
+        if price <= 0:
+            return
+        last = self._last.get(symbol)
+        self._last[symbol] = (ts, price)
+        if last is None or ts <= last[0]:
+            return
+        dt = ts - last[0]
+        rate = math.log(price / last[1]) ** 2 / dt
+        previous = self._variance.get(symbol)
+        if previous is None:
+            self._variance[symbol] = rate
+        else:
+            weight = 1.0 - 0.5 ** (dt / self.halflife)
+            self._variance[symbol] = previous + weight * (rate - previous)
+
+    def sigma(self, symbol: str) -> Optional[float]:
+        """每 sqrt(秒) 的对数收益标准差；样本不足时返回 None"""
+        variance = self._variance.get(symbol)
+        return math.sqrt(variance) if variance is not None else None
+
+
+class AdaptivePollingJob(MonitorJob):
+    """
+    MonitorJob 的自适应版本：interval 是没有波动率数据时使用的基础间隔，
+    实际间隔在 [min_interval, max_interval] 之间浮动。
+    策略实现 armed_distance() 时参与计算；不支持的策略所在交易对最多按基础间隔检查。
+    """
+    def __init__(self, app: MonitorApp, interval: float, min_interval: float = 5.0,
+                 max_interval: Optional[float] = None, z: float = 3.0, halflife: float = 600.0,
+                 clock: Callable[[], float] = time.time, **kwargs):
+        super().__init__(app, interval, **kwargs)
+        max_interval = max_interval if max_interval is not None else max(interval, min_interval)
+        if not 0 < min_interval <= max_interval:
+            raise ValueError("intervals must satisfy 0 < min_interval <= max_interval")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.z = z
+        self.clock = clock
+        self.volatility = RealizedVolatility(halflife)
+        self.last_delay = interval
+
+    def next_delay(self, snapshot: Dict[str, float]) -> float:
+        if not snapshot:
+            # 取价失败：按基础间隔重试，不在交易所故障时加密请求
+            delay = self.interval
+        else:
+            now = self.clock()
+            for symbol, price in snapshot.items():
+                self.volatility.update(symbol, price, now)
+            delay = min((self.symbol_delay(symbol, price) for symbol, price in snapshot.items() if price > 0),
+                        default=self.interval)
+        self.last_delay = min(self.max_interval, max(self.min_interval, delay))
+        logging.debug(f"[{self.name}] Next check in {self.last_delay:.1f}s")
+        return self.last_delay
+
+    def symbol_delay(self, symbol: str, price: float) -> float:
+        distance = math.inf
+        for strategy in self.app.strategies:
+            if strategy_symbol(strategy) != symbol:
+                continue
+            if not hasattr(strategy, 'armed_distance'):
+                return self.interval
+            distance = min(distance, strategy.armed_distance(price))
+        if math.isinf(distance):
+            return self.max_interval
+        sigma = self.volatility.sigma(symbol)
+        if not sigma:
+            return min(self.interval, self.max_interval)
+        return (distance / price / (self.z * sigma)) ** 2
@@ -0,0 +1,289 @@
+"""
+提醒状态持久化 - 预写日志（WAL）+ 定期快照，崩溃重启后不重复提醒、也不丢失武装状态
+目标价规则的 already_alerted 恒等于"最后一次评估的价格是否处于触发区"，
+所以只需持久化每个交易对最后一次被评估的价格，而不必逐条记录规则状态：
+- WAL：每轮评估后追加 (序号, 交易对, 价格) 定长记录，带 CRC，价格未变化的交易对不写；
+  本轮有提醒触发的交易对暂缓写入，直到这些提醒投递完成（delivered），
+  仍在分发队列合并窗口 / 限速中的提醒在崩溃重启后会重新触发，而不会被当作已提醒丢掉
+- fsync 由后台线程按 fsync_interval 成组提交，评估路径上只有一次缓冲写入
+- 快照：每 snapshot_every 条记录把最新价格和规则表写成 .npz，然后清空 WAL
+- 恢复：读快照 + 重放 WAL 尾部得到各交易对的最新价格，再用 NumPy 向量化地
+  为快照里已有的规则重建状态；新加入的规则保持未触发，首次检查时照常提醒
+fsync 之间崩溃最多丢失 fsync_interval 秒内的记录，这段时间里的穿越在重启后可能再提醒一次。
+"""
+import os
+import zlib
+import struct
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+MAGIC = b"BTCMWAL1"
+HEADER = struct.Struct("<8sQ")          # magic + 保留字段
+PAYLOAD = struct.Struct("<Q16sd")       # 序号, 交易对 (UTF-8, 补零), 价格
+SYMBOL_BYTES = 16
+CRC = struct.Struct("<I")
+RECORD_SIZE = PAYLOAD.size + CRC.size
+WAL_FILE = "alert_state.wal"
+SNAPSHOT_FILE = "alert_state.snap.npz"
+# 规则键：价格的 64 位表示与 (交易对, 方向) 的散列异或，在排序后的键数组上二分判断成员
+_KEY_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def symbol_codes(symbols: Sequence[str]) -> np.ndarray:
+    codes = {s: zlib.crc32(s.encode()) for s in set(symbols)}
+    return np.fromiter((codes[s] for s in symbols), dtype=np.uint64, count=len(symbols))
+
+
+def rule_keys(codes: np.ndarray, prices: np.ndarray, greater: np.ndarray) -> np.ndarray:
+    tags = (codes << np.uint64(1)) | greater.astype(np.uint64)
+    return np.ascontiguousarray(prices, dtype=np.float64).view(np.uint64) ^ (tags * _KEY_MIX)
+
+
+def _groups(strategies: Iterable):
+    """
+    生成 (交易对, 目标价数组, greater 掩码, 规则列表)；只有目标价规则的状态可以由价格推导。
+    ThresholdRuleBook 直接用它已排序的目标价列表，单独的规则按交易对归并后一次性取值。
+    按属性识别规则而不是 isinstance：python btc_monitor.py 启动时模块会以 __main__ 和 btc_monitor
+    各加载一次，两份 TargetPriceStrategy 不是同一个类。
+    """
+    loose: Dict[str, list] = {}
+    for strategy in strategies:
+        if hasattr(strategy, 'sides'):
+            for greater, targets, rules in strategy.sides():
+                yield strategy.symbol, np.array(targets, dtype=np.float64), np.full(len(rules), greater), rules
+        elif hasattr(strategy, 'target_price') and hasattr(strategy, 'already_alerted'):
+            loose.setdefault(strategy.symbol, []).append(strategy)
+    for symbol, rules in loose.items():
+        count = len(rules)
+        yield (symbol, np.fromiter((r.target_price for r in rules), dtype=np.float64, count=count),
+               np.fromiter((r.direction == "greater" for r in rules), dtype=bool, count=count), rules)
+
+
+class AlertStateStore:
+    """
+    rules 为与 btc_monitor.normalize_config 相同格式的规则字典（symbol / price / direction），
+    快照中的规则表由它生成；交易对的 UTF-8 编码超过 16 字节时构造即抛出 ValueError。
+    用法：restore(strategies) 或 restore_states(rules)，然后每轮评估后 record(snapshot, alerts)，
+    每条提醒投递完成后 delivered(alert)，退出时 close()。
+    """
+    def __init__(self, directory: str, rules: Sequence[dict], fsync_interval: float = 1.0,
+                 snapshot_every: int = 100000):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.wal_path = os.path.join(directory, WAL_FILE)
+        self.snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        self.rule_symbols = [rule["symbol"] for rule in rules]
+        # 加载规则时校验并编码交易对名，评估路径上只查表；不在规则里的交易对不需要持久化
+        self._names: Dict[str, bytes] = {}
+        for symbol in self.rule_symbols:
+            encoded = symbol.encode('utf-8')
+            if len(encoded) > SYMBOL_BYTES:
+                raise ValueError(f"symbol too long for the alert state log ({SYMBOL_BYTES} bytes max): {symbol}")
+            self._names[symbol] = encoded
+        self.rule_prices = np.array([rule["price"] for rule in rules], dtype=np.float64)
+        self.rule_greater = np.array([rule["direction"] == "greater" for rule in rules], dtype=bool)
+
+        self._lock = threading.Lock()
+        self.last_prices: Dict[str, float] = {}
+        # 上次运行时的规则表：只有其中的规则才按价格恢复状态，新规则首次检查照常提醒
+        self.previous_keys = np.empty(0, dtype=np.uint64)
+        self._seq = 0
+        self._records = 0
+        self._dirty = False
+        # 交易对 -> 尚未投递完成的提醒数；有未完成提醒时该交易对最新评估的价格暂存在 _held
+        self._pending: Dict[str, int] = {}
+        self._held: Dict[str, float] = {}
+        self._load()
+        self._wal = open(self.wal_path, 'ab')
+        # 启动时立即压缩：把重放结果和当前规则表写成快照，WAL 从空开始
+        self._checkpoint()
+        self._stop = threading.Event()
+        self._syncer = threading.Thread(target=self._sync_loop, name="alert-state-fsync", daemon=True)
+        self._syncer.start()
+
+    # ---------- 恢复 ----------
+
+    def _load(self) -> None:
+        snapshot_seq = 0
+        if os.path.exists(self.snapshot_path):
+            try:
+                with np.load(self.snapshot_path, allow_pickle=False) as data:
+                    snapshot_seq = int(data["seq"])
+                    self.last_prices = dict(zip(data["symbols"].tolist(), data["prices"].tolist()))
+                    self.previous_keys = np.sort(data["rule_keys"])
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning(f"Ignoring unreadable alert state snapshot {self.snapshot_path}: {e}")
+                self.last_prices, self.previous_keys = {}, np.empty(0, dtype=np.uint64)
+        self._seq = snapshot_seq
+        if not os.path.exists(self.wal_path) or os.path.getsize(self.wal_path) == 0:
+            with open(self.wal_path, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, 0))
+            return
+        with open(self.wal_path, 'rb') as f:
+            data = f.read()
+        if len(data) < HEADER.size or HEADER.unpack_from(data)[0] != MAGIC:
+            raise ValueError(f"{self.wal_path} is not an alert state log")
+        good = HEADER.size
+        for offset in range(HEADER.size, len(data) - RECORD_SIZE + 1, RECORD_SIZE):
+            payload = data[offset:offset + PAYLOAD.size]
+            if CRC.unpack_from(data, offset + PAYLOAD.size)[0] != zlib.crc32(payload):
+                break
+            seq, symbol, price = PAYLOAD.unpack(payload)
+            good = offset + RECORD_SIZE
+            # 快照之后才生效：checkpoint 在替换快照与清空 WAL 之间崩溃时，旧记录不能覆盖新快照
+            if seq > snapshot_seq:
+                self.last_prices[symbol.rstrip(b'\0').decode('utf-8')] = price
+                self._seq = max(self._seq, seq)
+                self._records += 1
+        if good < len(data):
+            logging.warning(f"Truncating {len(data) - good} bytes of torn records in {self.wal_path}")
+            with open(self.wal_path, 'r+b') as f:
+                f.truncate(good)
+
+    def restore_states(self, rules: Optional[Sequence[dict]] = None) -> np.ndarray:
+        """
+        每条规则的 already_alerted（与 rules 顺序一致，默认为构造时的规则）：
+        快照中已有且其交易对有记录价格的规则按该价格是否处于触发区恢复，其余为 False
+        """
+        if rules is None:
+            symbols, prices, greater = self.rule_symbols, self.rule_prices, self.rule_greater
+        else:
+            symbols = [rule["symbol"] for rule in rules]
+            prices = np.array([rule["price"] for rule in rules], dtype=np.float64)
+            greater = np.array([rule["direction"] == "greater" for rule in rules], dtype=bool)
+        index = {s: i for i, s in enumerate(dict.fromkeys(symbols))}
+        table = np.array([self.last_prices.get(s, 0.0) for s in index], dtype=np.float64)
+        last = table[np.fromiter((index[s] for s in symbols), dtype=np.intp, count=len(symbols))]
+        return self._states(symbol_codes(symbols), prices, greater, last)
+
+    def _states(self, codes: np.ndarray, prices: np.ndarray, greater: np.ndarray, last) -> np.ndarray:
+        keys = rule_keys(codes, prices, greater)
+        pos = np.searchsorted(self.previous_keys, keys)
+        known = self.previous_keys[np.minimum(pos, len(self.previous_keys) - 1)] == keys \
+            if len(self.previous_keys) else np.zeros(len(keys), dtype=bool)
+        in_zone = np.where(greater, last >= prices, last <= prices)
+        return known & (last > 0) & in_zone
+
+    def restore(self, strategies: Iterable) -> int:
+        """把恢复的状态写回策略对象（按交易对整组向量化计算），返回恢复为"已提醒"的规则数"""
+        restored = 0
+        for symbol, prices, greater, rules in _groups(strategies):
+            last = self.last_prices.get(symbol, 0.0)
+            if last <= 0 or not rules:
+                continue
+            codes = np.full(len(rules), zlib.crc32(symbol.encode()), dtype=np.uint64)
+            states = self._states(codes, prices, greater, last)
+            for i in np.flatnonzero(states).tolist():
+                rules[i].already_alerted = True
+            restored += int(states.sum())
+        return restored
+
+    # ---------- 写入 ----------
+
+    def record(self, snapshot: Dict[str, float], alerts: Iterable = ()) -> None:
+        """
+        记录本轮评估过的价格（只写规则中有效且有变化的交易对）；不 fsync，由后台线程成组提交。
+        alerts 为本轮触发的提醒：它们的交易对要等 delivered() 确认全部投递后才写入最新价格。
+        """
+        with self._lock:
+            for alert in alerts:
+                self._pending[alert.symbol] = self._pending.get(alert.symbol, 0) + 1
+            for symbol, price in snapshot.items():
+                if price <= 0 or symbol not in self._names:
+                    continue
+                if self._pending.get(symbol):
+                    self._held[symbol] = price
+                else:
+                    self._append(symbol, price)
+            if self._records >= self.snapshot_every:
+                self._checkpoint()
+
+    def delivered(self, alert) -> None:
+        """
+        一条提醒投递完成（或最终放弃，如被去重 / 队列已满丢弃）；
+        该交易对没有其他未完成的提醒时写入暂存的最新价格
+        """
+        with self._lock:
+            left = self._pending.get(alert.symbol, 0) - 1
+            if left > 0:
+                self._pending[alert.symbol] = left
+                return
+            self._pending.pop(alert.symbol, None)
+            price = self._held.pop(alert.symbol, None)
+            if price is not None and self._wal is not None:
+                self._append(alert.symbol, price)
+
+    def _append(self, symbol: str, price: float) -> None:
+        if self.last_prices.get(symbol) == price:
+            return
+        self._seq += 1
+        payload = PAYLOAD.pack(self._seq, self._names[symbol], price)
+        self._wal.write(payload + CRC.pack(zlib.crc32(payload)))
+        self.last_prices[symbol] = price
+        self._records += 1
+        self._dirty = True
+
+    def _sync_loop(self) -> None:
+        while not self._stop.wait(self.fsync_interval):
+            try:
+                self.sync()
+            except OSError as e:
+                logging.error(f"Failed to fsync alert state log {self.wal_path}: {e}")
+
+    def sync(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            self._wal.flush()
+            self._dirty = False
+            # 复制一份描述符：fsync 在锁外执行时 checkpoint 可能已关闭并替换 WAL，
+            # 复制的描述符仍指向同一个打开的文件，不会变成 EBADF 或落到被复用的 fd 上
+            fd = os.dup(self._wal.fileno())
+        # fsync 在锁外执行，不阻塞评估线程继续追加
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def checkpoint(self) -> None:
+        with self._lock:
+            self._checkpoint()
+
+    def _checkpoint(self) -> None:
+        """写快照（临时文件 + fsync + 原子替换），然后用只有文件头的新 WAL 替换旧 WAL"""
+        keys = rule_keys(symbol_codes(self.rule_symbols), self.rule_prices, self.rule_greater)
+        tmp = self.snapshot_path + ".tmp.npz"
+        with open(tmp, 'wb') as f:
+            np.savez(f, seq=np.int64(self._seq),
+                     symbols=np.array(list(self.last_prices), dtype=str),
+                     prices=np.array(list(self.last_prices.values()), dtype=np.float64),
+                     rule_keys=keys)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+
+        self._wal.close()
+        tmp = self.wal_path + ".tmp"
+        with open(tmp, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, 0))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.wal_path)
+        self._wal = open(self.wal_path, 'ab')
+        self._records = 0
+        self._dirty = False
+
+    def close(self) -> None:
+        """停止后台线程，写最终快照（下次启动无需重放）"""
+        self._stop.set()
+        self._syncer.join()
+        with self._lock:
+            self._checkpoint()
+            self._wal.close()
+            # 之后到达的投递确认不再写入；未投递提醒的交易对保持旧价格，重启后会重新提醒
+            self._wal = None
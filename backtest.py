@@ -0,0 +1,305 @@
+"""
+回放 / 回测 - 用历史行情检验提醒策略"本应在何时触发"
+数据源：逐笔 CSV（timestamp,price 或 timestamp,symbol,price）、币安 K 线 CSV、
+price_history 写出的 .ticks 二进制文件。策略仍走 AlertStrategy 协议，通知发给 CaptureNotifier，
+时间由模拟时钟给出。TargetPriceStrategy / ThresholdRuleBook 走 NumPy 向量化路径，
+其他策略逐 tick 调用 should_alert。
+用法: python backtest.py data.csv --target 65000 --direction greater
+"""
+import os
+import csv
+import sys
+import time
+import logging
+import argparse
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from btc_monitor import (DEFAULT_SYMBOL, AlertStrategy, CaptureNotifier, Notifier,
+                         TargetPriceStrategy, build_alert, strategy_symbol)
+
+# symbol -> (秒级时间戳数组, 价格数组)
+Series = Dict[str, Tuple[np.ndarray, np.ndarray]]
+
+
+class SimulatedClock:
+    """回放用的时钟，由回放器在投递每条通知前设置到对应 tick 的时间"""
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def set(self, ts: float) -> None:
+        self.now = ts
+
+
+class ReplayAlert(NamedTuple):
+    ts: float
+    symbol: str
+    price: float
+    title: str
+    message: str
+
+
+# ==========================================
+# 数据加载 (Loaders)
+# ==========================================
+
+def _to_seconds(ts: np.ndarray) -> np.ndarray:
+    ts = ts.astype(np.float64)
+    # 币安时间戳为毫秒（甚至微秒），按量级自动换算
+    if len(ts) and np.median(ts) > 1e14:
+        return ts / 1e6
+    if len(ts) and np.median(ts) > 1e11:
+        return ts / 1e3
+    return ts
+
+
+def _has_header(path: str) -> bool:
+    with open(path, newline='') as f:
+        first = f.readline().split(',')
+    try:
+        float(first[0])
+        return False
+    except (ValueError, IndexError):
+        return True
+
+
+def load_csv(path: str, symbol: str = DEFAULT_SYMBOL, kline_path: bool = True) -> Series:
+    """
+    自动识别三种 CSV：
+    - timestamp,price                 逐笔，单交易对（symbol 参数指定）
+    - timestamp,symbol,price          逐笔，多交易对
+    - 币安 K 线（>= 6 列：open_time,open,high,low,close,volume,...）
+      kline_path=True 时每根 K 线展开为 open -> 先到的极值 -> 后到的极值 -> close 四个 tick，
+      以便捕捉 K 线内部的穿越；否则只用 close
+    """
+    skip = 1 if _has_header(path) else 0
+    with open(path, newline='') as f:
+        for _ in range(skip):
+            f.readline()
+        sample = f.readline().strip().split(',')
+    if len(sample) < 2:
+        raise ValueError(f"{path}: expected at least 2 columns")
+
+    if len(sample) == 3 and not _is_number(sample[1]):
+        return _load_symbol_csv(path, skip)
+
+    data = np.loadtxt(path, delimiter=',', skiprows=skip, ndmin=2,
+                      usecols=range(min(len(sample), 5)), dtype=np.float64)
+    if data.shape[1] < 5:
+        return {symbol: (_to_seconds(data[:, 0]), data[:, 1].copy())}
+    return {symbol: _expand_klines(data, kline_path)}
+
+
+def _is_number(value: str) -> bool:
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+
+def _load_symbol_csv(path: str, skip: int) -> Series:
+    columns: Dict[str, Tuple[List[float], List[float]]] = {}
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        for _ in range(skip):
+            next(reader)
+        for row in reader:
+            if len(row) < 3:
+                continue
+            ts_list, price_list = columns.setdefault(row[1], ([], []))
+            ts_list.append(float(row[0]))
+            price_list.append(float(row[2]))
+    return {sym: (_to_seconds(np.asarray(ts)), np.asarray(prices, dtype=np.float64))
+            for sym, (ts, prices) in columns.items()}
+
+
+def _expand_klines(data: np.ndarray, kline_path: bool) -> Tuple[np.ndarray, np.ndarray]:
+    open_time = _to_seconds(data[:, 0])
+    o, h, l, c = data[:, 1], data[:, 2], data[:, 3], data[:, 4]
+    if not kline_path:
+        return open_time, c.copy()
+    # 阳线视为先探低再冲高，阴线反之
+    up = c >= o
+    first = np.where(up, l, h)
+    second = np.where(up, h, l)
+    step = np.diff(open_time, append=open_time[-1] + (open_time[-1] - open_time[-2] if len(open_time) > 1 else 60))
+    ts = np.stack([open_time, open_time + step * 0.25, open_time + step * 0.5, open_time + step * 0.75], axis=1)
+    prices = np.stack([o, first, second, c], axis=1)
+    return ts.ravel(), prices.ravel()
+
+
+def load_ticks_file(path: str, symbol: Optional[str] = None) -> Series:
+    """只读映射 price_history 的 .ticks 文件；symbol 默认取文件名"""
+    from price_history import FILE_SUFFIX, read_ticks
+    ticks = read_ticks(path)
+    symbol = symbol or os.path.basename(path)[:-len(FILE_SUFFIX)]
+    return {symbol: (ticks['ts'] / 1000.0, ticks['price'])}
+
+
+def load_series(path: str, symbol: Optional[str] = None, kline_path: bool = True) -> Series:
+    """symbol：单交易对 CSV 的交易对（默认 BTCUSDT）；.ticks 文件默认取文件名"""
+    if path.endswith('.ticks'):
+        return load_ticks_file(path, symbol)
+    return load_csv(path, symbol=symbol or DEFAULT_SYMBOL, kline_path=kline_path)
+
+
+# ==========================================
+# 回放 (Replay)
+# ==========================================
+
+def fire_indices(prices: np.ndarray, rule: TargetPriceStrategy) -> np.ndarray:
+    """
+    向量化计算一条目标价规则在整段价格上的触发位置，并把 already_alerted 更新为回放结束时的状态。
+    触发条件与 should_alert 一致：本 tick 处于触发区，且上一 tick 不在（首个 tick 看规则当前状态）。
+    """
+    if rule.direction == "greater":
+        triggered = prices >= rule.target_price
+    else:
+        triggered = prices <= rule.target_price
+    previous = np.empty_like(triggered)
+    previous[0] = rule.already_alerted
+    previous[1:] = triggered[:-1]
+    rule.already_alerted = bool(triggered[-1])
+    return np.flatnonzero(triggered & ~previous)
+
+
+def book_fire_indices(prices: np.ndarray, book) -> Iterator[Tuple[TargetPriceStrategy, int]]:
+    """
+    规则簿的向量化回放：对每一段 tick 间的价格变化，在排序好的目标价里二分出被穿越的区间，
+    O(T log R + 触发次数)，而不是每条规则各扫一遍整段价格的 O(R × T)。
+    触发语义与 fire_indices 相同；遍历结束时每条规则的 already_alerted 为最后一个价格下的状态。
+    """
+    prev, cur = prices[:-1], prices[1:]
+    last = float(prices[-1])
+    for greater, targets, rules in book.sides():
+        if not rules:
+            continue
+        targets = np.asarray(targets, dtype=np.float64)
+        # 首个 tick 与 should_alert 一致：处于触发区且规则当前未触发
+        first = targets <= prices[0] if greater else targets >= prices[0]
+        for pos in np.flatnonzero(first).tolist():
+            if not rules[pos].already_alerted:
+                yield rules[pos], 0
+        if greater:
+            # 向上穿越 (prev, cur] 的 greater 目标
+            lo = np.searchsorted(targets, prev, side='right')
+            hi = np.searchsorted(targets, cur, side='right')
+        else:
+            # 向下穿越 [cur, prev) 的 less 目标
+            lo = np.searchsorted(targets, cur, side='left')
+            hi = np.searchsorted(targets, prev, side='left')
+        counts = np.maximum(hi - lo, 0)
+        total = int(counts.sum())
+        if total:
+            ticks = np.repeat(np.arange(1, len(prices)), counts)
+            positions = np.arange(total) + np.repeat(lo - (np.cumsum(counts) - counts), counts)
+            for pos, index in zip(positions.tolist(), ticks.tolist()):
+                yield rules[pos], index
+        if greater:
+            boundary = int(np.searchsorted(targets, last, side='right'))
+            for pos, rule in enumerate(rules):
+                rule.already_alerted = pos < boundary
+        else:
+            boundary = int(np.searchsorted(targets, last, side='left'))
+            for pos, rule in enumerate(rules):
+                rule.already_alerted = pos >= boundary
+
+
+class Replayer:
+    """
+    把历史 tick 依次喂给策略，收集本应触发的提醒，并按时间顺序投递给 notifier。
+    每个策略独立处理整段序列（策略之间互不影响，与实时逐 tick 评估结果一致）。
+    """
+    def __init__(self, strategies: Iterable[AlertStrategy], notifier: Notifier = None,
+                 clock: SimulatedClock = None):
+        self.strategies = list(strategies)
+        self.clock = clock or SimulatedClock()
+        self.notifier = notifier if notifier is not None else CaptureNotifier(clock=self.clock)
+        self.ticks_replayed = 0
+
+    def run(self, series: Series) -> List[ReplayAlert]:
+        events: List[Tuple[float, int, ReplayAlert]] = []
+        seq = 0
+        for strategy in self.strategies:
+            symbol = strategy_symbol(strategy)
+            if symbol not in series:
+                continue
+            ts, prices = series[symbol]
+            if len(prices) == 0:
+                continue
+            for rule, index in self._evaluate(strategy, ts, prices):
+                price = float(prices[index])
+                alert = build_alert(rule, symbol, price)
+                events.append((float(ts[index]), seq, ReplayAlert(float(ts[index]), symbol, price,
+                                                                  alert.title, alert.message)))
+                seq += 1
+        self.ticks_replayed += sum(len(prices) for _, prices in series.values())
+
+        events.sort(key=lambda e: (e[0], e[1]))
+        fired = [alert for _, _, alert in events]
+        for alert in fired:
+            self.clock.set(alert.ts)
+            self.notifier.send_notification(alert.title, alert.message)
+        return fired
+
+    def _evaluate(self, strategy: AlertStrategy, ts: np.ndarray, prices: np.ndarray):
+        if isinstance(strategy, TargetPriceStrategy):
+            for index in fire_indices(prices, strategy):
+                yield strategy, int(index)
+        elif hasattr(strategy, 'sides'):
+            # 规则簿：按排序的目标价批量回放，最后同步规则簿的 last_price
+            yield from book_fire_indices(prices, strategy)
+            strategy.seek(float(prices[-1]))
+        elif hasattr(strategy, 'on_tick'):
+            # 增量指标策略：用历史时间戳，而不是回放时的本地时钟
+            for index, (t, price) in enumerate(zip(ts.tolist(), prices.tolist())):
+                if strategy.should_alert(price, t):
+                    yield strategy, index
+        else:
+            for index, price in enumerate(prices.tolist()):
+                if strategy.should_alert(price):
+                    yield strategy, index
+
+
+def format_ts(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Replay historical prices through alert strategies")
+    parser.add_argument('data', help='CSV (ticks or Binance klines) or .ticks history file')
+    parser.add_argument('--symbol', help='Symbol for single-symbol CSV files (default BTCUSDT) '
+                                         'or .ticks files (default: the file name)')
+    parser.add_argument('--target', type=float, action='append', required=True,
+                        help='Target price (repeat for several rules)')
+    parser.add_argument('--direction', choices=('greater', 'less'), default='greater')
+    parser.add_argument('--close-only', action='store_true', help='Use only kline close prices')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    series = load_series(args.data, symbol=args.symbol, kline_path=not args.close_only)
+    load_elapsed = time.perf_counter() - start
+
+    symbol = args.symbol if args.symbol in series else next(iter(series))
+    strategies = [TargetPriceStrategy(target, args.direction, symbol) for target in args.target]
+    replayer = Replayer(strategies)
+    start = time.perf_counter()
+    fired = replayer.run(series)
+    replay_elapsed = time.perf_counter() - start
+
+    for alert in fired:
+        print(f"{format_ts(alert.ts)}  {alert.symbol}  ${alert.price}  {alert.title}")
+    rate = replayer.ticks_replayed / replay_elapsed if replay_elapsed > 0 else float('inf')
+    print(f"{len(fired)} alerts over {replayer.ticks_replayed} ticks "
+          f"(load {load_elapsed:.2f}s, replay {replay_elapsed:.3f}s, {rate:,.0f} ticks/s)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
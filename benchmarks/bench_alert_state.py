@@ -0,0 +1,86 @@
+"""
+提醒状态持久化基准：每轮 record() 的开销（WAL 缓冲写入，后台 fsync），
+以及重启时打开状态目录（读快照 + 重放 WAL）和把状态恢复到规则对象的耗时。
+用法: python benchmarks/bench_alert_state.py [--rules 100000] [--symbols 50]
+"""
+import os
+import sys
+import random
+import shutil
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_common import add_result_arguments, finish, measure, print_table
+
+from alert_state import AlertStateStore
+from btc_monitor import build_strategies
+
+
+def make_rules(count, symbols):
+    rng = random.Random(7)
+    return [{"symbol": rng.choice(symbols), "price": round(rng.uniform(90.0, 110.0), 2),
+             "direction": rng.choice(("greater", "less"))} for _ in range(count)]
+
+
+def random_walk(symbols):
+    rng = random.Random(11)
+    prices = {s: 100.0 for s in symbols}
+
+    def step():
+        for s in symbols:
+            prices[s] = min(110.0, max(90.0, prices[s] + rng.gauss(0, 0.5)))
+        return dict(prices)
+    return step
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Alert state WAL / snapshot benchmark")
+    parser.add_argument('--rules', type=int, default=100000)
+    parser.add_argument('--symbols', type=int, default=50)
+    parser.add_argument('--samples', type=int, default=2000)
+    parser.add_argument('--restarts', type=int, default=20)
+    add_result_arguments(parser, 'alert_state')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    symbols = [f"S{i:03d}USDT" for i in range(args.symbols)]
+    rules = make_rules(args.rules, symbols)
+    directory = tempfile.mkdtemp(prefix="bench-alert-state-")
+    print(f"{len(rules)} rules over {len(symbols)} symbols, state in {directory}")
+
+    results = {}
+    try:
+        store = AlertStateStore(directory, rules)
+        step = random_walk(symbols)
+        results[f"record ({len(symbols)} symbols)"] = measure(lambda: store.record(step()), args.samples)
+        store.sync()
+        # 模拟崩溃：不 close，留下未压缩的 WAL 供重放
+        store._stop.set()
+        store._syncer.join()
+        store._wal.close()
+        shutil.copytree(directory, directory + "-crashed")
+
+        def reopen():
+            shutil.rmtree(directory)
+            shutil.copytree(directory + "-crashed", directory)
+            AlertStateStore(directory, rules).close()
+        results["open + replay + checkpoint"] = measure(reopen, args.restarts, warmup=1)
+
+        reopened = AlertStateStore(directory, rules)
+        strategies = build_strategies(rules)
+        results[f"restore {len(rules)} rules"] = measure(lambda: reopened.restore(strategies), args.restarts, warmup=1)
+        reopened.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+        shutil.rmtree(directory + "-crashed", ignore_errors=True)
+
+    print_table(results)
+    return finish('alert_state', results, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
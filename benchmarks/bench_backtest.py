@@ -0,0 +1,69 @@
+"""
+回放吞吐基准：向量化路径 vs 逐 tick should_alert，报告 ticks/s
+用法: python benchmarks/bench_backtest.py [--ticks 5000000] [--rules 10]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from btc_monitor import DEFAULT_SYMBOL, TargetPriceStrategy
+from backtest import Replayer
+
+
+class OpaqueStrategy:
+    """包一层让回放器认不出来，强制走逐 tick 的 should_alert 路径"""
+    def __init__(self, inner: TargetPriceStrategy):
+        self.inner = inner
+        self.symbol = inner.symbol
+        self.direction = inner.direction
+        self.target_price = inner.target_price
+
+    def should_alert(self, current_price: float) -> bool:
+        return self.inner.should_alert(current_price)
+
+
+def make_rules(count, rng):
+    return [TargetPriceStrategy(float(rng.uniform(63000, 67000)), str(rng.choice(["greater", "less"])))
+            for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest replay throughput")
+    parser.add_argument('--ticks', type=int, default=5_000_000)
+    parser.add_argument('--loop-ticks', type=int, default=200_000,
+                        help='Ticks for the per-tick should_alert baseline')
+    parser.add_argument('--rules', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    prices = 65000.0 + np.cumsum(rng.normal(0, 5, args.ticks))
+    ts = 1.7e9 + np.arange(args.ticks, dtype=np.float64)
+    series = {DEFAULT_SYMBOL: (ts, prices)}
+
+    replayer = Replayer(make_rules(args.rules, np.random.default_rng(args.seed)))
+    start = time.perf_counter()
+    fired = replayer.run(series)
+    vec_elapsed = time.perf_counter() - start
+
+    n = min(args.loop_ticks, args.ticks)
+    loop_series = {DEFAULT_SYMBOL: (ts[:n], prices[:n])}
+    loop_rules = [OpaqueStrategy(r) for r in make_rules(args.rules, np.random.default_rng(args.seed))]
+    looper = Replayer(loop_rules)
+    start = time.perf_counter()
+    looper.run(loop_series)
+    loop_elapsed = time.perf_counter() - start
+
+    tick_evals = args.ticks * args.rules
+    print(f"ticks={args.ticks} rules={args.rules} alerts={len(fired)}")
+    print(f"vectorized : {args.ticks / vec_elapsed:14,.0f} ticks/s  ({tick_evals / vec_elapsed:,.0f} rule-evals/s)")
+    print(f"per-tick   : {n / loop_elapsed:14,.0f} ticks/s  ({n * args.rules / loop_elapsed:,.0f} rule-evals/s)")
+
+
+if __name__ == "__main__":
+    main()
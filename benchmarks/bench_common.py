@@ -0,0 +1,103 @@
+"""
+基准测试公共工具：计时、分位数统计、结果保存与对比
+结果保存为 JSON：{"name": ..., "meta": {...}, "results": {case: {p50_us, p99_us, mean_us, ops_per_sec, samples}}}
+"""
+import os
+import sys
+import json
+import time
+import platform
+from datetime import datetime, timezone
+from argparse import ArgumentParser, Namespace
+from typing import Callable, Dict, Optional
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def percentile(sorted_samples, pct: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(round(pct / 100.0 * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def measure(func: Callable[[], object], samples: int, batch: int = 1, warmup: int = 10) -> Dict[str, float]:
+    """
+    调用 func samples * batch 次。每个样本计时 batch 次调用再取平均，
+    亚微秒级操作用较大的 batch 摊薄计时开销。
+    """
+    for _ in range(warmup):
+        func()
+    timings = []
+    perf = time.perf_counter_ns
+    for _ in range(samples):
+        start = perf()
+        for _ in range(batch):
+            func()
+        timings.append((perf() - start) / batch)
+    timings.sort()
+    total_ns = sum(timings) * batch
+    return {
+        "p50_us": percentile(timings, 50) / 1e3,
+        "p99_us": percentile(timings, 99) / 1e3,
+        "mean_us": sum(timings) / len(timings) / 1e3,
+        "ops_per_sec": samples * batch / (total_ns / 1e9) if total_ns else float('inf'),
+        "samples": samples * batch,
+    }
+
+
+def print_table(results: Dict[str, Dict[str, float]]) -> None:
+    print(f"{'case':<34}{'p50 (us)':>12}{'p99 (us)':>12}{'ops/s':>16}")
+    for case, r in results.items():
+        print(f"{case:<34}{r['p50_us']:>12.2f}{r['p99_us']:>12.2f}{r['ops_per_sec']:>16,.0f}")
+
+
+def save_results(name: str, results: Dict[str, Dict[str, float]], path: Optional[str] = None) -> str:
+    path = path or os.path.join(RESULTS_DIR, f"{name}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    document = {
+        "name": name,
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2)
+    return path
+
+
+def compare_results(baseline_path: str, results: Dict[str, Dict[str, float]], tolerance: float = 0.2) -> bool:
+    """与之前保存的结果对比 p50 / p99；任一用例变慢超过 tolerance（比例）即视为回归，返回 False"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)["results"]
+    ok = True
+    print(f"\ncompared with {baseline_path} (tolerance {tolerance:.0%}):")
+    for case, r in results.items():
+        if case not in baseline:
+            continue
+        for key in ("p50_us", "p99_us"):
+            before, after = baseline[case][key], r[key]
+            if before <= 0:
+                continue
+            change = (after - before) / before
+            flag = "REGRESSION" if change > tolerance else ""
+            ok = ok and not flag
+            print(f"  {case:<32}{key:>8} {before:>10.2f} -> {after:>10.2f}  {change:+7.1%} {flag}")
+    return ok
+
+
+def add_result_arguments(parser: ArgumentParser, name: str) -> None:
+    """各基准脚本共用的 --output / --compare / --tolerance 参数"""
+    parser.add_argument('--output', help=f'Where to save results (default: benchmarks/results/{name}.json)')
+    parser.add_argument('--compare', metavar='BASELINE', help='Compare against a previously saved result file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed slowdown before flagging')
+
+
+def finish(name: str, results: Dict[str, Dict[str, float]], args: Namespace) -> int:
+    """按 add_result_arguments 的参数与基线对比并保存结果，返回进程退出码（有回归时为 1）"""
+    ok = compare_results(args.compare, results, args.tolerance) if args.compare else True
+    print(f"\nsaved to {save_results(name, results, args.output)}")
+    return 0 if ok else 1
@@ -0,0 +1,57 @@
+"""
+对冲请求基准：三个本地替身行情源，其中一个周期性变慢 / 报错，
+对比单源 BinancePriceFetcher 与 HedgedPriceFetcher（first / median）的取价延迟。
+用法: python benchmarks/bench_hedged.py [--quick] [--compare benchmarks/results/hedged.json]
+"""
+import os
+import sys
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_common import add_result_arguments, finish, measure, print_table
+from stand_in_server import StandInTickerServer
+
+from btc_monitor import BinancePriceFetcher
+from hedged_fetcher import HedgedPriceFetcher, PriceSource
+from http_client import HttpSession
+
+SYMBOLS = ["BTCUSDT", "ETHUSDT"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hedged multi-source fetch benchmark")
+    parser.add_argument('--quick', action='store_true', help='Fewer samples, for a fast smoke run')
+    parser.add_argument('--slow-delay', type=float, default=0.25, help='Latency of the degraded source (seconds)')
+    add_result_arguments(parser, 'hedged')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+    samples = 40 if args.quick else 300
+    prices = {"BTCUSDT": 65000.0, "ETHUSDT": 3000.0}
+    session = HttpSession(max_retries=0)
+    results = {}
+    with StandInTickerServer(prices, delay=args.slow_delay) as degraded, \
+            StandInTickerServer(prices, delay=0.002) as healthy, \
+            StandInTickerServer(prices, delay=0.004, fail_every=4) as flaky:
+        def sources():
+            return [PriceSource(name, BinancePriceFetcher(base_url=server.base_url, session=session))
+                    for name, server in (("degraded", degraded), ("healthy", healthy), ("flaky", flaky))]
+
+        single = BinancePriceFetcher(base_url=degraded.base_url, session=session)
+        results["single source (degraded)"] = measure(lambda: single.fetch_prices(SYMBOLS), max(10, samples // 10),
+                                                      warmup=1)
+        for mode in ("first", "median"):
+            hedged = HedgedPriceFetcher(sources(), mode=mode, hedge_delay=0.02, deadline=0.05)
+            results[f"hedged {mode}"] = measure(lambda: hedged.fetch_prices(SYMBOLS), samples, warmup=3)
+            print(f"hedged {mode}: " + ", ".join(repr(s) for s in hedged.sources))
+            hedged.close()
+
+    print_table(results)
+    return finish('hedged', results, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+热路径基准：fetch -> evaluate -> notify
+- run_check 端到端：真实 BinancePriceFetcher + 本地替身行情服务器 + CaptureNotifier
+- TargetPriceStrategy.should_alert 微基准
+- 行情 JSON 解码（单交易对 / 多交易对 / 全量列表）
+- 通知投递：MonitorApp.deliver -> CaptureNotifier，以及 DaemonNotifier 的本地 IPC 往返
+- 指标记录：直方图 observe / 计数器 inc 的单次开销
+结果以 p50 / p99 / 吞吐输出，并保存为 JSON；--compare 与之前的结果对比，回归时退出码为 1。
+用法: python benchmarks/bench_hotpath.py [--quick] [--compare benchmarks/results/hotpath.json]
+"""
+import os
+import sys
+import json
+import socket
+import logging
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_common import add_result_arguments, finish, measure, print_table
+from stand_in_server import StandInTickerServer
+
+from btc_monitor import (BinancePriceFetcher, CaptureNotifier, MonitorApp, TargetPriceStrategy,
+                         build_alert)
+from http_client import HttpSession
+
+
+def make_symbols(count):
+    return ["BTCUSDT", "ETHUSDT"] + [f"C{i:04d}USDT" for i in range(count - 2)]
+
+
+def bench_run_check(results, symbols, samples):
+    prices = {s: 100.0 for s in symbols}
+    with StandInTickerServer(prices) as server:
+        fetcher = BinancePriceFetcher(base_url=server.base_url, session=HttpSession(max_retries=0))
+        notifier = CaptureNotifier()
+        # 价格在 99 / 101 间来回，目标 100：每两次检查每个交易对触发一次提醒
+        strategies = [TargetPriceStrategy(100.0, "greater", s) for s in symbols]
+        app = MonitorApp(fetcher, notifier, *strategies)
+        flip = [False]
+
+        def check():
+            flip[0] = not flip[0]
+            server.prices = {s: 101.0 if flip[0] else 99.0 for s in symbols}
+            app.run_check()
+
+        results[f"run_check ({len(symbols)} symbols)"] = measure(check, samples, warmup=5)
+        print(f"run_check: {server.requests} HTTP requests, {len(notifier.sent)} alerts captured")
+
+
+def bench_should_alert(results, samples):
+    strategy = TargetPriceStrategy(100.0)
+    prices = [99.0, 101.0, 102.0, 98.0] * 64
+
+    def evaluate():
+        for price in prices:
+            strategy.should_alert(price)
+
+    r = measure(evaluate, samples, batch=10)
+    # 折算为单次 should_alert
+    n = len(prices)
+    results["should_alert"] = {**r, "p50_us": r["p50_us"] / n, "p99_us": r["p99_us"] / n,
+                               "mean_us": r["mean_us"] / n, "ops_per_sec": r["ops_per_sec"] * n,
+                               "samples": r["samples"] * n}
+
+
+def bench_json_decode(results, samples):
+    single = json.dumps({"symbol": "BTCUSDT", "price": "65000.12000000"})
+    few = json.dumps([{"symbol": s, "price": "1.00000000"} for s in make_symbols(20)])
+    full = json.dumps([{"symbol": s, "price": "1.00000000"} for s in make_symbols(2500)])
+
+    results["json decode single"] = measure(lambda: float(json.loads(single)['price']), samples, batch=100)
+    results["json decode 20 symbols"] = measure(
+        lambda: {i['symbol']: float(i['price']) for i in json.loads(few)}, samples, batch=10)
+    results["json decode full list (2500)"] = measure(
+        lambda: {i['symbol']: float(i['price']) for i in json.loads(full)}, max(20, samples // 10))
+
+
+def bench_dispatch(results, samples):
+    notifier = CaptureNotifier()
+    app = MonitorApp(None, notifier)
+    alert = build_alert(TargetPriceStrategy(100.0), "BTCUSDT", 101.0)
+    logging.disable(logging.CRITICAL)
+    try:
+        results["deliver -> CaptureNotifier"] = measure(lambda: app.deliver(alert), samples, batch=10)
+        # 经分发队列：评估线程只付出去重判断 + 入队（去重窗口为 0，每次都真正入队）
+        from dispatch import AlertDispatcher
+        dispatcher = AlertDispatcher([CaptureNotifier()], maxsize=10 ** 7, dedup_window=0.0, rate=0)
+        app.notifier = dispatcher
+        results["deliver -> AlertDispatcher (enqueue)"] = measure(lambda: app.deliver(alert), samples, batch=10)
+        dispatcher.close()
+        app.notifier = notifier
+    finally:
+        logging.disable(logging.NOTSET)
+
+    # 常驻通知服务的 IPC 往返：服务端只应答，不弹窗
+    from notify_daemon import DaemonNotifier, NotifyDaemon
+    daemon = NotifyDaemon(max_queue=10 ** 9)
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen()
+
+    def serve():
+        conn, _ = listener.accept()
+        stream = conn.makefile('rw', encoding='utf-8')
+
+        def reply(obj):
+            stream.write(json.dumps(obj) + "\n")
+            stream.flush()
+
+        for line in stream:
+            daemon.handle_request(json.loads(line), reply)
+            daemon.inbox.get_nowait()   # 模拟 UI 线程立即取走
+
+    threading.Thread(target=serve, daemon=True).start()
+    client = DaemonNotifier(port=listener.getsockname()[1], spawn=False)
+    results["DaemonNotifier IPC round trip"] = measure(
+        lambda: client.send_notification(alert.title, alert.message), samples)
+    client.close()
+    listener.close()
+
+
+def bench_metrics(results, samples):
+    from metrics import Counter, Histogram
+    histogram = Histogram("bench_latency_seconds", "benchmark")
+    counter = Counter("bench_total", "benchmark", ("host",))
+    results["metrics histogram observe"] = measure(lambda: histogram.observe(0.003), samples, batch=100)
+    results["metrics counter inc (labelled)"] = measure(lambda: counter.inc(labels=("api.binance.com",)),
+                                                        samples, batch=100)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="fetch -> evaluate -> notify hot path benchmarks")
+    parser.add_argument('--quick', action='store_true', help='Fewer samples, for a fast smoke run')
+    parser.add_argument('--symbols', type=int, default=20, help='Symbols watched in the run_check case')
+    add_result_arguments(parser, 'hotpath')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    samples = 200 if args.quick else 2000
+    results = {}
+    bench_run_check(results, make_symbols(max(2, args.symbols)), samples // 4)
+    bench_should_alert(results, samples)
+    bench_json_decode(results, samples)
+    bench_dispatch(results, samples)
+    bench_metrics(results, samples)
+
+    print_table(results)
+    return finish('hotpath', results, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+增量指标基准：indicators 中各指标每个 tick 的更新开销，按回看长度分别测量，
+对比每个 tick 重新扫描整个窗口的朴素实现（deque 窗口上 max / sum）。
+增量实现的耗时应与窗口长度无关，朴素实现随窗口线性增长。
+用法: python benchmarks/bench_incremental.py [--windows 14 200 5000]
+"""
+import os
+import sys
+import random
+import logging
+import argparse
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_common import add_result_arguments, finish, measure, print_table
+
+from indicators import EMA, RSI, VWAP, RollingMax, RollingMin, Tick, symbol_id
+
+# 每个样本处理的 tick 数；结果折算为单个 tick
+TICKS_PER_SAMPLE = 1000
+
+
+def make_ticks(count):
+    rng = random.Random(5)
+    sid = symbol_id("BTCUSDT")
+    price, ticks = 60000.0, []
+    for i in range(count):
+        price *= 1 + rng.gauss(0, 0.0005)
+        ticks.append(Tick(sid, 1.7e9 + i * 0.1, price, rng.expovariate(2.0)))
+    return ticks
+
+
+class NaiveMax:
+    def __init__(self, window):
+        self.window = deque(maxlen=window)
+
+    def update(self, tick):
+        self.window.append(tick.price)
+        return max(self.window)
+
+
+class NaiveMean:
+    def __init__(self, window):
+        self.window = deque(maxlen=window)
+
+    def update(self, tick):
+        self.window.append(tick.price)
+        return sum(self.window) / len(self.window)
+
+
+def per_tick(indicator, ticks, samples):
+    """先用一整段 tick 预热（填满窗口），之后每个样本更新 TICKS_PER_SAMPLE 个 tick"""
+    update = indicator.update
+    for tick in ticks:
+        update(tick)
+    position = [0]
+
+    def run():
+        start = position[0]
+        for tick in ticks[start:start + TICKS_PER_SAMPLE]:
+            update(tick)
+        position[0] = (start + TICKS_PER_SAMPLE) % (len(ticks) - TICKS_PER_SAMPLE)
+    r = measure(run, samples, warmup=3)
+    n = TICKS_PER_SAMPLE
+    return {**r, "p50_us": r["p50_us"] / n, "p99_us": r["p99_us"] / n, "mean_us": r["mean_us"] / n,
+            "ops_per_sec": r["ops_per_sec"] * n, "samples": r["samples"] * n}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental streaming indicator benchmark")
+    parser.add_argument('--windows', type=int, nargs='+', default=[14, 200, 5000])
+    parser.add_argument('--samples', type=int, default=50)
+    add_result_arguments(parser, 'incremental')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    ticks = make_ticks(max(max(args.windows) * 2, 20 * TICKS_PER_SAMPLE))
+    print(f"per-tick update cost, {len(ticks)} ticks (times are per tick)")
+
+    results = {}
+    results["VWAP (session)"] = per_tick(VWAP(), ticks, args.samples)
+    for window in args.windows:
+        results[f"EMA({window})"] = per_tick(EMA(window), ticks, args.samples)
+        results[f"RSI({window})"] = per_tick(RSI(window), ticks, args.samples)
+        results[f"RollingMax({window})"] = per_tick(RollingMax(window), ticks, args.samples)
+        results[f"RollingMin({window})"] = per_tick(RollingMin(window), ticks, args.samples)
+        results[f"naive max rescan({window}) (baseline)"] = per_tick(NaiveMax(window), ticks, args.samples)
+        results[f"naive mean rescan({window}) (baseline)"] = per_tick(NaiveMean(window), ticks, args.samples)
+
+    print_table(results)
+    return finish('incremental', results, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+指标规则基准：vector_rules.IndicatorEngine 的整份快照向量化评估，
+对比逐条规则在 Python 里用 deque 滑窗计算同样指标的朴素实现。
+用法: python benchmarks/bench_indicators.py [--rules 5000] [--symbols 50]
+"""
+import os
+import sys
+import random
+import logging
+import argparse
+import statistics
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_common import add_result_arguments, finish, measure, print_table
+
+from vector_rules import IndicatorEngine, IndicatorRule
+
+
+def make_rules(count, symbols):
+    rng = random.Random(7)
+    rules = []
+    for _ in range(count):
+        symbol, direction = rng.choice(symbols), rng.choice(("greater", "less"))
+        kind = rng.choice(("change", "ma_cross", "band"))
+        if kind == "change":
+            rules.append(IndicatorRule(symbol, kind, direction, rng.randint(1, 60), 0, rng.uniform(0.5, 3.0)))
+        elif kind == "ma_cross":
+            window = rng.randint(5, 60)
+            rules.append(IndicatorRule(symbol, kind, direction, window, rng.randint(1, window - 1)))
+        else:
+            rules.append(IndicatorRule(symbol, kind, direction, rng.randint(5, 60), 0, rng.uniform(1.0, 3.0)))
+    return rules
+
+
+class NaiveRules:
+    """每条规则各自维护 deque 窗口，逐条计算指标"""
+    def __init__(self, rules):
+        self.rules = rules
+        self.windows = [deque(maxlen=r.window + 1) for r in rules]
+        self.alerted = [False] * len(rules)
+
+    def evaluate(self, snapshot):
+        fired = []
+        for i, rule in enumerate(self.rules):
+            price = snapshot.get(rule.symbol, 0.0)
+            if price <= 0:
+                continue
+            window = self.windows[i]
+            window.append(price)
+            values = list(window)
+            if rule.kind == "change":
+                if len(values) <= rule.window:
+                    continue
+                change = (price / values[0] - 1) * 100
+                condition = change >= rule.threshold if rule.direction == "greater" else change <= -rule.threshold
+            else:
+                values = values[-rule.window:]
+                if len(values) < rule.window:
+                    continue
+                mean = sum(values) / len(values)
+                if rule.kind == "ma_cross":
+                    fast = sum(values[-rule.fast:]) / rule.fast
+                    condition = fast > mean if rule.direction == "greater" else fast < mean
+                else:
+                    band = rule.threshold * statistics.pstdev(values)
+                    condition = price > mean + band if rule.direction == "greater" else price < mean - band
+            if condition and not self.alerted[i]:
+                fired.append(rule)
+            self.alerted[i] = condition
+        return fired
+
+
+def random_walk(symbols):
+    rng = random.Random(11)
+    prices = {s: 100.0 for s in symbols}
+
+    def step():
+        for s in symbols:
+            prices[s] *= 1 + rng.gauss(0, 0.002)
+        return dict(prices)
+    return step
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized indicator rule benchmark")
+    parser.add_argument('--rules', type=int, default=5000)
+    parser.add_argument('--symbols', type=int, default=50)
+    parser.add_argument('--samples', type=int, default=500)
+    add_result_arguments(parser, 'indicators')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    symbols = [f"S{i:03d}USDT" for i in range(args.symbols)]
+    rules = make_rules(args.rules, symbols)
+    print(f"{len(rules)} indicator rules over {len(symbols)} symbols")
+
+    results = {}
+    engine = IndicatorEngine(rules)
+    step = random_walk(symbols)
+    results["vectorized engine"] = measure(lambda: engine.evaluate(step()), args.samples, warmup=100)
+    naive = NaiveRules(rules)
+    step = random_walk(symbols)
+    results["per-rule python (baseline)"] = measure(lambda: naive.evaluate(step()),
+                                                    max(20, args.samples // 10), warmup=100)
+
+    print_table(results)
+    return finish('indicators', results, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+规则簿基准：10^5 条目标价规则，逐条 should_alert vs ThresholdRuleBook
+用法: python benchmarks/bench_rulebook.py [--rules 100000] [--ticks 2000]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from btc_monitor import TargetPriceStrategy
+from rulebook import ThresholdRuleBook
+
+
+def make_rules(count, center, spread, rng):
+    return [TargetPriceStrategy(target_price=round(center + rng.uniform(-spread, spread), 2),
+                                direction=rng.choice(("greater", "less")))
+            for _ in range(count)]
+
+
+def random_walk(start, ticks, step, rng):
+    price = start
+    for _ in range(ticks):
+        price = max(1.0, price + rng.gauss(0, step))
+        yield price
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ThresholdRuleBook benchmark")
+    parser.add_argument('--rules', type=int, default=100_000)
+    parser.add_argument('--ticks', type=int, default=2_000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    center, spread, step = 65000.0, 5000.0, 25.0
+    prices = list(random_walk(center, args.ticks, step, random.Random(args.seed + 1)))
+
+    # 基线：每个 tick 对每条规则调用 should_alert
+    naive_rules = make_rules(args.rules, center, spread, random.Random(args.seed))
+    start = time.perf_counter()
+    naive_fired = []
+    for price in prices:
+        naive_fired.append(sum(1 for rule in naive_rules if rule.should_alert(price)))
+    naive_elapsed = time.perf_counter() - start
+
+    # 规则簿
+    book_rules = make_rules(args.rules, center, spread, random.Random(args.seed))
+    start = time.perf_counter()
+    book = ThresholdRuleBook(rules=book_rules)
+    build_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    book_fired = [len(book.fired_rules(price)) for price in prices]
+    book_elapsed = time.perf_counter() - start
+
+    assert naive_fired == book_fired, "rule book fired a different set of alerts than should_alert"
+
+    # 增删成本
+    extra = make_rules(1000, center, spread, random.Random(args.seed + 2))
+    start = time.perf_counter()
+    for rule in extra:
+        book.add(rule)
+    add_elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    for rule in extra:
+        book.remove(rule)
+    remove_elapsed = time.perf_counter() - start
+
+    print(f"rules={args.rules} ticks={args.ticks} alerts={sum(book_fired)}")
+    print(f"naive should_alert : {naive_elapsed / args.ticks * 1e6:10.1f} us/tick")
+    print(f"rule book          : {book_elapsed / args.ticks * 1e6:10.1f} us/tick "
+          f"({naive_elapsed / book_elapsed:.0f}x faster)")
+    print(f"build              : {build_elapsed * 1e3:10.1f} ms")
+    print(f"add                : {add_elapsed / len(extra) * 1e6:10.2f} us/rule")
+    print(f"remove             : {remove_elapsed / len(extra) * 1e6:10.2f} us/rule")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+多进程分片基准：同一批规则在单进程 MonitorApp 与 N 个工作进程的 ShardedMonitor 上
+评估一份快照（collect_alerts）的耗时。价格随机游走，每轮都有规则被穿越。
+用法: python benchmarks/bench_sharded.py [--rules 200000] [--symbols 50] [--workers 1 2 4]
+"""
+import os
+import sys
+import random
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_common import add_result_arguments, finish, measure, print_table
+
+from btc_monitor import MonitorApp, build_strategies
+from supervisor import ShardedMonitor
+
+
+def make_rules(count, symbols):
+    rng = random.Random(7)
+    return [{"symbol": rng.choice(symbols), "price": round(rng.uniform(90.0, 110.0), 2),
+             "direction": rng.choice(("greater", "less"))} for _ in range(count)]
+
+
+def random_walk(symbols):
+    rng = random.Random(11)
+    prices = {s: 100.0 for s in symbols}
+
+    def step():
+        for s in symbols:
+            prices[s] = min(110.0, max(90.0, prices[s] + rng.gauss(0, 0.5)))
+        return dict(prices)
+    return step
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded multi-process evaluation benchmark")
+    parser.add_argument('--rules', type=int, default=200000)
+    parser.add_argument('--symbols', type=int, default=50)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--samples', type=int, default=200)
+    add_result_arguments(parser, 'sharded')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    symbols = [f"S{i:03d}USDT" for i in range(args.symbols)]
+    rules = make_rules(args.rules, symbols)
+    print(f"{len(rules)} rules over {len(symbols)} symbols, {os.cpu_count()} CPUs")
+
+    results = {}
+    app = MonitorApp(None, None, *build_strategies(rules))
+    step = random_walk(symbols)
+    results["in-process"] = measure(lambda: app.collect_alerts(step()), args.samples, warmup=3)
+    for workers in args.workers:
+        sharded = ShardedMonitor(None, None, rules, workers=workers)
+        step = random_walk(symbols)
+        try:
+            results[f"{workers} worker processes"] = measure(lambda: sharded.collect_alerts(step()),
+                                                             args.samples, warmup=3)
+        finally:
+            sharded.close()
+
+    print_table(results)
+    return finish('sharded', results, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
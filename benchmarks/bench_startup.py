@@ -0,0 +1,62 @@
+"""
+启动耗时基准：模块导入时间 + headless 模式下从进程启动到完成第一次检查的时间
+第一次检查请求本地替身行情服务器，不访问真实交易所。
+用法: python benchmarks/bench_startup.py [--runs 10]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import statistics
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stand_in_server import StandInTickerServer
+
+
+def time_command(argv, runs, env=None):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(argv, check=True, cwd=ROOT, env=env,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def summarize(label, samples, baseline=None):
+    median = statistics.median(samples)
+    extra = f"  (+{(median - baseline) * 1e3:.1f} ms over bare interpreter)" if baseline is not None else ""
+    print(f"{label:<28}: median {median * 1e3:7.1f} ms  min {min(samples) * 1e3:7.1f} ms{extra}")
+    return median
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time benchmark")
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    python = sys.executable
+    bare = summarize("bare interpreter", time_command([python, '-c', 'pass'], args.runs))
+    summarize("import btc_monitor", time_command([python, '-c', 'import btc_monitor'], args.runs), bare)
+
+    with StandInTickerServer({"BTCUSDT": 65000.0, "ETHUSDT": 3000.0}) as server, \
+            tempfile.TemporaryDirectory() as tmp:
+        config_path = os.path.join(tmp, 'config.json')
+        with open(config_path, 'w', encoding='utf-8') as f:
+            # 目标价设得足够高，第一次检查不会触发通知
+            json.dump({"interval": 5, "rules": [{"symbol": "BTCUSDT", "price": 1e9, "direction": "greater"},
+                                                {"symbol": "ETHUSDT", "price": 1e9, "direction": "greater"}]}, f)
+        argv = [python, 'btc_monitor.py', '--headless', '--once', '--config', config_path,
+                '--base-url', server.base_url, '--snooze-file', os.path.join(tmp, 'snoozes.json')]
+        summarize("headless time-to-first-check", time_command(argv, args.runs), bare)
+        print(f"stand-in server handled {server.requests} requests")
+
+
+if __name__ == "__main__":
+    main()
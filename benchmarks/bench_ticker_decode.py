@@ -0,0 +1,99 @@
+"""
+全量行情解码基准：json.loads 整个列表再取出关注交易对，对比 ticker_decode 的流式过滤解码。
+- 内存中的响应正文按 64KB 分块，分别测 CPU 耗时与 tracemalloc 峰值内存
+- 经本地替身服务器的完整一次轮询（HTTP + 解码）
+用法: python benchmarks/bench_ticker_decode.py [--entries 2500] [--watch 5 20 200]
+"""
+import os
+import sys
+import json
+import random
+import logging
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_common import add_result_arguments, finish, measure, print_table
+from stand_in_server import StandInTickerServer
+
+from btc_monitor import BinancePriceFetcher
+from http_client import HttpSession
+from ticker_decode import CHUNK_SIZE, TickerDecoder
+
+
+def make_prices(count):
+    rng = random.Random(7)
+    return {f"S{i:04d}USDT": round(rng.uniform(0.001, 70000.0), 8) for i in range(count)}
+
+
+def chunked(body):
+    return [body[i:i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE)]
+
+
+def json_filter(chunks, wanted):
+    """原来的做法：拼出完整正文，解码成 dict 列表，再挑出关注的交易对"""
+    data = json.loads(b"".join(chunks))
+    wanted = set(wanted)
+    return {item['symbol']: float(item['price']) for item in data if item['symbol'] in wanted}
+
+
+def peak_kib(func):
+    func()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming filtered ticker decode benchmark")
+    parser.add_argument('--entries', type=int, default=2500, help='Entries in the full ticker list')
+    parser.add_argument('--watch', type=int, nargs='+', default=[5, 20, 200], help='Watched symbol counts')
+    parser.add_argument('--samples', type=int, default=200)
+    add_result_arguments(parser, 'ticker_decode')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    prices = make_prices(args.entries)
+    body = StandInTickerServer(prices).payload()
+    chunks = chunked(body)
+    print(f"{args.entries} entries, {len(body) / 1024:.0f} KiB body, {len(chunks)} chunks")
+
+    results = {}
+    rng = random.Random(11)
+    for count in args.watch:
+        wanted = sorted(rng.sample(sorted(prices), min(count, len(prices))))
+        decoder = TickerDecoder(wanted)
+        assert decoder.decode_dict(chunks) == json_filter(chunks, wanted)
+        for name, func in ((f"json.loads + filter ({count} watched)", lambda: json_filter(chunks, wanted)),
+                           (f"streaming decode ({count} watched)", lambda: decoder.decode(chunks))):
+            results[name] = measure(func, args.samples)
+            results[name]["peak_kib"] = peak_kib(func)
+
+    # 完整一次轮询：全量列表走 get_json 后过滤 vs 流式过滤
+    wanted = sorted(rng.sample(sorted(prices), min(args.watch[-1], len(prices))))
+    with StandInTickerServer(prices) as server:
+        session = HttpSession(max_retries=0)
+        json_fetcher = BinancePriceFetcher(base_url=server.base_url, session=session)
+        stream_fetcher = BinancePriceFetcher(base_url=server.base_url, session=session, bulk_threshold=1)
+        assert stream_fetcher.fetch_prices(wanted) == {s: prices[s] for s in wanted}
+        results[f"poll via json ({len(wanted)} watched)"] = measure(
+            lambda: {s: p for s, p in json_fetcher.fetch_prices().items() if s in wanted}, args.samples // 2)
+        results[f"poll via streaming decode ({len(wanted)} watched)"] = measure(
+            lambda: stream_fetcher.fetch_prices(wanted), args.samples // 2)
+        session.close()
+
+    print_table(results)
+    print("\npeak traced memory per decode:")
+    for case, r in results.items():
+        if "peak_kib" in r:
+            print(f"  {case:<40}{r['peak_kib']:>10.0f} KiB")
+    return finish('ticker_decode', results, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""
+本地替身行情服务器，供基准测试与测试使用，不访问真实交易所
+- StandInTickerServer：模拟币安 REST /api/v3/ticker/price
+- StandInStreamServer：模拟币安 WebSocket 组合流（只用标准库实现握手与帧格式）
+"""
+import json
+import time
+import base64
+import socket
+import struct
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+class StandInTickerServer:
+    """
+    在后台线程里运行的 HTTP/1.1 keep-alive 服务器。
+    prices 可随时修改；delay 秒可模拟网络延迟；fail_every=N 时每 N 个请求返回一次 503。
+    与币安一样按分钟累计请求权重并通过 X-MBX-USED-WEIGHT-1M 返回；
+    weight_limit > 0 时超出配额返回 429 + Retry-After。
+    """
+    def __init__(self, prices: Dict[str, float], delay: float = 0.0, fail_every: int = 0,
+                 weight_limit: int = 0):
+        self.prices = dict(prices)
+        self.delay = delay
+        self.fail_every = fail_every
+        self.weight_limit = weight_limit
+        self.requests = 0
+        self.rejected = 0
+        self.used_weight = 0
+        self._minute = 0
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def payload(self, symbols=None) -> bytes:
+        if symbols is None:
+            items = self.prices.items()
+        else:
+            items = ((s, self.prices[s]) for s in symbols if s in self.prices)
+        # 与币安一样输出紧凑 JSON
+        return json.dumps([{"symbol": s, "price": f"{p:.8f}"} for s, p in items], separators=(',', ':')).encode()
+
+    def start(self) -> "StandInTickerServer":
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # 响应头和正文合并成一次写入，避免 Nagle + 延迟 ACK 造成的 ~40ms 停顿
+            wbufsize = -1
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                self.used = None
+                with stand_in._lock:
+                    stand_in.requests += 1
+                    count = stand_in.requests
+                if stand_in.delay:
+                    threading.Event().wait(stand_in.delay)
+                if stand_in.fail_every and count % stand_in.fail_every == 0:
+                    self._send(503, b'')
+                    return
+                query = parse_qs(urlparse(self.path).query)
+                weight = 2 if 'symbol' in query else 4
+                with stand_in._lock:
+                    minute = int(time.time() // 60)
+                    if minute != stand_in._minute:
+                        stand_in._minute, stand_in.used_weight = minute, 0
+                    stand_in.used_weight += weight
+                    used = stand_in.used_weight
+                    limited = stand_in.weight_limit and used > stand_in.weight_limit
+                    if limited:
+                        stand_in.rejected += 1
+                self.used = used
+                if limited:
+                    self._send(429, b'', {'Retry-After': str(60 - int(time.time()) % 60)})
+                    return
+                if 'symbol' in query:
+                    symbol = query['symbol'][0]
+                    body = json.dumps({"symbol": symbol, "price": f"{stand_in.prices.get(symbol, 0):.8f}"}).encode()
+                elif 'symbols' in query:
+                    body = stand_in.payload(json.loads(query['symbols'][0]))
+                else:
+                    body = stand_in.payload()
+                self._send(200, body)
+
+            used = None
+
+            def _send(self, status, body, headers=None):
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                if self.used is not None:
+                    self.send_header('X-MBX-USED-WEIGHT-1M', str(self.used))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="stand-in-ticker", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+_WS_MAGIC = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def _ws_frame(opcode: int, payload: bytes) -> bytes:
+    """服务端发出的帧不加掩码"""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+    return header + payload
+
+
+class StandInStreamServer:
+    """
+    最小的 WebSocket 替身服务器。
+    push(message) 把消息以文本帧发给所有连接；drop() 断开现有连接模拟断线；
+    客户端的 ping 自动回 pong（pings 计数），silent=True 时不回 pong，模拟失去响应的服务端。
+    paths 记录每次连接请求的路径（含订阅的 streams 参数）。
+    """
+    def __init__(self, silent: bool = False):
+        self.silent = silent
+        self.paths: List[str] = []
+        self.pings = 0
+        self._clients: List[socket.socket] = []
+        self._lock = threading.Lock()
+        self._connected = threading.Condition(self._lock)
+        self._socket: Optional[socket.socket] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._socket.getsockname()[:2]
+        return f"ws://{host}:{port}"
+
+    @property
+    def connections(self) -> int:
+        return len(self.paths)
+
+    def start(self) -> "StandInStreamServer":
+        self._socket = socket.create_server(('127.0.0.1', 0))
+        threading.Thread(target=self._accept, name="stand-in-stream", daemon=True).start()
+        return self
+
+    def wait_connections(self, count: int, timeout: float = 5.0) -> bool:
+        """等到累计连接数达到 count 且有活动连接"""
+        with self._connected:
+            return self._connected.wait_for(lambda: len(self.paths) >= count and self._clients, timeout)
+
+    def push(self, message: dict) -> None:
+        frame = _ws_frame(0x1, json.dumps(message).encode())
+        with self._lock:
+            for client in list(self._clients):
+                try:
+                    client.sendall(frame)
+                except OSError:
+                    self._clients.remove(client)
+
+    def drop(self) -> None:
+        with self._lock:
+            clients, self._clients = self._clients, []
+        for client in clients:
+            try:
+                client.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            client.close()
+
+    def stop(self) -> None:
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+        self.drop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                conn, _ = self._socket.accept()
+            except (OSError, AttributeError):
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn: socket.socket) -> None:
+        reader = conn.makefile('rb')
+        try:
+            request_line = reader.readline().decode('latin-1')
+            headers = {}
+            while True:
+                line = reader.readline().decode('latin-1').strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            accept = base64.b64encode(hashlib.sha1(headers['sec-websocket-key'].encode() + _WS_MAGIC).digest())
+            conn.sendall(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                         b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+            with self._connected:
+                self.paths.append(request_line.split()[1])
+                self._clients.append(conn)
+                self._connected.notify_all()
+            self._read_frames(reader, conn)
+        except (OSError, KeyError, IndexError, struct.error):
+            pass
+        finally:
+            with self._lock:
+                if conn in self._clients:
+                    self._clients.remove(conn)
+            conn.close()
+
+    def _read_frames(self, reader, conn: socket.socket) -> None:
+        while True:
+            header = reader.read(2)
+            if len(header) < 2:
+                return
+            opcode, length = header[0] & 0x0F, header[1] & 0x7F
+            if length == 126:
+                length = struct.unpack('!H', reader.read(2))[0]
+            elif length == 127:
+                length = struct.unpack('!Q', reader.read(8))[0]
+            # 客户端发来的帧一定带掩码
+            mask = reader.read(4) if header[1] & 0x80 else b'\0\0\0\0'
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(reader.read(length)))
+            if opcode == 0x9:
+                self.pings += 1
+                if not self.silent:
+                    with self._lock:
+                        conn.sendall(_ws_frame(0xA, payload))
+            elif opcode == 0x8:
+                with self._lock:
+                    conn.sendall(_ws_frame(0x8, payload[:2]))
+                return
@@ -1,14 +1,16 @@
 import os
 import sys
+import math
 import time
-import requests
 import subprocess
 import json
-from typing import Protocol
-import schedule
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Protocol, Tuple
 import logging
 import argparse
 
+from http_client import HttpSession, configure_default_session, default_session
+from metrics import ALERT_LAG, ALERTS, SKIPPED_CHECKS, STRATEGY_EVAL
+
 # ==========================================
 # 1. 协议定义 (Protocols)
 # ==========================================
@@ -18,6 +20,11 @@ class PriceFetcher(Protocol):
         """获取并返回当前价格"""
         ...
 
+class MultiPriceFetcher(Protocol):
+    def fetch_prices(self, symbols: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """一次请求获取多个交易对的价格，返回 symbol -> price 映射"""
+        ...
+
 class Notifier(Protocol):
     def send_notification(self, title: str, message: str) -> None:
         """发送通知"""
@@ -28,23 +35,96 @@ class AlertStrategy(Protocol):
         """判断是否应该触发警报"""
         ...
 
+class ThresholdAware(Protocol):
+    def armed_distance(self, current_price: float) -> float:
+        """到最近一个仍处于武装状态的阈值的价格距离；没有可触发的阈值时返回 inf（自适应轮询使用，可选）"""
+        ...
+
+class BatchAlertStrategy(Protocol):
+    symbol: str
+
+    def fired_rules(self, current_price: float) -> List[Any]:
+        """一次评估一组规则，返回本次触发的规则（每条规则需有 direction / target_price）"""
+        ...
+
+class SnapshotAlertStrategy(Protocol):
+    symbols: List[str]
+
+    def fired_alerts(self, snapshot: Dict[str, float], observed_at: float = 0.0) -> List["Alert"]:
+        """用整份快照一次评估跨多个交易对的规则（如 vector_rules.IndicatorEngine），直接返回提醒"""
+        ...
+
 # ==========================================
 # 2. 具体实现 (Implementations)
 # ==========================================
 
+DEFAULT_SYMBOL = "BTCUSDT"
+# 关注的交易对超过该数量时，拉取全量行情列表比拼 symbols=[...] 参数更合适（URL 长度有限，权重相同）
+BULK_THRESHOLD = 100
+
 class BinancePriceFetcher:
+    BASE_URL = "https://api.binance.com"
+
+    def __init__(self, symbol: str = DEFAULT_SYMBOL, base_url: Optional[str] = None,
+                 session: Optional[HttpSession] = None, bulk_threshold: int = BULK_THRESHOLD):
+        self.symbol = symbol
+        self.base_url = (base_url or self.BASE_URL).rstrip('/')
+        # 复用 keep-alive 连接池；重试与退避在会话层完成。首次请求时才创建（导入 requests）
+        self._session = session
+        # 关注的交易对超过该数量时改为拉取全量行情并流式过滤解码（0 表示从不）
+        self.bulk_threshold = bulk_threshold
+        self._decoder = None
+
+    @property
+    def session(self) -> HttpSession:
+        if self._session is None:
+            self._session = default_session()
+        return self._session
+
     def fetch_price(self) -> float:
         try:
-            # 使用币安的公开API获取BTCUSDT的最新价格
-            url = "https://api.binance.com/api/v3/ticker/price?symbol=BTCUSDT"
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            # 使用币安的公开API获取单个交易对的最新价格
+            url = f"{self.base_url}/api/v3/ticker/price"
+            data = self.session.get_json(url, params={"symbol": self.symbol})
             return float(data['price'])
         except Exception as e:
             logging.error(f"Failed to fetch price from Binance: {e}")
             return 0.0
 
+    def fetch_prices(self, symbols: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """
+        一次 HTTP 请求取回所有关注交易对的价格。
+        symbols 为 None 时拉取全量行情列表；否则使用 symbols=[...] 参数只取需要的交易对。
+        失败时返回空字典，由调用方决定是否跳过本轮检查。
+        """
+        try:
+            url = f"{self.base_url}/api/v3/ticker/price"
+            params = None
+            if symbols is not None:
+                wanted = sorted(set(symbols))
+                if not wanted:
+                    return {}
+                if self.bulk_threshold and len(wanted) > self.bulk_threshold:
+                    return self._fetch_filtered(url, wanted)
+                # 币安要求紧凑的 JSON 数组格式：["BTCUSDT","ETHUSDT"]
+                params = {"symbols": json.dumps(wanted, separators=(',', ':'))}
+            data = self.session.get_json(url, params=params)
+            return {item['symbol']: float(item['price']) for item in data}
+        except Exception as e:
+            logging.error(f"Failed to fetch prices from Binance: {e}")
+            return {}
+
+    def _fetch_filtered(self, url: str, wanted: List[str]) -> Dict[str, float]:
+        """全量行情边下载边解码，只取出关注的交易对；解码器（含预分配数组）在交易对不变时复用"""
+        from ticker_decode import CHUNK_SIZE, TickerDecoder
+        if self._decoder is None or self._decoder.symbols != wanted:
+            self._decoder = TickerDecoder(wanted)
+        response = self.session.get(url, stream=True)
+        try:
+            return self._decoder.decode_dict(response.iter_content(CHUNK_SIZE))
+        finally:
+            response.close()
+
 class WindowsToastNotifier:
     """
     通过 subprocess 启动独立的 popup.py GUI 进程来显示右下角弹窗。
@@ -54,22 +134,40 @@ class WindowsToastNotifier:
     # popup.py 与本文件同目录
     POPUP_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'popup.py')
 
+    def __init__(self, snooze_file: Optional[str] = None):
+        # 弹窗选择"稍后提醒"时登记到该文件，由监控进程的 SnoozeScheduler 负责到期重发
+        self.snooze_file = snooze_file
+
     def send_notification(self, title: str, message: str) -> None:
         try:
             # pythonw.exe = 无控制台窗口的 Python 解释器
             pythonw = sys.executable.replace('python.exe', 'pythonw.exe')
-            subprocess.Popen(
-                [pythonw, self.POPUP_SCRIPT, title, message],
-                close_fds=True
-            )
+            argv = [pythonw, self.POPUP_SCRIPT, title, message]
+            if self.snooze_file:
+                argv.append(self.snooze_file)
+            subprocess.Popen(argv, close_fds=True)
         except Exception as e:
             logging.error(f"Failed to launch popup process: {e}")
 
 
+class CaptureNotifier:
+    """
+    不弹窗，只把通知记录在内存里，用于回放、基准测试和无界面运行。
+    clock 决定记录的时间戳，回放时传入模拟时钟即可得到"本应触发"的时间。
+    """
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.sent: List[tuple] = []   # (timestamp, title, message)
+
+    def send_notification(self, title: str, message: str) -> None:
+        self.sent.append((self.clock(), title, message))
+
+
 class TargetPriceStrategy:
-    def __init__(self, target_price: float, direction: str = "greater"):
+    def __init__(self, target_price: float, direction: str = "greater", symbol: str = DEFAULT_SYMBOL):
         self.target_price = target_price
         self.direction = direction
+        self.symbol = symbol
         # 记录上一次是否已经报警，避免在目标价格之上时一直弹出
         self.already_alerted = False
 
@@ -89,30 +187,158 @@ class TargetPriceStrategy:
             
         return False
 
+    def armed_distance(self, current_price: float) -> float:
+        if self.already_alerted:
+            return math.inf
+        if self.direction == "greater":
+            return max(0.0, self.target_price - current_price)
+        return max(0.0, current_price - self.target_price)
+
 # ==========================================
 # 3. 监控应用主类 (Controller)
 # ==========================================
 
+def asset_name(symbol: str) -> str:
+    """BTCUSDT -> BTC，用于通知标题与正文"""
+    for quote in ("USDT", "USDC", "FDUSD", "BUSD"):
+        if symbol.endswith(quote) and len(symbol) > len(quote):
+            return symbol[:-len(quote)]
+    return symbol
+
+def strategy_symbol(strategy: AlertStrategy) -> str:
+    return getattr(strategy, 'symbol', DEFAULT_SYMBOL)
+
+class Alert(NamedTuple):
+    """一次策略触发，评估与投递分离后在两者之间传递"""
+    symbol: str
+    price: float
+    title: str
+    message: str
+    strategy: Any
+    observed_at: float = 0.0   # 观察到该价格时的 time.perf_counter()，用于统计提醒延迟；0 表示不统计
+
+def build_alert(strategy: AlertStrategy, symbol: str, current_price: float, observed_at: float = 0.0) -> Alert:
+    asset = asset_name(symbol)
+    if hasattr(strategy, 'describe'):
+        # indicators 中的增量指标策略没有目标价，由策略自己描述触发条件
+        return Alert(symbol, current_price, f"{asset} Indicator Alert", strategy.describe(current_price),
+                     strategy, observed_at)
+    dir_str = "≥" if getattr(strategy, 'direction', 'greater') == "greater" else "≤"
+    msg = f"{asset} 价格已触发提醒条件！\n当前价格: ${current_price} {dir_str} 设定的 ${strategy.target_price}"
+    return Alert(symbol, current_price, f"{asset} Price Alert", msg, strategy, observed_at)
+
 class MonitorApp:
-    def __init__(self, fetcher: PriceFetcher, notifier: Notifier, strategy: AlertStrategy):
+    """
+    每轮检查只取一次行情快照（symbol -> price），再用同一份快照评估所有策略，
+    因此每轮的请求数与关注的交易对数量无关。
+    """
+    def __init__(self, fetcher: PriceFetcher, notifier: Notifier, *strategies: AlertStrategy,
+                 history: Any = None, state: Any = None):
         self.fetcher = fetcher
         self.notifier = notifier
-        self.strategy = strategy
+        self.strategies: List[AlertStrategy] = list(strategies)
+        # 可选的 price_history.PriceHistory：每份快照落盘，供回放与区间查询
+        self.history = history
+        # 可选的 alert_state.AlertStateStore：记录每轮评估过的价格，重启后据此恢复提醒状态；
+        # 提醒投递完成后才确认，经分发队列投递时由分发线程回调
+        self.state = state
+        if state is not None and hasattr(notifier, 'submit'):
+            notifier.on_delivered = state.delivered
+
+    @property
+    def symbols(self) -> List[str]:
+        symbols = set()
+        for strategy in self.strategies:
+            if hasattr(strategy, 'fired_alerts'):
+                symbols.update(strategy.symbols)
+            else:
+                symbols.add(strategy_symbol(strategy))
+        return sorted(symbols)
+
+    def fetch_snapshot(self) -> Dict[str, float]:
+        symbols = self.symbols
+        if hasattr(self.fetcher, 'fetch_prices'):
+            return self.fetcher.fetch_prices(symbols)
+        # 只支持单价格的 fetcher：仅在只关注一个交易对时可用
+        if len(symbols) > 1:
+            logging.warning("Fetcher does not support multi-symbol snapshots; only the first symbol is checked.")
+        return {symbols[0]: self.fetcher.fetch_price()} if symbols else {}
 
     def run_check(self) -> None:
-        logging.info("Checking BTC price...")
-        current_price = self.fetcher.fetch_price()
-        if current_price <= 0:
-            logging.warning("Invalid price retrieved. Skipping this check.")
+        logging.info(f"Checking prices for {', '.join(self.symbols)}...")
+        snapshot = self.fetch_snapshot()
+        self.observe(snapshot)
+        self.evaluate(snapshot)
+
+    def observe(self, snapshot: Dict[str, float], log: bool = True) -> None:
+        """记录一份新快照：写入历史存储，并按需打印价格日志"""
+        if self.history is not None:
+            self.history.record(snapshot)
+        if not log:
             return
+        for symbol in self.symbols:
+            current_price = snapshot.get(symbol, 0.0)
+            if current_price <= 0:
+                SKIPPED_CHECKS.inc(labels=(symbol,))
+                logging.warning(f"Invalid price retrieved for {symbol}. Skipping this check.")
+            else:
+                logging.info(f"Current {asset_name(symbol)} Price: ${current_price}")
+
+    def on_price_update(self, symbol: str, price: float, event_time: int = 0, volume: float = 0.0) -> None:
+        """推送行情源的回调：单个交易对更新时只评估相关策略"""
+        snapshot = {symbol: price}
+        self.observe(snapshot, log=False)
+        self.evaluate(snapshot, {symbol: (event_time / 1000.0 if event_time else time.time(), volume)})
+
+    def evaluate(self, snapshot: Dict[str, float], trades: Optional[Dict[str, Tuple[float, float]]] = None) -> None:
+        """用一份行情快照评估全部策略，并同步发送触发的通知"""
+        for alert in self.collect_alerts(snapshot, trades):
+            self.deliver(alert)
 
-        logging.info(f"Current BTC Price: ${current_price}")
+    def collect_alerts(self, snapshot: Dict[str, float],
+                       trades: Optional[Dict[str, Tuple[float, float]]] = None) -> List[Alert]:
+        """
+        只做策略评估、不发通知；快照中没有的交易对本轮跳过。
+        trades：推送流给出的 symbol -> (成交时间秒, 成交量)，交给实现 on_tick 的增量指标策略。
+        """
+        observed_at = time.perf_counter()
+        alerts = []
+        for strategy in self.strategies:
+            if hasattr(strategy, 'fired_alerts'):
+                alerts.extend(strategy.fired_alerts(snapshot, observed_at))
+                continue
+            symbol = strategy_symbol(strategy)
+            current_price = snapshot.get(symbol, 0.0)
+            if current_price <= 0:
+                continue
 
-        if self.strategy.should_alert(current_price):
-            dir_str = "≥" if getattr(self.strategy, 'direction', 'greater') == "greater" else "≤"
-            msg = f"BTC 价格已触发提醒条件！\n当前价格: ${current_price} {dir_str} 设定的 ${self.strategy.target_price}"
-            logging.info(f"Alert triggered: {msg}")
-            self.notifier.send_notification("BTC Price Alert", msg)
+            if hasattr(strategy, 'fired_rules'):
+                for rule in strategy.fired_rules(current_price):
+                    alerts.append(build_alert(rule, symbol, current_price, observed_at))
+            elif trades and symbol in trades and hasattr(strategy, 'on_tick'):
+                if strategy.should_alert(current_price, *trades[symbol]):
+                    alerts.append(build_alert(strategy, symbol, current_price, observed_at))
+            elif strategy.should_alert(current_price):
+                alerts.append(build_alert(strategy, symbol, current_price, observed_at))
+        STRATEGY_EVAL.observe(time.perf_counter() - observed_at)
+        if self.state is not None:
+            self.state.record(snapshot, alerts)
+        return alerts
+
+    def deliver(self, alert: Alert) -> None:
+        logging.info(f"Alert triggered: {alert.message}")
+        ALERTS.inc(labels=(alert.symbol,))
+        if hasattr(self.notifier, 'submit'):
+            # dispatch.AlertDispatcher：只入队，去重、合并与投递都在后台线程，提醒延迟由它统计
+            self.notifier.submit(alert)
+            return
+        try:
+            self.notifier.send_notification(alert.title, alert.message)
+        finally:
+            if self.state is not None:
+                self.state.delivered(alert)
+        if alert.observed_at:
+            ALERT_LAG.observe(time.perf_counter() - alert.observed_at)
 
 # ==========================================
 # 4. 主程序入口 (Main)
@@ -124,11 +350,17 @@ def setup_logging():
         format='%(asctime)s - %(levelname)s - %(message)s'
     )
 
-def get_user_config(default_price: float = 65900.0, default_interval: int = 5) -> dict:
+DEFAULT_PRICE = 65900.0
+DEFAULT_INTERVAL = 5
+DEFAULT_CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'monitor_config.json')
+# 同一交易对的规则达到该数量时改用 ThresholdRuleBook 索引评估
+RULEBOOK_THRESHOLD = 32
+
+def get_user_config(default_price: float = DEFAULT_PRICE, default_interval: int = DEFAULT_INTERVAL,
+                    default_direction: str = "greater") -> dict:
     """通过调用独立程序 config_ui.py 弹窗获取用户配置，实现高聚合低耦合"""
     ui_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config_ui.py')
-    default_direction = "greater"
-    
+
     try:
         creationflags = 0
         if sys.platform == "win32":
@@ -146,51 +378,369 @@ def get_user_config(default_price: float = 65900.0, default_interval: int = 5) -
         logging.error(f"Failed to load UI config: {e}")
         return {"price": default_price, "interval": default_interval, "direction": default_direction}
 
+def normalize_config(data: dict) -> dict:
+    """
+    统一为 {"interval": 分钟, "rules": [{"symbol", "price", "direction"}, ...]}，
+    配置了指标规则时另有 "indicators": [...]（见 vector_rules）。
+    兼容 config_ui.py 输出的单规则格式 {"price", "interval", "direction"}。
+    """
+    rules = data.get("rules")
+    if rules is None:
+        rules = [{"symbol": data.get("symbol", DEFAULT_SYMBOL),
+                  "price": data.get("price", DEFAULT_PRICE),
+                  "direction": data.get("direction", "greater")}]
+    interval = float(data.get("interval", DEFAULT_INTERVAL))
+    if interval <= 0:
+        raise ValueError("interval must be positive")
+
+    normalized = []
+    for rule in rules:
+        price = float(rule["price"])
+        direction = rule.get("direction", "greater")
+        if price <= 0:
+            raise ValueError(f"rule price must be positive: {rule}")
+        if direction not in ("greater", "less"):
+            raise ValueError(f"rule direction must be 'greater' or 'less': {rule}")
+        normalized.append({"symbol": rule.get("symbol", DEFAULT_SYMBOL).upper(),
+                           "price": price, "direction": direction})
+    config = {"interval": interval, "rules": normalized}
+    if data.get("indicators"):
+        from vector_rules import normalize_indicator
+        config["indicators"] = [normalize_indicator(item) for item in data["indicators"]]
+    return config
+
+def load_config_file(path: str) -> Optional[dict]:
+    """读取持久化配置；文件不存在时返回 None，格式错误时抛出 ValueError"""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        try:
+            return normalize_config(json.load(f))
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"Invalid config file {path}: {e}") from e
+
+def save_config_file(path: str, config: dict) -> None:
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+def apply_overrides(config: dict, args) -> dict:
+    """命令行参数覆盖配置：给出 --price / --direction / --symbols 任一项时，按它们重建规则"""
+    rules = config["rules"]
+    if args.price is not None or args.direction is not None or args.symbols:
+        first = rules[0] if rules else {"price": DEFAULT_PRICE, "direction": "greater"}
+        symbols = args.symbols or list(dict.fromkeys(r["symbol"] for r in rules)) or [DEFAULT_SYMBOL]
+        price = args.price if args.price is not None else first["price"]
+        direction = args.direction or first["direction"]
+        rules = [{"symbol": symbol.upper(), "price": price, "direction": direction} for symbol in symbols]
+    interval = args.interval if args.interval is not None else config["interval"]
+    return normalize_config({"interval": interval, "rules": rules, "indicators": config.get("indicators")})
+
+def build_strategies(rules: List[dict]) -> List[AlertStrategy]:
+    """按规则生成策略；同一交易对规则较多时合并进 ThresholdRuleBook"""
+    return group_strategies([TargetPriceStrategy(target_price=rule["price"], direction=rule["direction"],
+                                                 symbol=rule["symbol"]) for rule in rules])
+
+def group_strategies(targets: List[TargetPriceStrategy]) -> List[AlertStrategy]:
+    by_symbol: Dict[str, List[TargetPriceStrategy]] = {}
+    for target in targets:
+        by_symbol.setdefault(target.symbol, []).append(target)
+
+    strategies: List[AlertStrategy] = []
+    for symbol, group in by_symbol.items():
+        if len(group) >= RULEBOOK_THRESHOLD:
+            from rulebook import ThresholdRuleBook
+            strategies.append(ThresholdRuleBook(symbol, group))
+        else:
+            strategies.extend(group)
+    return strategies
+
+def resolve_config(args) -> dict:
+    """
+    headless：只读配置文件（不存在时用默认值），不启动 UI 子进程；
+    否则弹出 config_ui.py，以持久化的配置作为默认值，并把结果写回配置文件供下次 headless 启动。
+    """
+    config_path = args.config or DEFAULT_CONFIG_FILE
+    persisted = load_config_file(config_path)
+    if args.headless:
+        config = persisted or normalize_config({})
+    else:
+        base = persisted or normalize_config({})
+        first = base["rules"][0]
+        interval = base["interval"]
+        ui = get_user_config(default_price=first["price"],
+                             default_interval=max(1, int(round(interval))),
+                             default_direction=first["direction"])
+        edited = normalize_config({**ui, "symbol": first["symbol"]})
+        # UI 只编辑第一条规则，其余规则原样保留
+        config = {"interval": edited["interval"], "rules": edited["rules"] + base["rules"][1:]}
+        if base.get("indicators"):
+            config["indicators"] = base["indicators"]
+        try:
+            save_config_file(config_path, config)
+        except OSError as e:
+            logging.warning(f"Failed to persist config to {config_path}: {e}")
+    return apply_overrides(config, args)
+
+def build_notifier(args, snoozes=None) -> Notifier:
+    """按命令行选择通知方式；常驻服务不可用时自动退回单进程弹窗"""
+    snooze_file = snoozes.state_path if snoozes is not None else None
+    if args.notifier == 'process':
+        return WindowsToastNotifier(snooze_file)
+
+    on_action = None
+    if snoozes is not None:
+        def on_action(msg_id, status, ack):
+            if status == "snooze":
+                snoozes.schedule(ack.get('seconds', 0), ack.get('title', ''), ack.get('message', ''))
+    from notify_daemon import DaemonNotifier
+    return DaemonNotifier(port=args.notify_port, fallback=WindowsToastNotifier(snooze_file),
+                          on_action=on_action)
+
+def close_fetcher(fetcher) -> None:
+    """关闭带后台资源的 fetcher（如对冲请求的线程池）；普通 fetcher 没有 close 方法"""
+    close = getattr(fetcher, 'close', None)
+    if close is not None:
+        close()
+
+def build_fetcher(args, governor=None) -> MultiPriceFetcher:
+    """默认只用币安；给出 --sources 时组合多个行情源做对冲请求（对冲代替重试，源会话不再重试）"""
+    if not args.sources:
+        return BinancePriceFetcher(base_url=args.base_url, bulk_threshold=args.bulk_threshold)
+    from hedged_fetcher import HedgedPriceFetcher, build_sources
+    session = HttpSession(pool_size=args.pool_size, connect_timeout=args.connect_timeout,
+                          read_timeout=args.read_timeout, max_retries=0, governor=governor)
+    return HedgedPriceFetcher(build_sources(args.sources, session), mode=args.hedge_mode,
+                              hedge_delay=args.hedge_delay, deadline=2 * args.hedge_delay,
+                              timeout=args.connect_timeout + args.read_timeout)
+
 def main():
     setup_logging()
 
     parser = argparse.ArgumentParser(description="BTC Price Monitor")
     parser.add_argument('--test-fetch', action='store_true', help='Test price fetching independently')
     parser.add_argument('--test-notify', action='store_true', help='Test notification system independently')
+    parser.add_argument('--headless', action='store_true',
+                        help='Skip the config dialog and load rules from the config file')
+    parser.add_argument('--config', metavar='PATH',
+                        help='Rules config file (default: monitor_config.json next to this script)')
+    parser.add_argument('--price', type=float, help='Override the target price of the configured rules')
+    parser.add_argument('--direction', choices=('greater', 'less'), help='Override the trigger direction')
+    parser.add_argument('--interval', type=float, help='Override the check interval in minutes')
+    parser.add_argument('--symbols', nargs='+', metavar='SYMBOL',
+                        help='Symbols to watch with the configured target (fetched in one request per check)')
+    parser.add_argument('--once', action='store_true', help='Run a single check and exit')
+    parser.add_argument('--base-url', help='Override the Binance REST base URL')
+    parser.add_argument('--bulk-threshold', type=int, default=BULK_THRESHOLD,
+                        help='Above this many symbols, stream the full ticker list and decode only '
+                             'the watched symbols (0: always use the symbols= parameter)')
+    parser.add_argument('--notifier', choices=('daemon', 'process'), default='daemon',
+                        help='daemon: one long-lived popup service over local IPC; process: one popup process per alert')
+    parser.add_argument('--notify-port', type=int, default=47831, help='Local port of the notification daemon')
+    parser.add_argument('--snooze-file', default=None, metavar='PATH',
+                        help='Where pending snoozes are persisted (default: snoozes.json next to this script)')
+    parser.add_argument('--sinks', nargs='+', default=['popup'], metavar='SINK',
+                        help='Where alerts are delivered: popup, stdout, jsonl:PATH, webhook:URL')
+    parser.add_argument('--dedup-window', type=float, default=60.0,
+                        help='Seconds during which a rule that fires again is not re-notified')
+    parser.add_argument('--notify-coalesce', type=float, default=0.0,
+                        help='Seconds to gather alerts into one summary notification (0: deliver each alert)')
+    parser.add_argument('--notify-rate', type=float, default=0.0,
+                        help='Maximum notifications per minute; extra alerts join the next summary (0: unlimited)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Use the WebSocket push stream instead of interval polling')
+    parser.add_argument('--history-dir', metavar='DIR',
+                        help='Append every fetched price to per-symbol tick files in DIR')
+    parser.add_argument('--state-dir', metavar='DIR',
+                        help='Persist alert state in DIR so a restart neither repeats nor forgets alerts')
+    parser.add_argument('--pool-size', type=int, default=10, help='HTTP keep-alive connection pool size')
+    parser.add_argument('--connect-timeout', type=float, default=3.05, help='HTTP connect timeout in seconds')
+    parser.add_argument('--read-timeout', type=float, default=10.0, help='HTTP read timeout in seconds')
+    parser.add_argument('--retries', type=int, default=3, help='Retries per request with jittered exponential backoff')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='Poll faster near armed targets and in volatile markets, slower otherwise')
+    parser.add_argument('--min-interval', type=float, default=5.0,
+                        help='Adaptive polling floor in seconds')
+    parser.add_argument('--max-interval', type=float,
+                        help='Adaptive polling ceiling in seconds (default: 3x the configured interval)')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='Evaluate rules in N worker processes sharing a price table (0: in-process)')
+    parser.add_argument('--sources', nargs='+', metavar='SOURCE',
+                        help='Query several price sources concurrently with hedged requests '
+                             '(binance, binance-api1..3, okx, bybit)')
+    parser.add_argument('--hedge-mode', choices=('first', 'median'), default='first',
+                        help='first: take the first valid answer; median: median of answers by the deadline')
+    parser.add_argument('--hedge-delay', type=float, default=0.05,
+                        help='Seconds before a backup source is queried; median mode waits twice as long')
+    parser.add_argument('--weight-limit', type=int, default=6000,
+                        help='Exchange request-weight quota per minute shared by all jobs (0 disables the governor)')
+    parser.add_argument('--coalesce-window', type=float, default=0.0,
+                        help='Seconds to wait for other jobs so their price fetches merge into one request')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help='Serve Prometheus metrics on http://127.0.0.1:PORT/metrics')
     args = parser.parse_args()
 
+    governor = None
+    if args.weight_limit > 0:
+        from ratelimit import RateLimitGovernor
+        governor = RateLimitGovernor(weight_limit=args.weight_limit)
+    configure_default_session(pool_size=args.pool_size,
+                              connect_timeout=args.connect_timeout,
+                              read_timeout=args.read_timeout,
+                              max_retries=args.retries,
+                              governor=governor)
+
+    try:
+        fetcher = build_fetcher(args, governor)
+    except ValueError as e:
+        parser.error(str(e))
+
     if args.test_fetch:
-        fetcher = BinancePriceFetcher()
-        price = fetcher.fetch_price()
-        print(f"Fetch Test: Current BTC Price is ${price}")
+        try:
+            if args.symbols:
+                prices = fetcher.fetch_prices(args.symbols)
+                for symbol, price in sorted(prices.items()):
+                    print(f"Fetch Test: Current {symbol} Price is ${price}")
+            else:
+                price = fetcher.fetch_price()
+                print(f"Fetch Test: Current BTC Price is ${price}")
+        finally:
+            close_fetcher(fetcher)
         return
 
     if args.test_notify:
-        notifier = WindowsToastNotifier()
+        notifier = build_notifier(args)
         print("Notification Test: A popup should appear in the bottom-right corner...")
         notifier.send_notification("Test Alert", "This is a test notification from BTC Monitor.")
         time.sleep(1)  # 给 Popen 启动时间
+        close_fetcher(fetcher)
         return
 
-    # 弹窗获取用户配置
-    config = get_user_config(default_price=65900.0, default_interval=5)
-    target_price = config.get("price", 65900.0)
-    check_interval = config.get("interval", 5)
-    direction = config.get("direction", "greater")
+    # headless 时直接读配置文件，否则弹窗获取用户配置
+    try:
+        config = resolve_config(args)
+    except ValueError as e:
+        parser.error(str(e))
+    rules = config["rules"]
+    indicators = config.get("indicators", [])
+    check_interval = config["interval"]
+    if indicators and args.workers > 0:
+        parser.error("indicator rules are evaluated in-process; drop --workers to use them")
 
     # 实例化组件
-    fetcher = BinancePriceFetcher()
-    notifier = WindowsToastNotifier()
-    strategy = TargetPriceStrategy(target_price=target_price, direction=direction)
+    from snooze import SnoozeScheduler
+    snoozes = SnoozeScheduler(args.snooze_file)
+    # 评估与投递之间的非阻塞分发队列：去重、限速、合并后分发给各个 sink
+    from dispatch import AlertDispatcher, build_sink
+    popup = build_notifier(args, snoozes) if 'popup' in args.sinks else None
+    try:
+        sinks = [build_sink(spec, popup) for spec in args.sinks]
+    except (ValueError, OSError) as e:
+        parser.error(str(e))
+    notifier = AlertDispatcher(sinks, dedup_window=args.dedup_window, coalesce_window=args.notify_coalesce,
+                               rate=args.notify_rate)
+    symbols = list(dict.fromkeys([rule["symbol"] for rule in rules] + [item["symbol"] for item in indicators]))
+
+    # 所有任务（以及推送流的补数据请求）共用一个合并取价的 fetcher
+    from ratelimit import CoalescingFetcher
+    fetcher = CoalescingFetcher(fetcher, window=args.coalesce_window)
 
-    app = MonitorApp(fetcher, notifier, strategy)
+    history = None
+    if args.history_dir:
+        from price_history import PriceHistory
+        history = PriceHistory(args.history_dir)
+
+    state = None
+    if args.state_dir:
+        from alert_state import AlertStateStore
+        try:
+            state = AlertStateStore(args.state_dir, rules)
+        except ValueError as e:
+            parser.error(str(e))
 
-    dir_label = "≥" if direction == "greater" else "≤"
-    logging.info(f"Starting BTC Monitor... Target: {dir_label} ${target_price}, Interval: {check_interval} minutes.")
-    # 先立即执行一次
-    app.run_check()
-    
-    # 根据配置执行
-    schedule.every(check_interval).minutes.do(app.run_check)
+    if args.workers > 0:
+        # 多进程分片：主进程取价、发通知，规则评估分给工作进程
+        from supervisor import ShardedMonitor
+        app = ShardedMonitor(fetcher, notifier, rules, workers=args.workers, history=history, state=state)
+    else:
+        strategies = build_strategies(rules)
+        if state is not None:
+            restored = state.restore(strategies)
+            logging.info(f"Restored alert state from {args.state_dir}: {restored} rules already alerted.")
+        if indicators:
+            # 指标规则（涨跌幅 / 均线交叉 / 波动带）在一个 NumPy 引擎里整份快照批量评估
+            from vector_rules import IndicatorEngine
+            strategies.append(IndicatorEngine.from_config(indicators))
+        app = MonitorApp(fetcher, notifier, *strategies, history=history, state=state)
 
-    while True:
-        schedule.run_pending()
-        time.sleep(1)
+    if args.metrics_port is not None:
+        from metrics import start_http_server
+        try:
+            start_http_server(args.metrics_port)
+            logging.info(f"Serving metrics on http://127.0.0.1:{args.metrics_port}/metrics")
+        except OSError as e:
+            logging.warning(f"Failed to start metrics endpoint on port {args.metrics_port}: {e}")
+
+    if args.once:
+        try:
+            app.run_check()
+        finally:
+            if history is not None:
+                history.close()
+            if hasattr(app, 'close'):
+                app.close()
+            notifier.close()
+            if state is not None:
+                state.close()
+            fetcher.close()
+        return
+
+    first = rules[0]
+    dir_label = "≥" if first["direction"] == "greater" else "≤"
+    target_label = f"{dir_label} ${first['price']}" + (f" (+{len(rules) - 1} more rules)" if len(rules) > 1 else "")
+
+    # 异步引擎：轮询模式下启动后立即执行一次，之后按配置间隔执行；
+    # 稍后提醒也由引擎到期重发。Ctrl+C / SIGTERM 时干净退出
+    import asyncio
+    from engine import MonitorEngine, MonitorJob
+    engine = MonitorEngine(snoozes=snoozes, snooze_notifier=notifier)
+
+    stream = None
+    if args.stream:
+        from price_stream import BinanceStreamFetcher
+        stream = BinanceStreamFetcher(symbols, resync_fetcher=fetcher)
+        app.fetcher = stream
+        logging.info(f"Starting BTC Monitor... Target: {target_label}, streaming {', '.join(stream.symbols)}.")
+        stream.start(app.on_price_update)
+    else:
+        logging.info(f"Starting BTC Monitor... Target: {target_label}, Interval: {check_interval:g} minutes"
+                     + (" (adaptive)." if args.adaptive else "."))
+        if args.adaptive:
+            from adaptive import AdaptivePollingJob
+            engine.add_job(AdaptivePollingJob(app, interval=check_interval * 60, min_interval=args.min_interval,
+                                              max_interval=args.max_interval or 3 * check_interval * 60))
+        else:
+            engine.add_job(MonitorJob(app, interval=check_interval * 60))
+
+    try:
+        asyncio.run(engine.run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if stream is not None:
+            stream.stop()
+        if history is not None:
+            history.close()
+        if hasattr(app, 'close'):
+            app.close()
+        # 先关分发器：已排队的提醒发出并确认后，状态库再写最终快照
+        notifier.close()
+        if state is not None:
+            state.close()
+        fetcher.close()
 
 if __name__ == "__main__":
-    main()
+    # 通过模块名运行：否则本文件会以 __main__ 和 btc_monitor 各加载一次，类与全局状态各有两份
+    import btc_monitor
+    btc_monitor.main()
@@ -0,0 +1,336 @@
+"""
+非阻塞通知分发 - 策略评估与通知投递之间的有界队列
+- submit(alert) 只做去重判断和一次 put_nowait，评估循环从不等待投递
+- 可选的合并与限速（默认关闭，每条提醒单独投递）：合并线程把 coalesce_window 秒内到达的提醒
+  合并成一条汇总通知；超出速率限制时不丢弃，而是继续攒到下一条汇总里
+- 每个输出（sink）一个后台线程和自己的有界队列，慢的弹窗不会拖住 webhook / 文件
+- 同一条规则 dedup_window 秒内只投递一次，价格在目标价附近来回穿越时不会刷屏
+sink 只需实现 Notifier 协议（send_notification）；实现 deliver(notification) 的 sink
+（JsonlSink、WebhookSink）还能拿到结构化的提醒列表。
+每条提醒在主输出投递完成（或被去重 / 丢弃而最终放弃）后回调 on_delivered，供状态库确认后再持久化。
+"""
+import sys
+import json
+import time
+import queue
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional, Sequence, Tuple
+
+from btc_monitor import Alert, asset_name
+from metrics import ALERT_LAG, DISPATCH_COALESCED, DISPATCH_DROPPED, SINK_ERRORS, SINK_LATENCY
+from ratelimit import TokenBucket
+
+# 汇总通知里最多列出的提醒条数
+SUMMARY_LINES = 8
+
+
+class Notification(NamedTuple):
+    """交给 sink 的一条通知；alerts 为合并进来的提醒（直接 send_notification 的通知为空）"""
+    title: str
+    message: str
+    alerts: Tuple[Alert, ...] = ()
+
+
+def rule_key(alert: Alert) -> Hashable:
+    """去重用的规则标识：目标价规则按 (交易对, 方向, 目标价)，增量指标策略自带 dedup_key，指标规则与分片上报的键本身可哈希"""
+    strategy = alert.strategy
+    if hasattr(strategy, 'dedup_key'):
+        return strategy.dedup_key
+    if hasattr(strategy, 'target_price'):
+        return alert.symbol, getattr(strategy, 'direction', 'greater'), strategy.target_price
+    if isinstance(strategy, tuple):
+        return strategy
+    return alert.symbol, alert.title
+
+
+def summarize(alerts: Sequence[Alert]) -> Notification:
+    """多条提醒合并为一条通知"""
+    if len(alerts) == 1:
+        alert = alerts[0]
+        return Notification(alert.title, alert.message, (alert,))
+    symbols = list(dict.fromkeys(a.symbol for a in alerts))
+    title = (f"{asset_name(symbols[0])} Price Alerts ({len(alerts)})" if len(symbols) == 1
+             else f"{len(alerts)} Price Alerts")
+    lines = [f"{asset_name(a.symbol)}: " + " ".join(a.message.split("\n")[1:] or [a.message])
+             for a in alerts[:SUMMARY_LINES]]
+    if len(alerts) > SUMMARY_LINES:
+        lines.append(f"……另有 {len(alerts) - SUMMARY_LINES} 条提醒")
+    return Notification(title, "\n".join(lines), tuple(alerts))
+
+
+def sink_name(sink: Any) -> str:
+    return getattr(sink, 'name', type(sink).__name__)
+
+
+class StdoutSink:
+    name = "stdout"
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def send_notification(self, title: str, message: str) -> None:
+        stream = self.stream or sys.stdout
+        stream.write(f"[{time.strftime('%H:%M:%S')}] {title}\n{message}\n\n")
+        stream.flush()
+
+
+def _payload(notification: Notification) -> dict:
+    return {"ts": time.time(), "title": notification.title, "message": notification.message,
+            "alerts": [{"symbol": a.symbol, "price": a.price, "title": a.title, "message": a.message}
+                       for a in notification.alerts]}
+
+
+class JsonlSink:
+    """每条通知追加一行 JSON，便于其他程序 tail 或事后分析"""
+    name = "jsonl"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def deliver(self, notification: Notification) -> None:
+        self._file.write(json.dumps(_payload(notification), ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def send_notification(self, title: str, message: str) -> None:
+        self.deliver(Notification(title, message))
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class WebhookSink:
+    """把通知以 JSON POST 到本地 webhook（只用标准库，不占用行情请求的会话与限流预算）"""
+    name = "webhook"
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def deliver(self, notification: Notification) -> None:
+        from urllib.request import Request, urlopen
+        body = json.dumps(_payload(notification), ensure_ascii=False).encode('utf-8')
+        request = Request(self.url, data=body, headers={"Content-Type": "application/json"}, method="POST")
+        with urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+    def send_notification(self, title: str, message: str) -> None:
+        self.deliver(Notification(title, message))
+
+
+_STOP = object()
+
+
+class _SinkWorker:
+    def __init__(self, sink: Any, maxsize: int, primary: bool,
+                 on_done: Optional[Callable[[Sequence[Alert]], None]] = None):
+        self.sink = sink
+        self.name = sink_name(sink)
+        self.primary = primary
+        # 只有主输出设置：每条通知处理完（无论成败）后确认其中的提醒
+        self.on_done = on_done
+        self.queue: "queue.Queue" = queue.Queue(maxsize)
+        self.thread = threading.Thread(target=self._run, name=f"sink-{self.name}", daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        while True:
+            notification = self.queue.get()
+            if notification is _STOP:
+                return
+            start = time.perf_counter()
+            # 任何一条通知出错都只记录日志，不能让 sink 线程退出
+            try:
+                if hasattr(self.sink, 'deliver'):
+                    self.sink.deliver(notification)
+                else:
+                    self.sink.send_notification(notification.title, notification.message)
+                finished = time.perf_counter()
+                SINK_LATENCY.observe(finished - start, (self.name,))
+                if self.primary:
+                    for alert in notification.alerts:
+                        if alert.observed_at:
+                            ALERT_LAG.observe(finished - alert.observed_at)
+            except Exception as e:
+                SINK_ERRORS.inc(labels=(self.name,))
+                logging.error(f"Notification sink {self.name} failed: {e}")
+            if self.on_done is not None:
+                try:
+                    self.on_done(notification.alerts)
+                except Exception as e:
+                    logging.error(f"Notification sink {self.name} failed to confirm delivery: {e}")
+
+
+class AlertDispatcher:
+    """
+    交给 MonitorApp 作为 notifier 使用：MonitorApp.deliver 发现 submit() 时改为入队。
+    也实现 send_notification，稍后提醒等直接发出的通知同样走队列（不去重、不合并）。
+    coalesce_window：合并窗口秒数，0（默认）表示不合并；
+    rate / per：每 per 秒最多投递 rate 条通知（突发上限 rate），0（默认）表示不限速。
+    第一个 sink 为主输出，提醒延迟指标按它的投递完成时间统计；
+    on_delivered(alert) 在主输出处理完该提醒或提醒被丢弃后调用（MonitorApp 带状态库时自动设置）。
+    """
+    def __init__(self, sinks: Sequence[Any], maxsize: int = 1000, dedup_window: float = 60.0,
+                 coalesce_window: float = 0.0, rate: float = 0, per: float = 60.0,
+                 sink_queue: int = 100, clock: Callable[[], float] = time.monotonic):
+        if not sinks:
+            raise ValueError("at least one notification sink is required")
+        self.dedup_window = dedup_window
+        self.coalesce_window = coalesce_window
+        self.clock = clock
+        self._queue: "queue.Queue" = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._last_sent: Dict[Hashable, float] = {}
+        self._bucket = TokenBucket(rate, rate / per, clock()) if rate > 0 else None
+        self.on_delivered: Optional[Callable[[Alert], None]] = None
+        self._workers = [_SinkWorker(sink, sink_queue, i == 0, self._settle if i == 0 else None)
+                         for i, sink in enumerate(sinks)]
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="alert-dispatch", daemon=True)
+        self._thread.start()
+
+    @property
+    def sinks(self) -> List[Any]:
+        return [worker.sink for worker in self._workers]
+
+    def submit(self, alert: Alert) -> bool:
+        """非阻塞入队；重复或队列已满时丢弃并返回 False"""
+        key = rule_key(alert)
+        now = self.clock()
+        with self._lock:
+            last = self._last_sent.get(key)
+            if last is not None and now - last < self.dedup_window:
+                DISPATCH_DROPPED.inc(labels=("duplicate",))
+                queued = False
+            else:
+                # 入队成功才记为已发送，队列满被丢弃的提醒下次触发时不会被当作重复
+                queued = self._put(alert)
+                if queued:
+                    self._last_sent[key] = now
+                    if len(self._last_sent) > 10000:
+                        self._expire(now)
+        if not queued:
+            self._settle((alert,))
+        return queued
+
+    def send_notification(self, title: str, message: str) -> None:
+        self._put(Notification(title, message))
+
+    def _put(self, item: Any) -> bool:
+        if self._closed:
+            return False
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            DISPATCH_DROPPED.inc(labels=("queue_full",))
+            logging.warning(f"Notification queue full, dropped: {item.title}")
+            return False
+
+    def _settle(self, alerts: Sequence[Alert]) -> None:
+        if self.on_delivered is None:
+            return
+        for alert in alerts:
+            try:
+                self.on_delivered(alert)
+            except Exception as e:
+                logging.error(f"Delivery callback failed for {alert.symbol}: {e}")
+
+    def _expire(self, now: float) -> None:
+        self._last_sent = {k: t for k, t in self._last_sent.items() if now - t < self.dedup_window}
+
+    def _run(self) -> None:
+        pending: List[Any] = []
+        deadline = 0.0
+        closing = False
+        while True:
+            try:
+                if closing:
+                    item = self._queue.get_nowait()
+                else:
+                    item = self._queue.get(timeout=max(0.0, deadline - self.clock()) if pending else None)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                closing = True
+                continue
+            if item is not None:
+                if not pending:
+                    deadline = self.clock() + self.coalesce_window
+                pending.append(item)
+            if not pending:
+                if closing:
+                    break
+                continue
+            if closing:
+                # 关闭时先取空队列，再不等窗口与额度一次发出
+                if item is None:
+                    self._flush(pending)
+                    pending = []
+                continue
+            now = self.clock()
+            if now < deadline:
+                continue
+            if self._bucket is not None:
+                wait = self._bucket.reserve(1, now)
+                if wait > 0:
+                    # 超出速率：继续攒，等有额度时一并发出
+                    self._bucket.refund(1)
+                    deadline = now + wait
+                    continue
+            self._flush(pending)
+            pending = []
+        for worker in self._workers:
+            worker.queue.put(_STOP)
+
+    def _flush(self, items: List[Any]) -> None:
+        # 按本模块的 Notification 区分：python btc_monitor.py 启动时 btc_monitor 会以 __main__
+        # 再加载一份，提醒可能来自另一份 Alert 类，不能按 Alert 的类判断
+        alerts = [item for item in items if not isinstance(item, Notification)]
+        notifications = [item for item in items if isinstance(item, Notification)]
+        if alerts:
+            if len(alerts) > 1:
+                DISPATCH_COALESCED.inc(len(alerts) - 1)
+            notifications.insert(0, summarize(alerts))
+        for notification in notifications:
+            for worker in self._workers:
+                try:
+                    worker.queue.put_nowait(notification)
+                except queue.Full:
+                    DISPATCH_DROPPED.inc(labels=("sink_backlog",))
+                    logging.warning(f"Notification sink {worker.name} is backlogged, dropped: {notification.title}")
+                    if worker.on_done is not None:
+                        worker.on_done(notification.alerts)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """不再接收新通知；立即发出已排队的通知（不再等合并窗口与速率额度），最多等待 timeout 秒"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        deadline = time.monotonic() + timeout
+        self._thread.join(timeout)
+        for worker in self._workers:
+            worker.thread.join(max(0.0, deadline - time.monotonic()))
+            if hasattr(worker.sink, 'close'):
+                try:
+                    worker.sink.close()
+                except Exception as e:
+                    logging.warning(f"Failed to close notification sink {worker.name}: {e}")
+
+
+def build_sink(spec: str, popup: Any = None) -> Any:
+    """命令行的 sink 描述：popup、stdout、jsonl:PATH、webhook:URL"""
+    kind, _, target = spec.partition(':')
+    if kind == "popup":
+        if popup is None:
+            raise ValueError("popup sink is not available")
+        return popup
+    if kind == "stdout":
+        return StdoutSink()
+    if kind == "jsonl" and target:
+        return JsonlSink(target)
+    if kind == "webhook" and target:
+        return WebhookSink(target)
+    raise ValueError(f"Unknown notification sink '{spec}' (use popup, stdout, jsonl:PATH or webhook:URL)")
@@ -0,0 +1,252 @@
+"""
+异步监控引擎 - 取代 schedule + time.sleep(1) 主循环
+每个监控任务（MonitorJob）是一个独立的 asyncio task：行情获取、策略评估、通知投递都放到线程池并带超时，
+一个任务的慢请求或慢评估不会拖住其他任务。时钟可替换为 FakeClock，在测试中确定性地推进时间。
+"""
+import heapq
+import signal
+import asyncio
+import logging
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional, Protocol, Set
+
+from btc_monitor import Alert, MonitorApp
+
+
+# ==========================================
+# 时钟 (Clocks)
+# ==========================================
+
+class Clock(Protocol):
+    def time(self) -> float:
+        """单调时间（秒）"""
+        ...
+
+    async def sleep(self, delay: float) -> None:
+        ...
+
+
+class RealClock:
+    def time(self) -> float:
+        return asyncio.get_running_loop().time()
+
+    async def sleep(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+
+
+class FakeClock:
+    """
+    测试用的虚拟时钟：sleep() 只登记唤醒时间，直到 advance() 推进时间才返回。
+    配合 MonitorEngine(offload=False) 使用时，任务的执行顺序完全确定。
+    """
+    def __init__(self, start: float = 0.0, settle_rounds: int = 20):
+        self._now = start
+        self._settle_rounds = settle_rounds
+        self._seq = itertools.count()
+        self._sleepers: List[tuple] = []
+
+    def time(self) -> float:
+        return self._now
+
+    async def sleep(self, delay: float) -> None:
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._sleepers, (self._now + max(0.0, delay), next(self._seq), future))
+        await future
+
+    @property
+    def pending(self) -> int:
+        return sum(1 for _, _, f in self._sleepers if not f.done())
+
+    async def settle(self) -> None:
+        """让出事件循环若干轮，使被唤醒的任务运行到下一个 sleep()"""
+        for _ in range(self._settle_rounds):
+            await asyncio.sleep(0)
+
+    async def advance(self, seconds: float) -> None:
+        """把时间推进 seconds 秒，按唤醒时间顺序依次唤醒到期的 sleep()"""
+        target = self._now + seconds
+        await self.settle()
+        while self._sleepers and self._sleepers[0][0] <= target:
+            wake_at, _, future = heapq.heappop(self._sleepers)
+            self._now = max(self._now, wake_at)
+            if not future.done():
+                future.set_result(None)
+                await self.settle()
+        self._now = target
+
+
+# ==========================================
+# 任务与引擎 (Jobs & Engine)
+# ==========================================
+
+class MonitorJob:
+    """一个 MonitorApp 按固定间隔（秒）执行，各自独立的超时设置"""
+    def __init__(self, app: MonitorApp, interval: float, name: Optional[str] = None,
+                 fetch_timeout: float = 30.0, evaluate_timeout: float = 30.0, notify_timeout: float = 15.0):
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        self.app = app
+        self.interval = interval
+        self.name = name or ",".join(app.symbols) or "monitor"
+        self.fetch_timeout = fetch_timeout
+        self.evaluate_timeout = evaluate_timeout
+        self.notify_timeout = notify_timeout
+        self.runs = 0
+        self.failures = 0
+        # 评估超时后线程里的调用仍在运行：持有期间跳过新一轮评估，策略状态不会被两个线程同时修改
+        self.evaluating = threading.Lock()
+
+    def next_delay(self, snapshot: Any) -> float:
+        """本轮结束后到下一轮开始的间隔"""
+        return self.interval
+
+
+class MonitorEngine:
+    """
+    在一个进程里并发运行多个 MonitorJob。
+    - offload=True：阻塞的 fetch / 策略评估 / 通知放进线程池，并用 asyncio.wait_for 限时
+      （超时后线程里的调用仍会自行结束，但不会再阻塞事件循环）
+    - offload=False：在事件循环线程内直接调用，配合 FakeClock 做确定性测试
+    - stop() 可从任意线程调用；run() 返回前会等待已发出的通知结束（或超时）
+    """
+    def __init__(self, jobs: Iterable[MonitorJob] = (), clock: Optional[Clock] = None,
+                 offload: bool = True, max_workers: Optional[int] = None,
+                 snoozes: Any = None, snooze_notifier: Any = None, snooze_poll: float = 1.0):
+        self.jobs: List[MonitorJob] = list(jobs)
+        self.clock = clock or RealClock()
+        self.offload = offload
+        self.max_workers = max_workers
+        # 可选的 snooze.SnoozeScheduler：到期的稍后提醒由 snooze_notifier 重新发出
+        self.snoozes = snoozes
+        self.snooze_notifier = snooze_notifier
+        self.snooze_poll = snooze_poll
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._deliveries: Set[asyncio.Task] = set()
+
+    def add_job(self, job: MonitorJob) -> None:
+        self.jobs.append(job)
+
+    def stop(self) -> None:
+        if self._loop is not None and self._stopping is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+
+    async def run(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        if self.offload:
+            workers = self.max_workers or max(4, 2 * len(self.jobs))
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="monitor")
+        self._install_signal_handlers()
+
+        tasks = [asyncio.create_task(self._run_job(job), name=f"job:{job.name}") for job in self.jobs]
+        if self.snoozes is not None and self.snooze_notifier is not None:
+            tasks.append(asyncio.create_task(self._run_snoozes(), name="snoozes"))
+        try:
+            await self._stopping.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if self._deliveries:
+                await asyncio.gather(*self._deliveries, return_exceptions=True)
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            logging.info("Monitor engine stopped.")
+
+    def _install_signal_handlers(self) -> None:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self._loop.add_signal_handler(sig, self._stopping.set)
+            except (NotImplementedError, RuntimeError, ValueError):
+                # Windows / 非主线程不支持，依赖 KeyboardInterrupt 或 stop()
+                pass
+
+    async def _call(self, func: Callable, *args, timeout: float) -> Any:
+        if not self.offload:
+            return func(*args)
+        return await asyncio.wait_for(self._loop.run_in_executor(self._executor, func, *args), timeout)
+
+    async def _run_job(self, job: MonitorJob) -> None:
+        next_run = self.clock.time()
+        while True:
+            try:
+                snapshot = await self.run_once(job)
+            except Exception as e:
+                # 单轮的任何异常都不能结束任务：记录后按间隔继续调度
+                job.failures += 1
+                logging.exception(f"[{job.name}] Monitor round failed: {e}")
+                snapshot = {}
+            next_run += job.next_delay(snapshot)
+            # 如果本轮耗时超过间隔，不补跑，直接从当前时间重新计时
+            next_run = max(next_run, self.clock.time())
+            await self.clock.sleep(next_run - self.clock.time())
+
+    async def run_once(self, job: MonitorJob) -> dict:
+        """执行一轮：获取快照 -> 评估策略 -> 并发投递通知（不等待投递完成）；返回 {} 表示本轮跳过"""
+        job.runs += 1
+        app = job.app
+        try:
+            snapshot = await self._call(app.fetch_snapshot, timeout=job.fetch_timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"[{job.name}] Price fetch timed out after {job.fetch_timeout}s. Skipping this check.")
+            return {}
+        except Exception as e:
+            logging.error(f"[{job.name}] Price fetch failed: {e}")
+            return {}
+
+        try:
+            alerts = await self._call(self._evaluate, job, snapshot, timeout=job.evaluate_timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"[{job.name}] Strategy evaluation timed out after {job.evaluate_timeout}s.")
+            return {}
+        if alerts is None:
+            return {}
+        for alert in alerts:
+            task = asyncio.create_task(self._deliver(job, alert))
+            self._deliveries.add(task)
+            task.add_done_callback(self._deliveries.discard)
+        return snapshot
+
+    @staticmethod
+    def _evaluate(job: MonitorJob, snapshot: dict) -> Optional[List[Alert]]:
+        """记录快照并评估策略；上一轮超时的评估仍在运行时跳过（返回 None）"""
+        if not job.evaluating.acquire(blocking=False):
+            logging.warning(f"[{job.name}] Previous strategy evaluation is still running. Skipping this check.")
+            return None
+        try:
+            job.app.observe(snapshot)
+            return job.app.collect_alerts(snapshot)
+        finally:
+            job.evaluating.release()
+
+    async def _run_snoozes(self) -> None:
+        """稍后提醒：收取弹窗进程登记的 spool，到期后重新投递；最多每 snooze_poll 秒检查一次"""
+        while True:
+            try:
+                await self._call(self.snoozes.ingest_spool, timeout=self.snooze_poll * 5)
+                for title, message in self.snoozes.pop_due():
+                    logging.info(f"Snooze elapsed, re-sending: {title}")
+                    await self._call(self.snooze_notifier.send_notification, title, message,
+                                     timeout=15.0)
+            except asyncio.TimeoutError:
+                logging.warning("Snooze delivery timed out.")
+            except Exception as e:
+                logging.error(f"Snooze processing failed: {e}")
+            delay = self.snooze_poll
+            next_due = self.snoozes.next_due()
+            if next_due is not None:
+                delay = max(0.0, min(delay, next_due - self.snoozes.clock()))
+            await self.clock.sleep(delay)
+
+    async def _deliver(self, job: MonitorJob, alert: Alert) -> None:
+        try:
+            await self._call(job.app.deliver, alert, timeout=job.notify_timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"[{job.name}] Notification timed out after {job.notify_timeout}s: {alert.title}")
+        except Exception as e:
+            logging.error(f"[{job.name}] Notification failed: {e}")
@@ -0,0 +1,262 @@
+"""
+多行情源对冲请求 - 在线程池上并发查询多个交易所 / 镜像端点
+- mode="first"：先请求最快的一个源；hedge_delay 秒内没有有效结果就追加下一个源（对冲请求），
+  依此类推，采用最先返回的有效结果
+- mode="median"：同时请求所有可用源，等到 deadline，对已到达的结果逐交易对取中位数
+- 连续 ban_after 次慢于 slow_threshold（默认为 timeout 的一半）或失败的源会被暂时禁用 ban_seconds 秒
+任何只要实现 fetch_prices(symbols) 的对象都可以作为源，本地替身服务器即可测试。
+"""
+import time
+import logging
+import statistics
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from btc_monitor import DEFAULT_SYMBOL, BinancePriceFetcher, MultiPriceFetcher
+from http_client import HttpSession, default_session
+from metrics import HEDGED_REQUESTS, SOURCE_BANS
+
+HEDGE_MODES = ("first", "median")
+
+
+class OkxPriceFetcher:
+    """OKX 现货行情；交易对名 BTC-USDT 转换为 BTCUSDT"""
+    BASE_URL = "https://www.okx.com"
+
+    def __init__(self, base_url: Optional[str] = None, session: Optional[HttpSession] = None):
+        self.base_url = (base_url or self.BASE_URL).rstrip('/')
+        self._session = session
+
+    @property
+    def session(self) -> HttpSession:
+        if self._session is None:
+            self._session = default_session()
+        return self._session
+
+    def fetch_prices(self, symbols: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        try:
+            url = f"{self.base_url}/api/v5/market/tickers"
+            data = self.session.get_json(url, params={"instType": "SPOT"})["data"]
+            prices = {item['instId'].replace('-', ''): float(item['last']) for item in data}
+            if symbols is None:
+                return prices
+            return {s: prices[s] for s in symbols if s in prices}
+        except Exception as e:
+            logging.error(f"Failed to fetch prices from OKX: {e}")
+            return {}
+
+
+class BybitPriceFetcher:
+    """Bybit 现货行情，交易对命名与币安一致"""
+    BASE_URL = "https://api.bybit.com"
+
+    def __init__(self, base_url: Optional[str] = None, session: Optional[HttpSession] = None):
+        self.base_url = (base_url or self.BASE_URL).rstrip('/')
+        self._session = session
+
+    @property
+    def session(self) -> HttpSession:
+        if self._session is None:
+            self._session = default_session()
+        return self._session
+
+    def fetch_prices(self, symbols: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        try:
+            url = f"{self.base_url}/v5/market/tickers"
+            params = {"category": "spot"}
+            wanted = None if symbols is None else set(symbols)
+            if wanted is not None and len(wanted) == 1:
+                params["symbol"] = next(iter(wanted))
+            data = self.session.get_json(url, params=params)["result"]["list"]
+            return {item['symbol']: float(item['lastPrice']) for item in data
+                    if wanted is None or item['symbol'] in wanted}
+        except Exception as e:
+            logging.error(f"Failed to fetch prices from Bybit: {e}")
+            return {}
+
+
+# 币安官方提供多个等价的 REST 域名，可直接作为互相对冲的源
+SOURCE_FACTORIES: Dict[str, Callable[[Optional[HttpSession]], MultiPriceFetcher]] = {
+    "binance": lambda session: BinancePriceFetcher(session=session),
+    "binance-api1": lambda session: BinancePriceFetcher(base_url="https://api1.binance.com", session=session),
+    "binance-api2": lambda session: BinancePriceFetcher(base_url="https://api2.binance.com", session=session),
+    "binance-api3": lambda session: BinancePriceFetcher(base_url="https://api3.binance.com", session=session),
+    "okx": lambda session: OkxPriceFetcher(session=session),
+    "bybit": lambda session: BybitPriceFetcher(session=session),
+}
+
+
+def build_sources(names: Sequence[str], session: Optional[HttpSession] = None) -> List["PriceSource"]:
+    unknown = [n for n in names if n not in SOURCE_FACTORIES]
+    if unknown:
+        raise ValueError(f"Unknown price sources: {', '.join(unknown)} (choose from {', '.join(SOURCE_FACTORIES)})")
+    return [PriceSource(name, SOURCE_FACTORIES[name](session)) for name in names]
+
+
+class PriceSource:
+    """一个行情源及其健康状态：延迟 EWMA、连续慢/失败次数、禁用截止时间"""
+    def __init__(self, name: str, fetcher: MultiPriceFetcher):
+        self.name = name
+        self.fetcher = fetcher
+        self.latency = 0.0        # 成功请求耗时的 EWMA（秒），0 表示尚无数据
+        self.inflight = 0
+        self.inflight_since = 0.0  # 最早一个未完成请求的开始时间（perf_counter）
+        self.strikes = 0
+        self.banned_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def expected_latency(self, now: float) -> float:
+        """排序用的预期延迟：还没返回的请求已经等了多久也算进去，慢源不必等首个结果回来就会被排到后面"""
+        if self.inflight:
+            return max(self.latency, now - self.inflight_since)
+        return self.latency
+
+    def __repr__(self) -> str:
+        return f"PriceSource({self.name!r}, latency={self.latency * 1e3:.1f}ms, strikes={self.strikes})"
+
+
+class HedgedPriceFetcher:
+    """
+    组合多个行情源的 MultiPriceFetcher，可直接交给 MonitorApp。
+    hedge_delay：主请求多久没结果就追加下一个源；deadline：median 模式收集结果的截止时间；
+    timeout：一轮最多等待多久（所有源都没有结果时返回空字典，由 MonitorApp 跳过本轮）。
+    slow_threshold：超过多久算慢请求；默认 timeout / 2，正常的 100~300ms REST 延迟不会被判为慢源。
+    hedge_delay / deadline 只决定何时追加请求、何时停止收集，与是否禁用源无关。
+    """
+    def __init__(self, sources: Sequence[PriceSource], symbol: str = DEFAULT_SYMBOL,
+                 mode: str = "first", hedge_delay: float = 0.05, deadline: float = 0.1,
+                 timeout: float = 5.0, slow_threshold: Optional[float] = None,
+                 ban_after: int = 3, ban_seconds: float = 60.0, max_workers: Optional[int] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        if not sources:
+            raise ValueError("at least one price source is required")
+        if mode not in HEDGE_MODES:
+            raise ValueError(f"mode must be one of {HEDGE_MODES}")
+        self.sources = list(sources)
+        self.symbol = symbol
+        self.mode = mode
+        self.hedge_delay = hedge_delay
+        self.deadline = deadline
+        self.timeout = timeout
+        self.slow_threshold = slow_threshold if slow_threshold is not None else timeout / 2
+        self.ban_after = ban_after
+        self.ban_seconds = ban_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        # 被对冲掉的慢请求仍在后台跑完，线程数需覆盖所有源的若干轮
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or 4 * len(self.sources),
+                                            thread_name_prefix="hedged-fetch")
+
+    def fetch_price(self) -> float:
+        return self.fetch_prices([self.symbol]).get(self.symbol, 0.0)
+
+    def fetch_prices(self, symbols: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        wanted = None if symbols is None else sorted(set(symbols))
+        if wanted is not None and not wanted:
+            return {}
+        start = time.perf_counter()
+        queue = self.ranked_sources()
+        futures: Dict[Future, PriceSource] = {}
+        answers: List[Dict[str, float]] = []
+
+        def launch() -> None:
+            source = queue.pop(0)
+            if futures and self.mode == "first":
+                HEDGED_REQUESTS.inc(labels=(source.name,))
+            futures[self._executor.submit(self._query, source, wanted)] = source
+
+        launch()
+        if self.mode == "median":
+            while queue:
+                launch()
+        pending = set(futures)
+        next_hedge = self.hedge_delay
+        while pending:
+            elapsed = time.perf_counter() - start
+            if elapsed >= self.timeout:
+                break
+            limit = self.timeout
+            if queue:
+                limit = min(limit, next_hedge)
+            if self.mode == "median" and answers:
+                limit = min(limit, self.deadline)
+            done, pending = wait(pending, timeout=max(0.0, limit - elapsed), return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if result:
+                    answers.append(result)
+            elapsed = time.perf_counter() - start
+            if answers and (self.mode == "first" or elapsed >= self.deadline or not (pending or queue)):
+                break
+            # 截止前没有有效结果：到点或已有请求失败时追加对冲请求
+            if queue and (elapsed >= next_hedge or not pending):
+                launch()
+                pending = {f for f in futures if not f.done()}
+                next_hedge = elapsed + self.hedge_delay
+
+        if not answers:
+            logging.warning(f"No price source answered within {time.perf_counter() - start:.2f}s")
+            return {}
+        return answers[0] if len(answers) == 1 else merge_median(answers)
+
+    def ranked_sources(self) -> List[PriceSource]:
+        """按延迟 EWMA 排序的可用源；全部被禁用时退回全部源，宁可慢也不能没有价格"""
+        now = self.clock()
+        started = time.perf_counter()
+        with self._lock:
+            active = [s for s in self.sources if s.banned_until <= now] or list(self.sources)
+            # 尚无延迟数据的源保持配置顺序排在前面，让它有机会被测量
+            return sorted(active, key=lambda s: s.expected_latency(started))
+
+    def _query(self, source: PriceSource, wanted: Optional[List[str]]) -> Dict[str, float]:
+        start = time.perf_counter()
+        with self._lock:
+            source.inflight += 1
+            if source.inflight == 1:
+                source.inflight_since = start
+        try:
+            prices = source.fetcher.fetch_prices(wanted)
+        except Exception as e:
+            logging.error(f"Price source {source.name} failed: {e}")
+            prices = {}
+        prices = {s: p for s, p in prices.items() if p > 0}
+        if wanted is not None and any(s not in prices for s in wanted):
+            prices = {}
+        self._record(source, time.perf_counter() - start, bool(prices))
+        return prices
+
+    def _record(self, source: PriceSource, elapsed: float, ok: bool) -> None:
+        with self._lock:
+            source.inflight -= 1
+            source.requests += 1
+            if ok:
+                source.latency = elapsed if source.latency == 0 else 0.8 * source.latency + 0.2 * elapsed
+            else:
+                # 失败按慢请求计入，排到健康源之后；恢复后由 EWMA 拉回
+                source.failures += 1
+                source.latency = max(2 * source.latency, self.slow_threshold)
+            if ok and elapsed <= self.slow_threshold:
+                source.strikes = 0
+                return
+            source.strikes += 1
+            if source.strikes < self.ban_after:
+                return
+            source.strikes = 0
+            source.banned_until = self.clock() + self.ban_seconds
+        SOURCE_BANS.inc(labels=(source.name,))
+        logging.warning(f"Price source {source.name} banned for {self.ban_seconds:g}s "
+                        f"({'slow' if ok else 'failing'}: last request {elapsed * 1e3:.0f}ms)")
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+def merge_median(answers: List[Dict[str, float]]) -> Dict[str, float]:
+    """逐交易对取各源价格的中位数，过滤掉单个源的异常报价"""
+    merged: Dict[str, List[float]] = {}
+    for answer in answers:
+        for symbol, price in answer.items():
+            merged.setdefault(symbol, []).append(price)
+    return {symbol: statistics.median(prices) for symbol, prices in merged.items()}
@@ -0,0 +1,177 @@
+"""
+HTTP 会话层 - 连接池 + keep-alive + 抖动指数退避重试
+所有行情请求复用同一个 requests.Session，避免每次轮询都重新做 TCP+TLS 握手。
+requests 在第一次创建会话时才导入，只导入本模块不会拖慢启动。
+"""
+import time
+import random
+import logging
+import threading
+from collections import deque
+from typing import TYPE_CHECKING, Any, Callable, Deque, List, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+from metrics import FETCH_LATENCY, HTTP_ERRORS, HTTP_RETRIES
+
+if TYPE_CHECKING:
+    import requests
+
+# 可重试的 HTTP 状态码：限流 + 服务端临时错误
+RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+
+
+class RequestTiming(NamedTuple):
+    """单次 HTTP 尝试的耗时记录"""
+    url: str
+    attempt: int
+    status: Optional[int]   # 未拿到响应（连接失败/超时）时为 None
+    elapsed: float          # 秒
+    error: Optional[str]
+
+
+class HttpError(Exception):
+    """重试耗尽后仍然失败"""
+
+
+class HttpSession:
+    """
+    带连接池的 keep-alive 会话。
+    - connect_timeout / read_timeout 分开设置，连接阶段快速失败，读取阶段允许稍慢
+    - 失败时按 full-jitter 指数退避重试：sleep = uniform(0, min(cap, base * 2**attempt))
+    - 每次尝试的耗时写入 timings 环形缓冲，用于观察尾延迟；同时按主机计入 metrics 的延迟直方图与错误/重试计数
+    - 可选的 governor（ratelimit.RateLimitGovernor）：每次尝试前预约请求权重，拿到响应后按响应头校准
+    """
+    def __init__(self,
+                 pool_size: int = 10,
+                 connect_timeout: float = 3.05,
+                 read_timeout: float = 10.0,
+                 max_retries: int = 3,
+                 backoff_base: float = 0.25,
+                 backoff_cap: float = 5.0,
+                 timing_history: int = 512,
+                 governor: Any = None,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.governor = governor
+        self._sleep = sleep
+        self.timings: Deque[RequestTiming] = deque(maxlen=timing_history)
+
+        import requests
+        from requests.adapters import HTTPAdapter
+        self._requests = requests
+        self.session = requests.Session()
+        # 重试由本类自己处理（便于记录每次尝试的耗时），urllib3 层不再重试
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def backoff_delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    def get(self, url: str, params: Optional[dict] = None, stream: bool = False) -> "requests.Response":
+        """
+        GET 请求，可重试的错误会自动重试，最终失败抛出 HttpError。
+        stream=True 时只读完响应头就返回（延迟指标也只统计到这里），正文由调用方用 iter_content 分块读取，
+        读完或出错后调用 response.close() 把连接还给连接池。
+        """
+        requests = self._requests
+        host = (urlsplit(url).netloc,)
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if self.governor is not None:
+                # 预算不足时在这里等待；等待过久抛出 RateLimited（HttpError 子类），不再重试
+                self.governor.acquire(url, params)
+            start = time.perf_counter()
+            status = None
+            retry_after = None
+            try:
+                response = self.session.get(url, params=params, stream=stream,
+                                            timeout=(self.connect_timeout, self.read_timeout))
+                status = response.status_code
+                if self.governor is not None:
+                    self.governor.observe(url, status, response.headers)
+                if status in RETRY_STATUS:
+                    retry_after = _parse_retry_after(response.headers.get('Retry-After'))
+                    raise requests.HTTPError(f"{status} {response.reason}", response=response)
+                response.raise_for_status()
+                elapsed = time.perf_counter() - start
+                self.timings.append(RequestTiming(url, attempt, status, elapsed, None))
+                FETCH_LATENCY.observe(elapsed, host)
+                return response
+            except requests.HTTPError as e:
+                last_error = e
+                if e.response is not None:
+                    # 失败的响应不会交给调用方：关闭它，stream=True 时连接才能回到连接池
+                    e.response.close()
+                self.timings.append(RequestTiming(url, attempt, status, time.perf_counter() - start, str(e)))
+                HTTP_ERRORS.inc(labels=host + (str(status),))
+                if status not in RETRY_STATUS:
+                    break
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = e
+                self.timings.append(RequestTiming(url, attempt, None, time.perf_counter() - start, str(e)))
+                HTTP_ERRORS.inc(labels=host + ("timeout" if isinstance(e, requests.Timeout) else "connection",))
+
+            if attempt < self.max_retries:
+                HTTP_RETRIES.inc(labels=host)
+                delay = self.backoff_delay(attempt)
+                if retry_after is not None:
+                    delay = max(delay, retry_after)
+                logging.warning(f"Request to {url} failed ({last_error}); retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                self._sleep(delay)
+
+        raise HttpError(f"GET {url} failed after {self.max_retries + 1} attempts: {last_error}")
+
+    def get_json(self, url: str, params: Optional[dict] = None) -> Any:
+        return self.get(url, params=params).json()
+
+    def latency_percentile(self, pct: float) -> float:
+        """最近成功请求的耗时分位数（秒），没有记录时返回 0"""
+        samples = sorted(t.elapsed for t in self.timings if t.error is None)
+        if not samples:
+            return 0.0
+        index = min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))
+        return samples[index]
+
+    def recent_timings(self) -> List[RequestTiming]:
+        return list(self.timings)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+_default_session: Optional[HttpSession] = None
+_default_kwargs: dict = {}
+_default_lock = threading.Lock()
+
+
+def default_session() -> HttpSession:
+    """进程内共享的默认会话，所有未显式传入 session 的 fetcher 共用同一个连接池"""
+    global _default_session
+    with _default_lock:
+        if _default_session is None:
+            _default_session = HttpSession(**_default_kwargs)
+        return _default_session
+
+
+def configure_default_session(**kwargs) -> None:
+    """设置默认会话的参数（pool_size、超时、重试次数等），会话在第一次使用时才创建"""
+    global _default_session, _default_kwargs
+    with _default_lock:
+        if _default_session is not None:
+            _default_session.close()
+            _default_session = None
+        _default_kwargs = kwargs
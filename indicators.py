@@ -0,0 +1,312 @@
+"""
+增量指标 - 每个 tick O(1) 更新、内存不随回看长度增长的流式指标，以及基于它们的 AlertStrategy
+- Tick：__slots__ 紧凑记录（交易对编号、时间戳、价格、成交量），交易对名称在进程内驻留为小整数
+- EMA、RSI（Wilder 平滑）：只保存上一次的状态
+- RollingMax / RollingMin：单调双端队列，均摊 O(1)；队列长度不超过窗口内的 tick 数，
+  且只保留仍可能成为极值的价格（单边行情下通常很短）
+- VWAP：按交易时段（默认 UTC 自然日）锚定，只保存 Σ价格×量 与 Σ量
+指标统一为 update(tick) -> 当前值，ready 表示数据是否已足够。
+IndicatorStrategy / PriceCrossStrategy 实现 AlertStrategy 协议：只拿到价格时 should_alert 用本地时钟、
+成交量记为 0；推送流（MonitorApp.on_price_update）与回放（backtest.Replayer）会传入成交时间与成交量。
+"""
+import math
+import time
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from btc_monitor import DEFAULT_SYMBOL, asset_name
+
+_symbol_ids: Dict[str, int] = {}
+_symbol_names: List[str] = []
+_symbol_lock = threading.Lock()
+
+
+def symbol_id(symbol: str) -> int:
+    """交易对名称 -> 进程内固定的小整数编号（首次出现时分配）"""
+    sid = _symbol_ids.get(symbol)
+    if sid is None:
+        with _symbol_lock:
+            sid = _symbol_ids.get(symbol)
+            if sid is None:
+                sid = _symbol_ids[symbol] = len(_symbol_names)
+                _symbol_names.append(symbol)
+    return sid
+
+
+def symbol_name(sid: int) -> str:
+    return _symbol_names[sid]
+
+
+class Tick:
+    """一笔成交或一次报价；ts 为秒（浮点），没有成交量的行情源 volume 为 0"""
+    __slots__ = ('symbol_id', 'ts', 'price', 'volume')
+
+    def __init__(self, symbol_id: int, ts: float, price: float, volume: float = 0.0):
+        self.symbol_id = symbol_id
+        self.ts = ts
+        self.price = price
+        self.volume = volume
+
+    @property
+    def symbol(self) -> str:
+        return symbol_name(self.symbol_id)
+
+    def __repr__(self) -> str:
+        return f"Tick({self.symbol}, ts={self.ts}, price={self.price}, volume={self.volume})"
+
+
+# ==========================================
+# 指标 (Indicators)
+# ==========================================
+
+class EMA:
+    """指数移动平均，alpha = 2 / (period + 1)；以首个价格为种子，period 个 tick 后 ready"""
+    __slots__ = ('period', 'alpha', 'value', 'count')
+    name = "EMA"
+
+    def __init__(self, period: int):
+        if period < 1:
+            raise ValueError("period must be at least 1")
+        self.period = period
+        self.alpha = 2.0 / (period + 1)
+        self.value = math.nan
+        self.count = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= self.period
+
+    @property
+    def label(self) -> str:
+        return f"{self.name}({self.period})"
+
+    def update(self, tick: Tick) -> float:
+        if self.count == 0:
+            self.value = tick.price
+        else:
+            self.value += self.alpha * (tick.price - self.value)
+        self.count += 1
+        return self.value
+
+
+class RSI:
+    """相对强弱指数（Wilder 平滑）：前 period 个涨跌取简单平均，之后按 (n-1)/n 递推"""
+    __slots__ = ('period', 'value', 'count', '_previous', '_gain', '_loss')
+    name = "RSI"
+
+    def __init__(self, period: int = 14):
+        if period < 1:
+            raise ValueError("period must be at least 1")
+        self.period = period
+        self.value = math.nan
+        self.count = 0            # 已计入的涨跌次数
+        self._previous: Optional[float] = None
+        self._gain = 0.0
+        self._loss = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= self.period
+
+    @property
+    def label(self) -> str:
+        return f"{self.name}({self.period})"
+
+    def update(self, tick: Tick) -> float:
+        price = tick.price
+        previous, self._previous = self._previous, price
+        if previous is None:
+            return self.value
+        change = price - previous
+        gain = change if change > 0 else 0.0
+        loss = -change if change < 0 else 0.0
+        self.count += 1
+        period = self.period
+        if self.count <= period:
+            self._gain += gain / period
+            self._loss += loss / period
+            if self.count < period:
+                return self.value
+        else:
+            self._gain = (self._gain * (period - 1) + gain) / period
+            self._loss = (self._loss * (period - 1) + loss) / period
+        if self._loss == 0:
+            self.value = 50.0 if self._gain == 0 else 100.0
+        else:
+            self.value = 100.0 - 100.0 / (1.0 + self._gain / self._loss)
+        return self.value
+
+
+class RollingMax:
+    """
+    最近 window 个 tick（或给出 seconds 时最近 seconds 秒）内的最高价。
+    单调队列里价格严格递减：新价格把队尾不比它高的价格弹出，队首过期时弹出，每个价格至多进出一次。
+    """
+    __slots__ = ('window', 'seconds', 'value', 'count', '_queue')
+    name = "Max"
+    _sign = 1.0
+
+    def __init__(self, window: int = 0, seconds: float = 0.0):
+        if window < 1 and seconds <= 0:
+            raise ValueError("either window or seconds must be positive")
+        self.window = window
+        self.seconds = seconds
+        self.value = math.nan
+        self.count = 0
+        # (序号或时间戳, 带符号的价格)：RollingMin 取负后复用同一套比较
+        self._queue: deque = deque()
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= self.window if self.window else self.count > 0
+
+    @property
+    def label(self) -> str:
+        span = f"{self.seconds:g}s" if self.seconds else str(self.window)
+        return f"{self.name}({span})"
+
+    def update(self, tick: Tick) -> float:
+        queue = self._queue
+        key = tick.ts if self.seconds else self.count
+        signed = self._sign * tick.price
+        while queue and queue[-1][1] <= signed:
+            queue.pop()
+        queue.append((key, signed))
+        self.count += 1
+        oldest = tick.ts - self.seconds if self.seconds else self.count - self.window
+        while queue[0][0] < oldest:
+            queue.popleft()
+        self.value = self._sign * queue[0][1]
+        return self.value
+
+
+class RollingMin(RollingMax):
+    """最近 window 个 tick（或 seconds 秒）内的最低价"""
+    __slots__ = ()
+    name = "Min"
+    _sign = -1.0
+
+
+class VWAP:
+    """
+    时段锚定的成交量加权均价：每 session 秒（按 UTC 对齐，默认一天）清零重新累计。
+    没有成交量的 tick 不影响均价；时段内还没有成交量时 value 为 nan。
+    """
+    __slots__ = ('session', 'value', '_anchor', '_turnover', '_volume')
+    name = "VWAP"
+
+    def __init__(self, session: float = 86400.0):
+        if session <= 0:
+            raise ValueError("session must be positive")
+        self.session = session
+        self.value = math.nan
+        self._anchor: Optional[int] = None
+        self._turnover = 0.0
+        self._volume = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self._volume > 0
+
+    @property
+    def label(self) -> str:
+        return self.name
+
+    def update(self, tick: Tick) -> float:
+        anchor = int(tick.ts // self.session)
+        if anchor != self._anchor:
+            self._anchor = anchor
+            self._turnover = self._volume = 0.0
+            self.value = math.nan
+        if tick.volume > 0:
+            self._turnover += tick.price * tick.volume
+            self._volume += tick.volume
+            self.value = self._turnover / self._volume
+        return self.value
+
+
+# ==========================================
+# 策略 (Strategies)
+# ==========================================
+
+class _TickStrategy:
+    """共同部分：AlertStrategy 的 should_alert 用本地时钟构造 tick；already_alerted 语义与 TargetPriceStrategy 一致"""
+    def __init__(self, indicator, direction: str, symbol: str, clock: Callable[[], float]):
+        if direction not in ("greater", "less"):
+            raise ValueError("direction must be 'greater' or 'less'")
+        self.indicator = indicator
+        self.direction = direction
+        self.symbol = symbol
+        self.symbol_id = symbol_id(symbol)
+        self.clock = clock
+        self.already_alerted = False
+
+    def should_alert(self, current_price: float, ts: Optional[float] = None, volume: float = 0.0) -> bool:
+        """AlertStrategy 接口；推送流 / 回放可额外给出成交时间（秒）与成交量"""
+        return self.on_tick(Tick(self.symbol_id, self.clock() if ts is None else ts, current_price, volume))
+
+    def on_tick(self, tick: Tick) -> bool:
+        triggered = self._triggered(tick)
+        if triggered is None:
+            return False
+        if triggered:
+            if not self.already_alerted:
+                self.already_alerted = True
+                return True
+        else:
+            self.already_alerted = False
+        return False
+
+    def _triggered(self, tick: Tick) -> Optional[bool]:
+        raise NotImplementedError
+
+
+class IndicatorStrategy(_TickStrategy):
+    """指标值越过阈值时提醒一次（例如 RSI(14) ≥ 70），回到另一侧后重新武装"""
+    def __init__(self, indicator, threshold: float, direction: str = "greater",
+                 symbol: str = DEFAULT_SYMBOL, clock: Callable[[], float] = time.time):
+        super().__init__(indicator, direction, symbol, clock)
+        self.threshold = threshold
+
+    @property
+    def dedup_key(self) -> tuple:
+        return self.symbol, self.indicator.label, self.direction, self.threshold
+
+    def _triggered(self, tick: Tick) -> Optional[bool]:
+        value = self.indicator.update(tick)
+        if not self.indicator.ready or math.isnan(value):
+            return None
+        return value >= self.threshold if self.direction == "greater" else value <= self.threshold
+
+    def describe(self, current_price: float) -> str:
+        sign = "≥" if self.direction == "greater" else "≤"
+        return (f"{asset_name(self.symbol)} {self.indicator.label} = {self.indicator.value:.2f}"
+                f"（设定 {sign} {self.threshold:g}）\n当前价格: ${current_price}")
+
+
+class PriceCrossStrategy(_TickStrategy):
+    """
+    价格上穿（greater）/ 下穿（less）指标时提醒，比较的是计入本 tick 之前的指标值：
+    配合 RollingMax / RollingMin 即为突破前 N 个 tick 的高点 / 低点，配合 EMA / VWAP 即为价格穿越均线。
+    """
+    def __init__(self, indicator, direction: str = "greater", symbol: str = DEFAULT_SYMBOL,
+                 clock: Callable[[], float] = time.time):
+        super().__init__(indicator, direction, symbol, clock)
+        self.reference = math.nan
+
+    @property
+    def dedup_key(self) -> tuple:
+        return self.symbol, self.indicator.label, self.direction
+
+    def _triggered(self, tick: Tick) -> Optional[bool]:
+        ready = self.indicator.ready
+        reference = self.reference = self.indicator.value
+        self.indicator.update(tick)
+        if not ready or math.isnan(reference):
+            return None
+        return tick.price > reference if self.direction == "greater" else tick.price < reference
+
+    def describe(self, current_price: float) -> str:
+        word = "上穿" if self.direction == "greater" else "下穿"
+        return f"{asset_name(self.symbol)} 价格{word} {self.indicator.label} (${self.reference:.2f})\n当前价格: ${current_price}"
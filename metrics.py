@@ -0,0 +1,204 @@
+"""
+运行指标 - 进程内计数器 / 直方图，并以 Prometheus 文本格式通过本地 HTTP 端点暴露
+只依赖标准库。热路径上的一次记录只是一次加锁的列表自增（直方图多一次 bisect），开销在微秒以下；
+http.server 在启动端点时才导入，不影响启动耗时。
+用法: python btc_monitor.py --metrics-port 9108  然后访问 http://127.0.0.1:9108/metrics
+"""
+import math
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# 延迟类直方图的默认桶（秒）：1ms ~ 60s
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# 策略评估耗时的桶（秒）：1us ~ 100ms
+EVAL_BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 1e-1)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """单调递增计数器；labels 按 labelnames 的顺序传入值元组"""
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, labels: LabelValues = ()) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, labels: LabelValues = ()) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(v)}" for labels, v in items]
+
+
+class Histogram:
+    """累积桶直方图（Prometheus 语义：le 为上界，含 +Inf 桶、_sum 与 _count）"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = LATENCY_BUCKETS,
+                 labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        # labels -> [各桶计数（非累积，最后一个为 +Inf）..., sum]
+        self._series: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: LabelValues = ()) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, labels: LabelValues = ()) -> int:
+        series = self._series.get(labels)
+        return int(sum(series[:-1])) if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        lines = []
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series[:-1]):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float] = LATENCY_BUCKETS,
+                  labelnames: Sequence[str] = ()) -> Histogram:
+        return self.register(Histogram(name, help_text, buckets, labelnames))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ---------- 监控程序使用的指标 ----------
+
+FETCH_LATENCY = REGISTRY.histogram(
+    "btc_monitor_fetch_latency_seconds", "Latency of successful price HTTP requests", labelnames=("host",))
+HTTP_ERRORS = REGISTRY.counter(
+    "btc_monitor_http_errors_total", "Failed price HTTP attempts by kind (status code, timeout, connection)",
+    labelnames=("host", "kind"))
+HTTP_RETRIES = REGISTRY.counter(
+    "btc_monitor_http_retries_total", "Price HTTP attempts that were retried", labelnames=("host",))
+SKIPPED_CHECKS = REGISTRY.counter(
+    "btc_monitor_skipped_checks_total", "Checks skipped because no valid price was retrieved", labelnames=("symbol",))
+STRATEGY_EVAL = REGISTRY.histogram(
+    "btc_monitor_strategy_eval_seconds", "Time to evaluate all strategies against one snapshot", EVAL_BUCKETS)
+ALERTS = REGISTRY.counter(
+    "btc_monitor_alerts_total", "Alerts triggered", labelnames=("symbol",))
+ALERT_LAG = REGISTRY.histogram(
+    "btc_monitor_alert_lag_seconds", "Delay from price observation to notification delivery")
+STREAM_GAPS = REGISTRY.counter(
+    "btc_monitor_stream_gaps_total", "Gaps detected in the WebSocket price stream", labelnames=("symbol",))
+STREAM_RECONNECTS = REGISTRY.counter(
+    "btc_monitor_stream_reconnects_total", "WebSocket price stream reconnects")
+
+HEDGED_REQUESTS = REGISTRY.counter(
+    "btc_monitor_hedged_requests_total", "Extra requests sent to a backup price source", labelnames=("source",))
+SOURCE_BANS = REGISTRY.counter(
+    "btc_monitor_source_bans_total", "Price sources temporarily banned for being slow or failing",
+    labelnames=("source",))
+
+RATE_LIMIT_WAIT = REGISTRY.counter(
+    "btc_monitor_rate_limit_wait_seconds_total", "Time requests waited for rate-limit budget", labelnames=("group",))
+
+DISPATCH_DROPPED = REGISTRY.counter(
+    "btc_monitor_dispatch_dropped_total", "Notifications dropped by the dispatcher (duplicate, queue_full, sink_backlog)",
+    labelnames=("reason",))
+DISPATCH_COALESCED = REGISTRY.counter(
+    "btc_monitor_dispatch_coalesced_total", "Alerts merged into another alert's summary notification")
+SINK_ERRORS = REGISTRY.counter(
+    "btc_monitor_sink_errors_total", "Failed deliveries by notification sink", labelnames=("sink",))
+SINK_LATENCY = REGISTRY.histogram(
+    "btc_monitor_sink_latency_seconds", "Time a notification sink took to deliver", labelnames=("sink",))
+
+
+def start_http_server(port: int, host: str = "127.0.0.1",
+                      registry: Optional[Registry] = None) -> "ThreadingHTTPServer":
+    """在后台线程里提供 /metrics，返回 server（调用 shutdown() 停止）"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    registry = registry or REGISTRY
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
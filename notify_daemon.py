@@ -0,0 +1,362 @@
+"""
+常驻通知服务 - 一个 UI 进程负责所有弹窗，监控程序通过本地 TCP 连接发送通知
+取代"每条提醒启动一个 pythonw popup.py 进程"：解释器启动与 tkinter 导入只发生一次，
+突发的大量提醒只会进入有界队列，同时显示的弹窗数量也有上限。
+
+协议：每行一个 JSON。连接后的第一行必须是认证请求，令牌由服务进程启动时生成，
+写入只有当前用户可读的令牌文件（默认 ~/.btc_monitor/notify-<port>.token）；
+本机其他用户或进程即使连得上端口，不知道令牌也发不了通知。
+  认证  {"op": "auth", "token": "..."}              失败时应答 {"status": "unauthorized"} 并断开
+  请求  {"op": "notify", "id": 1, "title": "...", "message": "..."}
+        {"op": "ping"}
+  应答  {"id": 1, "status": "queued" | "dropped"}       收到后立即应答
+        {"id": 1, "status": "shown"}                    弹窗显示时
+        {"id": 1, "status": "done" | "close"}           用户操作后
+        {"id": 1, "status": "snooze", "seconds": 900, "title": "...", "message": "..."}
+        {"status": "pong"}
+用法: pythonw notify_daemon.py [--port 47831]
+"""
+import os
+import sys
+import hmac
+import json
+import time
+import queue
+import socket
+import math
+import logging
+import secrets
+import argparse
+import itertools
+import threading
+import subprocess
+import socketserver
+from collections import deque
+from typing import Callable, Dict, Optional
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 47831
+DAEMON_SCRIPT = os.path.abspath(__file__)
+# 客户端发现服务进程已退出时，两次启动之间至少间隔这么久（秒），避免无法启动时反复拉起进程
+RESPAWN_INTERVAL = 30.0
+
+# 用户操作回调：(id, status, payload)
+ActionCallback = Callable[[int, str, dict], None]
+
+
+def default_token_file(port: int) -> str:
+    return os.path.join(os.path.expanduser('~'), '.btc_monitor', f'notify-{port}.token')
+
+
+def write_token(path: str) -> str:
+    """生成新令牌并写入只有当前用户可读写的文件（目录 0700、文件 0600）"""
+    token = secrets.token_hex(16)
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    tmp = path + ".tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        f.write(token)
+    os.replace(tmp, path)
+    return token
+
+
+def read_token(path: str) -> str:
+    with open(path, encoding='ascii') as f:
+        return f.read().strip()
+
+
+# ==========================================
+# 服务端 (Daemon)
+# ==========================================
+
+class NotifyDaemon:
+    """
+    单进程弹窗服务。网络线程只负责收发，所有 Tk 操作都在主线程：
+    网络线程把请求放进 inbox，主线程用 root.after 轮询取出、排队、显示。
+    """
+    POLL_MS = 50
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 max_visible: int = 3, max_queue: int = 100, token_file: Optional[str] = None):
+        self.host = host
+        self.port = port
+        self.token_file = token_file or default_token_file(port)
+        self.token = ""
+        self.max_visible = max_visible
+        self.max_queue = max_queue
+        self.inbox: "queue.Queue[tuple]" = queue.Queue()
+        self.waiting: deque = deque()
+        self.visible: Dict[int, object] = {}   # slot -> popup
+        self._server: Optional[socketserver.ThreadingTCPServer] = None
+        self._root = None
+
+    def start_server(self) -> None:
+        """在后台线程里开始监听；令牌在绑定端口之后、开始接受连接之前写入"""
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                lock = threading.Lock()
+
+                def reply(obj):
+                    data = (json.dumps(obj, ensure_ascii=False) + "\n").encode('utf-8')
+                    with lock:
+                        try:
+                            self.wfile.write(data)
+                            self.wfile.flush()
+                        except OSError:
+                            pass   # 客户端已断开，丢弃应答
+
+                if not daemon.authenticate(self.rfile.readline()):
+                    reply({"status": "unauthorized"})
+                    return
+                for line in self.rfile:
+                    try:
+                        request = json.loads(line)
+                    except ValueError:
+                        continue
+                    daemon.handle_request(request, reply)
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        socketserver.ThreadingTCPServer.daemon_threads = True
+        self._server = socketserver.ThreadingTCPServer((self.host, self.port), Handler, bind_and_activate=False)
+        try:
+            # 端口已被占用（另一个服务进程在运行）时在这里失败，不会覆盖它的令牌
+            self._server.server_bind()
+            self.port = self._server.server_address[1]
+            self.token = write_token(self.token_file)
+            self._server.server_activate()
+        except OSError:
+            self._server.server_close()
+            raise
+        threading.Thread(target=self._server.serve_forever, name="notify-server", daemon=True).start()
+        logging.info(f"Notification daemon listening on {self.host}:{self.port}")
+
+    def stop_server(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def authenticate(self, line: bytes) -> bool:
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return False
+        token = request.get('token') if isinstance(request, dict) and request.get('op') == 'auth' else None
+        return isinstance(token, str) and hmac.compare_digest(token, self.token)
+
+    def serve(self) -> None:
+        import tkinter as tk
+
+        self.start_server()
+        root = self._root = tk.Tk()
+        root.withdraw()   # 隐藏的根窗口，弹窗都是它的 Toplevel
+        root.after(self.POLL_MS, self._pump)
+        try:
+            root.mainloop()
+        finally:
+            self.stop_server()
+
+    def handle_request(self, request: dict, reply: Callable[[dict], None]) -> None:
+        """在网络线程中调用"""
+        op = request.get('op', 'notify')
+        if op == 'ping':
+            reply({"status": "pong"})
+            return
+        if op != 'notify':
+            return
+        msg_id = request.get('id')
+        if self.inbox.qsize() + len(self.waiting) >= self.max_queue:
+            reply({"id": msg_id, "status": "dropped"})
+            return
+        self.inbox.put((msg_id, request.get('title', ''), request.get('message', ''), reply))
+        reply({"id": msg_id, "status": "queued"})
+
+    def _pump(self) -> None:
+        """Tk 主线程：取出新请求并尽量填满可见槽位"""
+        while True:
+            try:
+                self.waiting.append(self.inbox.get_nowait())
+            except queue.Empty:
+                break
+        while self.waiting and len(self.visible) < self.max_visible:
+            self._show(self.waiting.popleft())
+        self._root.after(self.POLL_MS, self._pump)
+
+    def _show(self, item: tuple) -> None:
+        from popup import TickTickPopup
+
+        msg_id, title, message, reply = item
+        slot = next(i for i in itertools.count() if i not in self.visible)
+
+        def on_action(action):
+            self.visible.pop(slot, None)
+            if isinstance(action, tuple) and action[0] == "snooze":
+                reply({"id": msg_id, "status": "snooze", "seconds": action[1],
+                       "title": title, "message": message})
+            else:
+                reply({"id": msg_id, "status": action})
+
+        popup = TickTickPopup(title, message, on_action=on_action, slot=slot)
+        popup.show_in(self._root)
+        self.visible[slot] = popup
+        reply({"id": msg_id, "status": "shown"})
+
+
+# ==========================================
+# 客户端 (Notifier)
+# ==========================================
+
+class DaemonNotifier:
+    """
+    实现 Notifier 协议：通过常驻连接把通知发给 NotifyDaemon，等待 "queued" 应答后返回。
+    - 连接不上时（spawn=True）启动服务进程；服务进程之后退出的话，下次连接失败时重新启动
+      （两次启动至少间隔 respawn_interval 秒）
+    - 每个连接先用令牌文件里的令牌认证
+    - 服务不可用时退回 fallback（例如 WindowsToastNotifier）
+    - 之后的 shown / done / snooze 应答由后台线程读取，交给 on_action 回调
+    """
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, spawn: bool = True,
+                 ack_timeout: float = 5.0, startup_timeout: float = 10.0,
+                 fallback=None, on_action: Optional[ActionCallback] = None,
+                 token_file: Optional[str] = None, respawn_interval: float = RESPAWN_INTERVAL):
+        self.host = host
+        self.port = port
+        self.spawn = spawn
+        self.token_file = token_file or default_token_file(port)
+        self.respawn_interval = respawn_interval
+        self.ack_timeout = ack_timeout
+        self.startup_timeout = startup_timeout
+        self.fallback = fallback
+        self.on_action = on_action
+        self._ids = itertools.count(1)
+        self._sock: Optional[socket.socket] = None
+        self._lock = threading.Lock()
+        # id -> [Event, 首个应答状态]，等待 queued / dropped
+        self._pending: Dict[int, list] = {}
+        self._process: Optional[subprocess.Popen] = None
+        self._spawned_at = -math.inf
+
+    def send_notification(self, title: str, message: str) -> None:
+        msg_id = next(self._ids)
+        pending = self._pending[msg_id] = [threading.Event(), None]
+        line = json.dumps({"op": "notify", "id": msg_id, "title": title, "message": message},
+                          ensure_ascii=False) + "\n"
+        try:
+            with self._lock:
+                sock = self._connect()
+                sock.sendall(line.encode('utf-8'))
+            if not pending[0].wait(self.ack_timeout):
+                raise TimeoutError(f"no ack within {self.ack_timeout}s")
+            if pending[1] == "dropped":
+                logging.warning(f"Notification daemon queue full, dropped: {title}")
+        except Exception as e:
+            logging.error(f"Notification daemon unavailable ({e}); using fallback notifier.")
+            with self._lock:
+                self._disconnect()
+            if self.fallback is not None:
+                self.fallback.send_notification(title, message)
+        finally:
+            self._pending.pop(msg_id, None)
+
+    def close(self) -> None:
+        with self._lock:
+            self._disconnect()
+
+    def _connect(self) -> socket.socket:
+        if self._sock is not None:
+            return self._sock
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=1.0)
+        except OSError:
+            if not self._may_spawn():
+                raise
+            self._spawn_daemon()
+            sock = self._wait_for_daemon()
+        try:
+            auth = {"op": "auth", "token": read_token(self.token_file)}
+            sock.sendall((json.dumps(auth) + "\n").encode('utf-8'))
+        except OSError:
+            sock.close()
+            raise
+        sock.settimeout(None)
+        self._sock = sock
+        threading.Thread(target=self._read_acks, args=(sock,), name="notify-acks", daemon=True).start()
+        return sock
+
+    def _disconnect(self) -> None:
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    def _may_spawn(self) -> bool:
+        if not self.spawn:
+            return False
+        if self._process is not None and self._process.poll() is None:
+            # 上次启动的进程还活着（可能仍在初始化），不再重复启动
+            return False
+        return time.monotonic() - self._spawned_at >= self.respawn_interval
+
+    def _spawn_daemon(self) -> None:
+        self._spawned_at = time.monotonic()
+        pythonw = sys.executable.replace('python.exe', 'pythonw.exe')
+        kwargs = {}
+        if sys.platform == "win32":
+            kwargs['creationflags'] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            kwargs['start_new_session'] = True
+        self._process = subprocess.Popen(
+            [pythonw, DAEMON_SCRIPT, '--host', self.host, '--port', str(self.port), '--token-file', self.token_file],
+            close_fds=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, **kwargs)
+        logging.info(f"Started notification daemon on port {self.port}")
+
+    def _wait_for_daemon(self) -> socket.socket:
+        deadline = time.monotonic() + self.startup_timeout
+        while True:
+            try:
+                return socket.create_connection((self.host, self.port), timeout=1.0)
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.1)
+
+    def _read_acks(self, sock: socket.socket) -> None:
+        try:
+            for line in sock.makefile('r', encoding='utf-8'):
+                try:
+                    ack = json.loads(line)
+                except ValueError:
+                    continue
+                msg_id = ack.get('id')
+                status = ack.get('status')
+                if msg_id is None:
+                    continue
+                if status in ("queued", "dropped"):
+                    pending = self._pending.get(msg_id)
+                    if pending is not None:
+                        pending[1] = status
+                        pending[0].set()
+                elif self.on_action is not None:
+                    self.on_action(msg_id, status, ack)
+        except OSError:
+            pass
+        # 服务进程退出或拒绝了认证：丢弃这个连接，下一条通知重新连接（必要时重新启动服务进程）
+        with self._lock:
+            if self._sock is sock:
+                self._disconnect()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="BTC Monitor notification daemon")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--max-visible', type=int, default=3, help='Popups shown at the same time')
+    parser.add_argument('--max-queue', type=int, default=100, help='Pending popups before new ones are dropped')
+    parser.add_argument('--token-file', help='Where to write the client token (default ~/.btc_monitor/notify-PORT.token)')
+    args = parser.parse_args()
+    NotifyDaemon(args.host, args.port, args.max_visible, args.max_queue, args.token_file).serve()
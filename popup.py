@@ -1,10 +1,9 @@
 """
 独立弹窗脚本 - 滴答清单风格 UI
 由 btc_monitor.py 通过 subprocess 调用
-用法: pythonw popup.py "标题" "消息内容"
+用法: pythonw popup.py "标题" "消息内容" [稍后提醒状态文件]
 """
 import sys
-import subprocess
 import tkinter as tk
 from tkinter import font as tkfont
 import time
@@ -78,15 +77,29 @@ class TickTickPopup:
     """
     WIDTH  = 340
     HEIGHT = 165
+    GAP    = 10    # 多个弹窗叠放时的间距
 
-    def __init__(self, title, message):
+    def __init__(self, title, message, on_action=None, slot=0):
         self.title_text   = title
         self.message_text = message
         self.action       = None
+        # on_action(action)：弹窗关闭时回调（常驻通知服务用）；slot：自下而上的叠放位置
+        self.on_action    = on_action
+        self.slot         = slot
 
     def show(self):
+        """独立进程模式：自建 Tk 根窗口并阻塞到用户操作结束"""
+        self._build(tk.Tk())
+        self.root.mainloop()
+        return self.action
+
+    def show_in(self, master):
+        """常驻服务模式：在共享的 Tk 根窗口下创建 Toplevel，不阻塞"""
+        self._build(tk.Toplevel(master))
+
+    def _build(self, root):
         W, H = self.WIDTH, self.HEIGHT
-        root = self.root = tk.Tk()
+        self.root = root
         root.overrideredirect(True)
         root.wm_attributes("-topmost", True)
         root.configure(bg="#d0d0d0")   # 阴影色边框
@@ -96,7 +109,7 @@ class TickTickPopup:
         sw = root.winfo_screenwidth()
         sh = root.winfo_screenheight()
         rx = sw - W - 20
-        ry = sh - H - 60
+        ry = sh - H - 60 - self.slot * (H + self.GAP)
         root.geometry(f"{W}x{H}+{rx}+{ry}")
 
         # 外层阴影边框 (1px 灰色)
@@ -168,16 +181,17 @@ class TickTickPopup:
         self._snooze_btn.config(command=lambda: self._on_snooze_click(rx, ry, H))
         self._snooze_btn.pack(fill="both")
 
-        root.mainloop()
-        return self.action
+    def _finish(self, action):
+        self.action = action
+        self.root.destroy()
+        if self.on_action is not None:
+            self.on_action(action)
 
     def _on_done(self):
-        self.action = "done"
-        self.root.destroy()
+        self._finish("done")
 
     def _on_close(self):
-        self.action = "close"
-        self.root.destroy()
+        self._finish("close")
 
     def _on_snooze_click(self, win_x, win_y, win_h):
         """在稍后提醒按钮上方弹出时间选择菜单"""
@@ -189,30 +203,27 @@ class TickTickPopup:
         self.root.wait_window(picker.win)
 
         if picker.result_seconds is not None:
-            self.action = ("snooze", picker.result_seconds)
-            self.root.destroy()
+            self._finish(("snooze", picker.result_seconds))
         # 如果取消（点击菜单外），主弹窗继续
 
 
-def start_alert_loop(title, message):
+def start_alert_loop(title, message, snooze_file=None):
     """
     显示弹窗，处理用户动作。
-    稍后提醒：休眠结束后重新以子进程启动自身。
-    （tkinter 同一进程不支持多个 Tk() 根窗口，故用子进程方案）
+    稍后提醒：不在本进程里 sleep，而是登记到监控程序的稍后提醒 spool 后立即退出，
+    由监控程序的 SnoozeScheduler 到期后重新发出通知。
     """
     popup = TickTickPopup(title, message)
     action = popup.show()
 
     if isinstance(action, tuple) and action[0] == "snooze":
-        seconds = action[1]
-        time.sleep(seconds)
-        # 用 pythonw.exe 重新启动自身（无控制台黑窗口）
-        pythonw = sys.executable.replace("python.exe", "pythonw.exe")
-        subprocess.Popen([pythonw, __file__, title, message])
+        from snooze import DEFAULT_STATE_FILE, append_spool
+        append_spool(snooze_file or DEFAULT_STATE_FILE, time.time() + action[1], title, message)
     # "done" 或 "close" 时退出
 
 
 if __name__ == "__main__":
     title   = sys.argv[1] if len(sys.argv) > 1 else "BTC Alert"
     message = sys.argv[2] if len(sys.argv) > 2 else "BTC 价格已达到目标！"
-    start_alert_loop(title, message)
+    snooze_file = sys.argv[3] if len(sys.argv) > 3 else None
+    start_alert_loop(title, message, snooze_file)
@@ -0,0 +1,195 @@
+"""
+紧凑的追加式行情历史存储 - 每个交易对一个二进制文件，内存映射读取
+记录格式：16 字节文件头 + 定长记录 (int64 毫秒时间戳, float64 价格)，每个 tick 16 字节，
+一个月的秒级数据约 41 MB。读取时直接把文件映射成 NumPy 结构化数组（零拷贝），
+时间范围查询用二分（时间戳单调不减），并可降采样为 OHLC K 线。
+"""
+import os
+import mmap
+import time
+import struct
+import logging
+from typing import Dict, Optional
+
+import numpy as np
+
+MAGIC = b"BTCMTK01"
+HEADER = struct.Struct("<8sQ")          # magic + 保留字段
+RECORD = struct.Struct("<qd")           # ts_ms, price
+TICK_DTYPE = np.dtype([('ts', '<i8'), ('price', '<f8')])
+OHLC_DTYPE = np.dtype([('ts', '<i8'), ('open', '<f8'), ('high', '<f8'),
+                       ('low', '<f8'), ('close', '<f8'), ('count', '<i8')])
+FILE_SUFFIX = ".ticks"
+
+
+def read_ticks(path: str) -> np.ndarray:
+    """
+    只读打开一个 tick 文件（回放、分析用）：不创建、不截断、不写入，返回零拷贝的结构化数组。
+    末尾写了一半的记录直接忽略；文件句柄随即关闭，映射由返回的数组持有。
+    """
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size or HEADER.unpack(header)[0] != MAGIC:
+            raise ValueError(f"{path} is not a tick history file")
+        count = (os.fstat(f.fileno()).st_size - HEADER.size) // RECORD.size
+        if count == 0:
+            return np.empty(0, dtype=TICK_DTYPE)
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return np.frombuffer(mm, dtype=TICK_DTYPE, count=count, offset=HEADER.size)
+
+
+class SymbolHistory:
+    """单个交易对的 tick 文件：追加写入，mmap 零拷贝读取"""
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'ab+')
+        self._file.seek(0, os.SEEK_END)
+        size = self._file.tell()
+        if size == 0:
+            self._file.write(HEADER.pack(MAGIC, 0))
+            self._file.flush()
+            size = HEADER.size
+        else:
+            self._file.seek(0)
+            magic, _ = HEADER.unpack(self._file.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a tick history file")
+            # 截掉崩溃时可能写了一半的尾部记录
+            tail = (size - HEADER.size) % RECORD.size
+            if tail:
+                logging.warning(f"Truncating {tail} trailing bytes of partial record in {path}")
+                self._file.truncate(size - tail)
+                size -= tail
+            self._file.seek(0, os.SEEK_END)
+        self._count = (size - HEADER.size) // RECORD.size
+        self._last_ts = self._read_last_ts()
+        self._mm: Optional[mmap.mmap] = None
+        self._mapped_count = -1
+
+    def _read_last_ts(self) -> Optional[int]:
+        if self._count == 0:
+            return None
+        self._file.seek(HEADER.size + (self._count - 1) * RECORD.size)
+        ts, _ = RECORD.unpack(self._file.read(RECORD.size))
+        self._file.seek(0, os.SEEK_END)
+        return ts
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, ts: float, price: float) -> None:
+        """追加一个 tick；ts 为秒级 Unix 时间，必须单调不减（保证二分查询有效）"""
+        ts_ms = int(round(ts * 1000))
+        if self._last_ts is not None and ts_ms < self._last_ts:
+            raise ValueError(f"out-of-order tick for {self.path}: {ts_ms} < {self._last_ts}")
+        self._file.write(RECORD.pack(ts_ms, price))
+        self._last_ts = ts_ms
+        self._count += 1
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def view(self) -> np.ndarray:
+        """全部 tick 的只读结构化数组视图（字段 ts / price），不复制数据"""
+        if self._mapped_count != self._count:
+            self.flush()
+            self._release_map()
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped_count = self._count
+        return np.frombuffer(self._mm, dtype=TICK_DTYPE, count=self._count, offset=HEADER.size)
+
+    def _release_map(self) -> None:
+        """关闭上一次的映射；之前返回的数组视图仍在使用时无法关闭，只能交给 GC"""
+        if self._mm is not None:
+            try:
+                self._mm.close()
+            except BufferError:
+                pass
+            self._mm = None
+            self._mapped_count = -1
+
+    def range(self, start: Optional[float] = None, end: Optional[float] = None) -> np.ndarray:
+        """[start, end) 时间范围内的 tick（秒级时间），O(log n) 定位，返回零拷贝切片"""
+        ticks = self.view()
+        ts = ticks['ts']
+        lo = 0 if start is None else int(np.searchsorted(ts, int(round(start * 1000)), side='left'))
+        hi = len(ticks) if end is None else int(np.searchsorted(ts, int(round(end * 1000)), side='left'))
+        return ticks[lo:hi]
+
+    def ohlc(self, period: float, start: Optional[float] = None, end: Optional[float] = None) -> np.ndarray:
+        """按 period 秒降采样为 OHLC（K 线时间戳为桶起点，毫秒），空桶不输出"""
+        ticks = self.range(start, end)
+        if len(ticks) == 0:
+            return np.empty(0, dtype=OHLC_DTYPE)
+        period_ms = int(round(period * 1000))
+        if period_ms <= 0:
+            raise ValueError("period must be positive")
+        prices = ticks['price']
+        buckets = ticks['ts'] // period_ms
+        boundaries = np.flatnonzero(np.diff(buckets)) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(ticks)]))
+
+        bars = np.empty(len(starts), dtype=OHLC_DTYPE)
+        bars['ts'] = buckets[starts] * period_ms
+        bars['open'] = prices[starts]
+        bars['close'] = prices[ends - 1]
+        bars['high'] = np.maximum.reduceat(prices, starts)
+        bars['low'] = np.minimum.reduceat(prices, starts)
+        bars['count'] = ends - starts
+        return bars
+
+    def close(self) -> None:
+        self._release_map()
+        self._file.close()
+
+
+class PriceHistory:
+    """按交易对分文件的历史存储目录，MonitorApp 每拿到一份快照就调用 record()"""
+    def __init__(self, root: str, flush_every: int = 256, flush_interval: float = 1.0):
+        self.root = root
+        # 攒批写盘：达到条数或距上次写盘超过 flush_interval 秒时 flush
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._symbols: Dict[str, SymbolHistory] = {}
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+        os.makedirs(root, exist_ok=True)
+
+    def symbol(self, symbol: str) -> SymbolHistory:
+        history = self._symbols.get(symbol)
+        if history is None:
+            history = SymbolHistory(os.path.join(self.root, symbol + FILE_SUFFIX))
+            self._symbols[symbol] = history
+        return history
+
+    def symbols(self):
+        """目录中已有历史数据的交易对"""
+        return sorted(name[:-len(FILE_SUFFIX)] for name in os.listdir(self.root) if name.endswith(FILE_SUFFIX))
+
+    def record(self, snapshot: Dict[str, float], ts: Optional[float] = None) -> None:
+        ts = time.time() if ts is None else ts
+        for symbol, price in snapshot.items():
+            if price <= 0:
+                continue
+            try:
+                self.symbol(symbol).append(ts, price)
+            except ValueError as e:
+                logging.warning(f"Dropping history tick: {e}")
+                continue
+            self._unflushed += 1
+        if self._unflushed >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        for history in self._symbols.values():
+            history.flush()
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        """写盘并关闭所有文件；退出前必须调用，否则缓冲区里的 tick 会丢失"""
+        self.flush()
+        for history in self._symbols.values():
+            history.close()
+        self._symbols.clear()
@@ -0,0 +1,234 @@
+"""
+WebSocket 推送行情源 - 订阅币安 trade / miniTicker 组合流
+每条推送都会立即交给回调（通常是 MonitorApp.evaluate），不再等待轮询间隔。
+带自动重连（抖动指数退避）、心跳检测与数据缺口检测。
+"""
+import json
+import time
+import random
+import logging
+import threading
+from typing import Callable, Dict, Iterable, Optional, Sequence
+
+import websocket
+
+from btc_monitor import DEFAULT_SYMBOL, MultiPriceFetcher
+from metrics import STREAM_GAPS, STREAM_RECONNECTS
+
+# 回调签名：(symbol, price, event_time_ms, volume)；volume 为 trade 流的成交量，miniTicker 流为 0
+PriceCallback = Callable[[str, float, int, float], None]
+# 缺口回调签名：(symbol, reason)
+GapCallback = Callable[[str, str], None]
+
+STREAM_KINDS = ("miniTicker", "trade")
+
+
+class BinanceStreamFetcher:
+    """
+    通过 WebSocket 推送获取行情的 PriceFetcher。
+    - fetch_price / fetch_prices 返回最近一次推送的缓存价格，可直接替换轮询 fetcher
+    - start(on_update) 启动后台线程，每条推送都会调用 on_update
+    - 心跳：heartbeat_timeout 秒无任何数据时主动 ping，再等一个周期仍无响应则重连
+    - 缺口：trade 流按成交 ID 连续性检测；重连后所有交易对都视为缺口。
+      miniTicker 只在价格变化时推送，冷门交易对安静几分钟是常态，所以按事件时间间隔检测默认关闭，
+      需要时设置 gap_threshold（秒）。检测到缺口时若配置了 resync_fetcher，用一次 REST 快照补齐全部受影响的交易对
+    """
+    STREAM_URL = "wss://stream.binance.com:9443"
+
+    def __init__(self,
+                 symbols: Iterable[str] = (DEFAULT_SYMBOL,),
+                 stream: str = "miniTicker",
+                 url: Optional[str] = None,
+                 heartbeat_timeout: float = 30.0,
+                 gap_threshold: float = 0.0,
+                 reconnect_base: float = 0.5,
+                 reconnect_cap: float = 30.0,
+                 resync_fetcher: Optional[MultiPriceFetcher] = None,
+                 on_gap: Optional[GapCallback] = None):
+        if stream not in STREAM_KINDS:
+            raise ValueError(f"stream must be one of {STREAM_KINDS}, got {stream!r}")
+        self.symbols = sorted({s.upper() for s in symbols})
+        self.stream = stream
+        self.url = (url or self.STREAM_URL).rstrip('/')
+        self.heartbeat_timeout = heartbeat_timeout
+        self.gap_threshold = gap_threshold
+        self.reconnect_base = reconnect_base
+        self.reconnect_cap = reconnect_cap
+        self.resync_fetcher = resync_fetcher
+        self.on_gap = on_gap
+
+        self.prices: Dict[str, float] = {}
+        self.gap_count = 0
+        self.reconnect_count = 0
+        self._last_event_time: Dict[str, int] = {}
+        self._last_trade_id: Dict[str, int] = {}
+        self._on_update: Optional[PriceCallback] = None
+        self._ws = None
+        self._received = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._connected = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- PriceFetcher 接口 ----------
+
+    def fetch_price(self) -> float:
+        with self._lock:
+            return self.prices.get(self.symbols[0], 0.0) if self.symbols else 0.0
+
+    def fetch_prices(self, symbols: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        with self._lock:
+            if symbols is None:
+                return dict(self.prices)
+            return {s: self.prices[s] for s in symbols if s in self.prices}
+
+    # ---------- 生命周期 ----------
+
+    @property
+    def stream_url(self) -> str:
+        streams = "/".join(f"{s.lower()}@{self.stream}" for s in self.symbols)
+        return f"{self.url}/stream?streams={streams}"
+
+    def start(self, on_update: Optional[PriceCallback] = None) -> None:
+        self._on_update = on_update
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="price-stream", daemon=True)
+        self._thread.start()
+
+    def wait_connected(self, timeout: Optional[float] = None) -> bool:
+        return self._connected.wait(timeout)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        ws = self._ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # ---------- 内部实现 ----------
+
+    def _run(self) -> None:
+        attempt = 0
+        while not self._stop.is_set():
+            try:
+                self._ws = websocket.create_connection(self.stream_url, timeout=self.heartbeat_timeout)
+                logging.info(f"Price stream connected: {self.stream_url}")
+                if self.reconnect_count:
+                    # 断线期间的推送已丢失，按缺口处理；连续性从新连接重新计算
+                    self._last_trade_id.clear()
+                    self._last_event_time.clear()
+                    self._report_gap(self.symbols, "reconnect")
+                self._connected.set()
+                self._received = False
+                self._read_loop(self._ws)
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                logging.warning(f"Price stream error: {e}")
+            finally:
+                self._connected.clear()
+                if self._ws is not None:
+                    try:
+                        self._ws.close()
+                    except Exception:
+                        pass
+                    self._ws = None
+
+            if self._stop.is_set():
+                break
+            if self._received:
+                # 收到过数据才视为连接已恢复，避免"连上即断"时退避失效
+                attempt = 0
+            delay = random.uniform(0, min(self.reconnect_cap, self.reconnect_base * (2 ** attempt)))
+            attempt += 1
+            self.reconnect_count += 1
+            STREAM_RECONNECTS.inc()
+            logging.info(f"Reconnecting price stream in {delay:.2f}s (attempt {attempt})")
+            self._stop.wait(delay)
+
+    def _read_loop(self, ws) -> None:
+        awaiting_pong = False
+        while not self._stop.is_set():
+            try:
+                # control_frame=True：能看到 pong；服务端的 ping 由 websocket-client 自动回复 pong
+                opcode, data = ws.recv_data(control_frame=True)
+            except websocket.WebSocketTimeoutException:
+                if awaiting_pong:
+                    raise ConnectionError(f"no heartbeat for {2 * self.heartbeat_timeout:.0f}s")
+                ws.ping()
+                awaiting_pong = True
+                continue
+
+            awaiting_pong = False
+            if opcode == websocket.ABNF.OPCODE_CLOSE:
+                raise ConnectionError("server closed the stream")
+            if opcode == websocket.ABNF.OPCODE_TEXT:
+                self._received = True
+                self._handle_message(data)
+
+    def _handle_message(self, raw) -> None:
+        try:
+            payload = json.loads(raw)
+        except ValueError:
+            logging.warning("Discarding malformed stream message")
+            return
+        data = payload.get('data', payload)
+        symbol = data.get('s')
+        if not symbol:
+            return
+
+        event_time = int(data.get('E', 0))
+        volume = 0.0
+        if self.stream == "trade":
+            price = float(data['p'])
+            volume = float(data.get('q', 0.0))
+            trade_id = int(data['t'])
+            last_id = self._last_trade_id.get(symbol)
+            if last_id is not None and trade_id > last_id + 1:
+                self._report_gap([symbol], f"missed trades {last_id + 1}..{trade_id - 1}")
+            self._last_trade_id[symbol] = trade_id
+        else:
+            price = float(data['c'])
+            last_time = self._last_event_time.get(symbol)
+            if (self.gap_threshold > 0 and last_time is not None
+                    and event_time - last_time > self.gap_threshold * 1000):
+                self._report_gap([symbol], f"no update for {(event_time - last_time) / 1000:.1f}s")
+        self._last_event_time[symbol] = event_time
+
+        self._publish(symbol, price, event_time, volume)
+
+    def _publish(self, symbol: str, price: float, event_time: int, volume: float = 0.0) -> None:
+        with self._lock:
+            self.prices[symbol] = price
+        if self._on_update is not None:
+            try:
+                self._on_update(symbol, price, event_time, volume)
+            except Exception as e:
+                logging.error(f"Stream update handler failed: {e}")
+
+    def _report_gap(self, symbols: Sequence[str], reason: str) -> None:
+        self.gap_count += len(symbols)
+        for symbol in symbols:
+            STREAM_GAPS.inc(labels=(symbol,))
+        label = symbols[0] if len(symbols) == 1 else f"{len(symbols)} symbols"
+        logging.warning(f"Price stream gap on {label}: {reason}")
+        if self.on_gap is not None:
+            for symbol in symbols:
+                self.on_gap(symbol, reason)
+        if self.resync_fetcher is None or not symbols:
+            return
+        # 一次请求补齐所有受影响的交易对（重连时是全部交易对），而不是每个交易对各发一次
+        try:
+            snapshot = self.resync_fetcher.fetch_prices(list(symbols))
+        except Exception as e:
+            logging.warning(f"Price stream resync failed: {e}")
+            return
+        event_time = int(time.time() * 1000)
+        for symbol in symbols:
+            if snapshot.get(symbol, 0.0) > 0:
+                self._publish(symbol, snapshot[symbol], event_time)
@@ -0,0 +1,238 @@
+"""
+交易所限流预算 - 进程内所有请求共享的请求权重（weight）令牌桶
+- 每个限流组（币安的 api / api1-3 共用同一个 IP 配额，其他主机各自一组）一个权重桶，
+  按 X-MBX-USED-WEIGHT-1M 响应头与服务端的实际用量对齐
+- 可选的按接口（路径）令牌桶，限制单个接口的请求频率
+- 收到 429 / 418 时按 Retry-After 暂停整个组，避免被封 IP
+- CoalescingFetcher 合并多个任务同时发起的取价请求（singleflight），同一时刻只发一次
+"""
+import time
+import logging
+import threading
+from typing import Callable, Dict, Iterable, Mapping, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from http_client import HttpError
+from metrics import RATE_LIMIT_WAIT
+
+# 币安现货 REQUEST_WEIGHT 配额：每分钟 6000
+DEFAULT_WEIGHT_LIMIT = 6000
+WEIGHT_WINDOW = 60.0
+# 被 418 封禁但没有 Retry-After 时的保守等待
+DEFAULT_BAN_SECONDS = 120.0
+
+
+class RateLimited(HttpError):
+    """预算不足且需要等待的时间超过 max_wait，本次请求不发出"""
+
+
+def request_weight(path: str, params: Optional[Mapping[str, str]] = None) -> int:
+    """币安接口的请求权重；未列出的接口按 1 计"""
+    params = params or {}
+    if path == "/api/v3/ticker/price":
+        return 2 if "symbol" in params else 4
+    if path == "/api/v3/ticker/24hr":
+        return 2 if "symbol" in params else 80
+    if path == "/api/v3/klines":
+        return 2
+    return 1
+
+
+def limit_group(host: str) -> str:
+    """币安的多个 REST 域名共享同一个 IP 配额"""
+    hostname = host.split(':', 1)[0]
+    if hostname == "binance.com" or hostname.endswith(".binance.com"):
+        return "binance.com"
+    return host
+
+
+class TokenBucket:
+    """
+    令牌桶，允许透支：reserve() 立即扣除并返回需要等待的秒数，
+    多个线程按预约顺序排队，锁内只做算术，等待在锁外进行。
+    """
+    def __init__(self, capacity: float, rate: float, now: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        self._refill(now)
+        self.tokens -= amount
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self, amount: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def cap(self, remaining: float, now: float) -> None:
+        """服务端报告的剩余额度比本地估计少时，以服务端为准"""
+        self._refill(now)
+        self.tokens = min(self.tokens, remaining)
+
+
+class RateLimitGovernor:
+    """
+    交给 HttpSession(governor=...) 使用：每次尝试前 acquire()，拿到响应后 observe()。
+    safety 为实际使用的配额比例，留出余量给同一 IP 上的其他程序与时间窗口的对齐误差。
+    endpoint_rates：{路径: 每秒请求数}，对单个接口额外限速。
+    """
+    def __init__(self, weight_limit: int = DEFAULT_WEIGHT_LIMIT, window: float = WEIGHT_WINDOW,
+                 safety: float = 0.8, endpoint_rates: Optional[Mapping[str, float]] = None,
+                 max_wait: float = 30.0, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.weight_limit = weight_limit
+        self.window = window
+        self.budget = weight_limit * safety
+        self.endpoint_rates = dict(endpoint_rates or {})
+        self.max_wait = max_wait
+        self.clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._groups: Dict[str, TokenBucket] = {}
+        self._endpoints: Dict[Tuple[str, str], TokenBucket] = {}
+        self._banned_until: Dict[str, float] = {}
+        self.used_weight: Dict[str, int] = {}     # 服务端最近一次报告的 1 分钟已用权重
+        self.waited = 0.0
+
+    def acquire(self, url: str, params: Optional[Mapping[str, str]] = None) -> float:
+        """按请求权重预约额度，必要时阻塞等待；返回等待的秒数"""
+        parts = urlsplit(url)
+        group = limit_group(parts.netloc)
+        weight = request_weight(parts.path, params)
+        with self._lock:
+            now = self.clock()
+            bucket = self._group_bucket(group, now)
+            wait = bucket.reserve(weight, now)
+            endpoint = self._endpoint_bucket(group, parts.path, now)
+            if endpoint is not None:
+                wait = max(wait, endpoint.reserve(1, now))
+            wait = max(wait, self._banned_until.get(group, 0.0) - now)
+            if wait > self.max_wait:
+                bucket.refund(weight)
+                if endpoint is not None:
+                    endpoint.refund(1)
+                raise RateLimited(f"Rate limit budget for {group} exhausted; next slot in {wait:.1f}s")
+            self.waited += wait
+        if wait > 0:
+            RATE_LIMIT_WAIT.inc(wait, labels=(group,))
+            logging.info(f"Rate limit: waiting {wait:.2f}s before requesting {parts.path} from {group}")
+            self._sleep(wait)
+        return wait
+
+    def observe(self, url: str, status: Optional[int], headers: Mapping[str, str]) -> None:
+        """根据响应头与状态码校准预算：已用权重、429 限流、418 封禁"""
+        group = limit_group(urlsplit(url).netloc)
+        used = headers.get('X-MBX-USED-WEIGHT-1M') or headers.get('X-MBX-USED-WEIGHT')
+        retry_after = headers.get('Retry-After')
+        with self._lock:
+            now = self.clock()
+            if used is not None:
+                try:
+                    self.used_weight[group] = int(used)
+                    self._group_bucket(group, now).cap(self.budget - int(used), now)
+                except ValueError:
+                    pass
+            if status in (429, 418):
+                try:
+                    pause = float(retry_after)
+                except (TypeError, ValueError):
+                    pause = self.window if status == 429 else DEFAULT_BAN_SECONDS
+                self._banned_until[group] = max(self._banned_until.get(group, 0.0), now + pause)
+        if status in (429, 418):
+            logging.warning(f"{group} answered {status}; pausing requests for {pause:g}s")
+
+    def _group_bucket(self, group: str, now: float) -> TokenBucket:
+        bucket = self._groups.get(group)
+        if bucket is None:
+            bucket = self._groups[group] = TokenBucket(self.budget, self.budget / self.window, now)
+        return bucket
+
+    def _endpoint_bucket(self, group: str, path: str, now: float) -> Optional[TokenBucket]:
+        rate = self.endpoint_rates.get(path)
+        if rate is None:
+            return None
+        key = (group, path)
+        bucket = self._endpoints.get(key)
+        if bucket is None:
+            bucket = self._endpoints[key] = TokenBucket(max(1.0, rate), rate, now)
+        return bucket
+
+
+class _Flight:
+    def __init__(self, symbols: Optional[Set[str]]):
+        self.symbols = symbols          # None 表示全量行情
+        self.done = threading.Event()
+        self.result: Dict[str, float] = {}
+
+
+class CoalescingFetcher:
+    """
+    包装任意 MultiPriceFetcher，让进程内多个任务的取价请求合并：
+    - 正在进行的请求已覆盖所需交易对时直接等待它的结果（singleflight）
+    - window 秒内先后到达的请求合并为一次 symbols=[...] 请求
+    """
+    def __init__(self, fetcher, window: float = 0.0):
+        self.fetcher = fetcher
+        self.window = window
+        self.symbol = getattr(fetcher, 'symbol', None)
+        self._lock = threading.Lock()
+        self._forming: Optional[_Flight] = None
+        self._inflight: Optional[_Flight] = None
+        self.requests = 0
+
+    def fetch_price(self) -> float:
+        return self.fetch_prices([self.symbol]).get(self.symbol, 0.0)
+
+    def close(self) -> None:
+        """关闭被包装的 fetcher（如 HedgedPriceFetcher 的线程池）"""
+        close = getattr(self.fetcher, 'close', None)
+        if close is not None:
+            close()
+
+    def fetch_prices(self, symbols: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        wanted = None if symbols is None else set(symbols)
+        leader = False
+        with self._lock:
+            flight = self._inflight
+            if flight is None or not _covers(flight.symbols, wanted):
+                flight = self._forming
+                if flight is None:
+                    flight = self._forming = _Flight(wanted)
+                    leader = True
+                elif flight.symbols is not None:
+                    flight.symbols = None if wanted is None else flight.symbols | wanted
+        if leader:
+            self._lead(flight)
+        else:
+            flight.done.wait()
+        if wanted is None:
+            return dict(flight.result)
+        return {s: flight.result[s] for s in wanted if s in flight.result}
+
+    def _lead(self, flight: _Flight) -> None:
+        if self.window > 0:
+            time.sleep(self.window)
+        with self._lock:
+            self._forming = None
+            self._inflight = flight
+            symbols = None if flight.symbols is None else sorted(flight.symbols)
+            self.requests += 1
+        try:
+            flight.result = self.fetcher.fetch_prices(symbols)
+        finally:
+            with self._lock:
+                if self._inflight is flight:
+                    self._inflight = None
+            flight.done.set()
+
+
+def _covers(have: Optional[Set[str]], wanted: Optional[Set[str]]) -> bool:
+    if have is None:
+        return True
+    return wanted is not None and wanted <= have
@@ -0,0 +1,160 @@
+"""
+索引化的目标价规则簿 - 单个交易对上成千上万条 TargetPriceStrategy
+greater / less 两类阈值分别保存在按目标价排序的数组中，每个 tick 用上一次价格和当前价格
+二分出被穿越的区间，只处理这 k 条规则：O(log n + k)，而不是对每条规则调用 should_alert。
+already_alerted 的语义与逐条调用 should_alert 完全一致（触发一次，离开触发区后重新武装）。
+"""
+import math
+from bisect import bisect_left, bisect_right
+from typing import Iterable, List, Optional, Set
+
+from btc_monitor import DEFAULT_SYMBOL, TargetPriceStrategy
+
+
+class ThresholdRuleBook:
+    """
+    同一交易对的目标价规则集合，实现 MonitorApp 识别的 fired_rules() 批量接口。
+    - add / remove：二分定位 + 列表插入/删除（连续内存搬移），10^5 条规则下为微秒级
+    - 首个 tick 做一次全量评估，建立所有规则的 already_alerted 状态
+    - 之后新增的规则在下一个 tick 单独走一次 should_alert（与逐条评估语义一致），
+      其余规则只在价格穿越其目标价时被访问
+    规则加入后不应再修改 target_price / direction，需要修改时先 remove 再 add。
+    """
+    def __init__(self, symbol: str = DEFAULT_SYMBOL, rules: Iterable[TargetPriceStrategy] = ()):
+        self.symbol = symbol
+        # greater：价格 >= target 触发；less：价格 <= target 触发
+        self._g_targets: List[float] = []
+        self._g_rules: List[TargetPriceStrategy] = []
+        self._l_targets: List[float] = []
+        self._l_rules: List[TargetPriceStrategy] = []
+        self._pending: List[TargetPriceStrategy] = []
+        self._pending_ids: Set[int] = set()
+        self.last_price: Optional[float] = None
+        self.extend(rules)
+
+    def __len__(self) -> int:
+        return len(self._g_rules) + len(self._l_rules)
+
+    def __iter__(self):
+        yield from self._g_rules
+        yield from self._l_rules
+
+    def sides(self):
+        """((是否 greater, 升序目标价列表, 对应规则列表), ...)，供批量读取（如状态恢复），调用方不得修改"""
+        return ((True, self._g_targets, self._g_rules), (False, self._l_targets, self._l_rules))
+
+    def _side(self, rule: TargetPriceStrategy):
+        if rule.direction == "greater":
+            return self._g_targets, self._g_rules
+        return self._l_targets, self._l_rules
+
+    def add(self, rule: TargetPriceStrategy) -> None:
+        targets, rules = self._side(rule)
+        pos = bisect_right(targets, rule.target_price)
+        targets.insert(pos, rule.target_price)
+        rules.insert(pos, rule)
+        if self.last_price is not None:
+            self._pending.append(rule)
+            self._pending_ids.add(id(rule))
+
+    def extend(self, rules: Iterable[TargetPriceStrategy]) -> None:
+        """批量加入：追加后整体重排一次，O(n log n)，用于启动时加载大量规则"""
+        rules = list(rules)
+        if len(rules) < 64:
+            for rule in rules:
+                self.add(rule)
+            return
+        greater = [r for r in rules if r.direction == "greater"]
+        less = [r for r in rules if r.direction != "greater"]
+        for targets, book, added in ((self._g_targets, self._g_rules, greater),
+                                     (self._l_targets, self._l_rules, less)):
+            # 已有部分有序，timsort 合并近似线性
+            book.extend(added)
+            book.sort(key=lambda r: r.target_price)
+            targets[:] = [r.target_price for r in book]
+        if self.last_price is not None:
+            self._pending.extend(rules)
+            self._pending_ids.update(id(r) for r in rules)
+
+    def remove(self, rule: TargetPriceStrategy) -> bool:
+        targets, rules = self._side(rule)
+        lo = bisect_left(targets, rule.target_price)
+        hi = bisect_right(targets, rule.target_price)
+        for pos in range(lo, hi):
+            if rules[pos] is rule:
+                del targets[pos]
+                del rules[pos]
+                if id(rule) in self._pending_ids:
+                    self._pending_ids.discard(id(rule))
+                    self._pending = [r for r in self._pending if r is not rule]
+                return True
+        return False
+
+    def seek(self, price: float) -> None:
+        """
+        把规则簿定位到 price，不触发任何规则。
+        调用方（如向量化回放）需已把每条规则的 already_alerted 设置为 price 下的状态。
+        """
+        self.last_price = price
+        self._pending = []
+        self._pending_ids.clear()
+
+    def armed_distance(self, current_price: float) -> float:
+        """
+        到最近一条武装中规则的距离：greater 侧向上、less 侧向下各二分一次，
+        跳过已触发的规则（通常就在价格附近，只有几条）
+        """
+        if self.last_price is None or self._pending:
+            # 还有规则没评估过，下一个 tick 就可能触发
+            return 0.0
+        nearest = math.inf
+        for pos in range(bisect_left(self._g_targets, current_price), len(self._g_rules)):
+            if not self._g_rules[pos].already_alerted:
+                nearest = self._g_targets[pos] - current_price
+                break
+        for pos in range(bisect_right(self._l_targets, current_price) - 1, -1, -1):
+            if not self._l_rules[pos].already_alerted:
+                nearest = min(nearest, current_price - self._l_targets[pos])
+                break
+        return max(0.0, nearest)
+
+    def fired_rules(self, current_price: float) -> List[TargetPriceStrategy]:
+        """返回本 tick 触发的规则，并更新被穿越规则的 already_alerted"""
+        prev = self.last_price
+        self.last_price = current_price
+        if prev is None:
+            return [rule for rule in self if rule.should_alert(current_price)]
+
+        fired = []
+        if current_price > prev:
+            # 向上穿越 greater 目标 (prev, cur] -> 触发
+            lo = bisect_right(self._g_targets, prev)
+            hi = bisect_right(self._g_targets, current_price)
+            for rule in self._g_rules[lo:hi]:
+                if not rule.already_alerted:
+                    rule.already_alerted = True
+                    fired.append(rule)
+            # 离开 less 触发区 [prev, cur) -> 重新武装
+            lo = bisect_left(self._l_targets, prev)
+            hi = bisect_left(self._l_targets, current_price)
+            for rule in self._l_rules[lo:hi]:
+                rule.already_alerted = False
+        elif current_price < prev:
+            # 向下穿越 less 目标 [cur, prev) -> 触发
+            lo = bisect_left(self._l_targets, current_price)
+            hi = bisect_left(self._l_targets, prev)
+            for rule in self._l_rules[lo:hi]:
+                if not rule.already_alerted:
+                    rule.already_alerted = True
+                    fired.append(rule)
+            # 离开 greater 触发区 (cur, prev] -> 重新武装
+            lo = bisect_right(self._g_targets, current_price)
+            hi = bisect_right(self._g_targets, prev)
+            for rule in self._g_rules[lo:hi]:
+                rule.already_alerted = False
+
+        if self._pending:
+            pending, self._pending = self._pending, []
+            self._pending_ids.clear()
+            fired.extend(rule for rule in pending if rule.should_alert(current_price))
+        return fired
@@ -0,0 +1,120 @@
+"""
+稍后提醒调度器 - 由监控进程持有的最小堆定时器，并持久化到 JSON 文件
+取代"弹窗进程 sleep 15~30 分钟后再重启自己"：每个待触发的稍后提醒只是堆里的一个元组。
+独立弹窗进程（popup.py）无法直接访问监控进程的内存，改为向 spool 文件追加一行 JSON 后立即退出，
+调度器定期把 spool 收进堆里。
+"""
+import os
+import json
+import time
+import heapq
+import logging
+import itertools
+import threading
+from typing import List, Optional, Tuple
+
+DEFAULT_STATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snoozes.json')
+SPOOL_SUFFIX = '.spool'
+
+
+def spool_path(state_path: str) -> str:
+    return state_path + SPOOL_SUFFIX
+
+
+def append_spool(state_path: str, due: float, title: str, message: str) -> None:
+    """供其他进程（弹窗）调用：登记一条稍后提醒。单行追加写，多个进程并发也不会交错"""
+    line = json.dumps({"due": due, "title": title, "message": message}, ensure_ascii=False) + "\n"
+    with open(spool_path(state_path), 'a', encoding='utf-8') as f:
+        f.write(line)
+
+
+class SnoozeScheduler:
+    """
+    最小堆定时器：schedule() O(log n)，pop_due() 每条到期提醒 O(log n)。
+    每次变更都以"写临时文件 + os.replace"原子落盘，重启后从 state_path 恢复；
+    重启期间已经过期的提醒会在第一次 pop_due() 时立即触发。
+    """
+    def __init__(self, state_path: Optional[str] = None, clock=time.time):
+        self.state_path = state_path or DEFAULT_STATE_FILE
+        self.clock = clock
+        self._heap: List[Tuple[float, int, str, str]] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def schedule(self, seconds: float, title: str, message: str) -> float:
+        return self.schedule_at(self.clock() + seconds, title, message)
+
+    def schedule_at(self, due: float, title: str, message: str) -> float:
+        with self._lock:
+            heapq.heappush(self._heap, (due, next(self._seq), title, message))
+            self._save()
+        logging.info(f"Snoozed '{title}' until {time.strftime('%H:%M:%S', time.localtime(due))}")
+        return due
+
+    def next_due(self) -> Optional[float]:
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: Optional[float] = None) -> List[Tuple[str, str]]:
+        """取出所有已到期的提醒 (title, message)，按到期时间排序"""
+        now = self.clock() if now is None else now
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, _, title, message = heapq.heappop(self._heap)
+                due.append((title, message))
+            if due:
+                self._save()
+        return due
+
+    def ingest_spool(self) -> int:
+        """把其他进程登记在 spool 文件里的提醒收进堆，返回收进的条数"""
+        path = spool_path(self.state_path)
+        claimed = path + '.claimed'
+        # 上次收取中途退出留下的 claimed 文件优先处理，避免被覆盖丢失
+        if not os.path.exists(claimed):
+            if not os.path.exists(path):
+                return 0
+            try:
+                # 先改名再读，读的过程中新追加的行会写进新的 spool 文件
+                os.replace(path, claimed)
+            except OSError:
+                return 0
+        count = 0
+        with open(claimed, encoding='utf-8') as f, self._lock:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                    heapq.heappush(self._heap, (float(item['due']), next(self._seq),
+                                                item.get('title', ''), item.get('message', '')))
+                    count += 1
+                except (ValueError, KeyError):
+                    logging.warning(f"Ignoring malformed snooze spool line: {line.strip()!r}")
+            if count:
+                self._save()
+        os.remove(claimed)
+        return count
+
+    def _load(self) -> None:
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                items = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.error(f"Failed to load snooze state from {self.state_path}: {e}")
+            return
+        for due, title, message in items:
+            self._heap.append((float(due), next(self._seq), title, message))
+        heapq.heapify(self._heap)
+
+    def _save(self) -> None:
+        items = [[due, title, message] for due, _, title, message in sorted(self._heap)]
+        tmp = self.state_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(items, f, ensure_ascii=False)
+        os.replace(tmp, self.state_path)
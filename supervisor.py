@@ -0,0 +1,372 @@
+"""
+多进程分片监控 - 把交易对和提醒规则分给 N 个工作进程并行评估
+- 主进程（监督者）取一次行情，写入共享内存价格表；工作进程直接读共享内存，行情不经过管道序列化
+- 规则按交易对连续分片并均衡规则数，单个交易对规则过多时跨进程拆分
+- 每轮的应答兼作心跳：工作进程退出或超时未应答时，监督者补起新进程并重新分片
+- 规则的 already_alerted 状态等于"上次评估价格下是否处于触发区"，因此重新分片时
+  由监督者按各规则最后一次被评估的价格重建状态，不会漏报也不会重复提醒
+- 重启额度用完、所有工作进程都失败后退回主进程内评估（同样从重建的状态继续），而不是静默地不再评估
+"""
+import math
+import time
+import logging
+import multiprocessing
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from btc_monitor import Alert, MonitorApp, Notifier, TargetPriceStrategy, group_strategies, strategy_symbol
+from metrics import STRATEGY_EVAL
+
+HEADER_SLOTS = 2          # [seqlock 序号, 快照版本]
+
+
+class SharedPriceTable:
+    """
+    共享内存价格表：int64 头部 + 每个交易对一个 float64 槽位（0 表示暂无有效价格）。
+    单写者多读者，用 seqlock 保证读到的是一份完整快照：写入前后各把序号加一，
+    读者看到奇数序号或前后序号不同就重读。
+    """
+    def __init__(self, symbols: Sequence[str], name: Optional[str] = None, create: bool = True):
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        size = 8 * (HEADER_SLOTS + max(1, len(self.symbols)))
+        self._owner = create
+        # 工作进程由 multiprocessing 启动，与创建者共用同一个 resource_tracker，只由创建者 unlink
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+        self.header = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=self.shm.buf)
+        self.prices = np.ndarray((len(self.symbols),), dtype=np.float64, buffer=self.shm.buf,
+                                 offset=8 * HEADER_SLOTS)
+        if create:
+            self.header[:] = 0
+            self.prices[:] = 0.0
+
+    @classmethod
+    def attach(cls, name: str, symbols: Sequence[str]) -> "SharedPriceTable":
+        return cls(symbols, name=name, create=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def version(self) -> int:
+        return int(self.header[1])
+
+    def publish(self, snapshot: Dict[str, float]) -> int:
+        """写入快照中出现的交易对（其余槽位保持不变），返回新的版本号"""
+        seq = int(self.header[0])
+        self.header[0] = seq + 1
+        for symbol, price in snapshot.items():
+            slot = self.index.get(symbol)
+            if slot is not None:
+                self.prices[slot] = price
+        self.header[1] += 1
+        self.header[0] = seq + 2
+        return int(self.header[1])
+
+    def read(self, slots: np.ndarray) -> np.ndarray:
+        """读取指定槽位的一致快照（只复制这几个 float）"""
+        while True:
+            before = int(self.header[0])
+            if before & 1:
+                continue
+            values = self.prices[slots]
+            if int(self.header[0]) == before:
+                return values
+
+    def close(self) -> None:
+        # 先释放 numpy 视图，否则 SharedMemory.close() 会因缓冲区仍被引用而失败
+        self.header = self.prices = None
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+
+
+def triggered(rule: dict, price: float) -> bool:
+    if rule["direction"] == "greater":
+        return price >= rule["price"]
+    return price <= rule["price"]
+
+
+def plan_shards(rules: Sequence[dict], workers: int) -> List[List[int]]:
+    """
+    返回每个工作进程分到的规则下标。同一交易对的规则尽量放在一起（共享 ThresholdRuleBook），
+    按规则数从多到少依次填满每个进程的份额，放不下的部分顺延到下一个进程：
+    各进程规则数最多相差 1，且每个进程只会与相邻进程共享交易对。
+    """
+    by_symbol: Dict[str, List[int]] = {}
+    for i, rule in enumerate(rules):
+        by_symbol.setdefault(rule["symbol"], []).append(i)
+    shards: List[List[int]] = [[] for _ in range(workers)]
+    base, extra = divmod(len(rules), workers)
+    quotas = [base + (1 if i < extra else 0) for i in range(workers)]
+    current = 0
+    for ids in sorted(by_symbol.values(), key=len, reverse=True):
+        for rule_id in ids:
+            while current < workers - 1 and len(shards[current]) >= quotas[current]:
+                current += 1
+            shards[current].append(rule_id)
+    return shards
+
+
+def worker_main(table_name: str, symbols: List[str], conn) -> None:
+    """
+    工作进程入口。消息：
+    ("assign", rules)   rules 为带 "alerted" 初始状态的规则字典，应答 ("ready", 规则数)
+    ("tick", version)   从共享内存读取价格并评估，
+                        应答 ("alerts", version, [(symbol, price, title, message, direction, target)], 距离)
+    ("stop",)
+    """
+    table = SharedPriceTable.attach(table_name, symbols)
+    app = MonitorApp(None, None)
+    wanted: List[str] = []
+    slots = np.empty(0, dtype=np.intp)
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                break
+            kind = message[0]
+            if kind == "assign":
+                rules = message[1]
+                # 规则簿首个 tick 做全量 should_alert，从恢复的状态继续，结果与单进程一致
+                app.strategies = build_targets(rules, [rule["alerted"] for rule in rules])
+                wanted = sorted({rule["symbol"] for rule in rules})
+                slots = np.array([table.index[s] for s in wanted], dtype=np.intp)
+                conn.send(("ready", len(rules)))
+            elif kind == "tick":
+                snapshot = dict(zip(wanted, table.read(slots).tolist()))
+                alerts = [(a.symbol, a.price, a.title, a.message, a.strategy.direction, a.strategy.target_price)
+                          for a in app.collect_alerts(snapshot)]
+                distances = {}
+                for strategy in app.strategies:
+                    symbol = strategy_symbol(strategy)
+                    price = snapshot.get(symbol, 0.0)
+                    if price > 0:
+                        distances[symbol] = min(distances.get(symbol, math.inf), strategy.armed_distance(price))
+                conn.send(("alerts", message[1], alerts, distances))
+            elif kind == "stop":
+                break
+    finally:
+        table.close()
+
+
+def build_targets(rules: Sequence[dict], states: Sequence[bool]) -> list:
+    """按规则字典和 already_alerted 状态重建目标价策略，并按交易对合并成规则簿"""
+    targets = []
+    for rule, alerted in zip(rules, states):
+        target = TargetPriceStrategy(rule["price"], rule["direction"], rule["symbol"])
+        target.already_alerted = alerted
+        targets.append(target)
+    return group_strategies(targets)
+
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.rule_ids: List[int] = []
+        self.seed_alerted: Dict[int, bool] = {}
+        # 该进程最后一次成功评估时各交易对的有效价格，用于重新分片时重建规则状态
+        self.last_prices: Dict[str, float] = {}
+
+
+class _ReportedThreshold:
+    """监督者侧的占位策略：只携带工作进程上报的最近武装阈值距离，供自适应轮询使用"""
+    def __init__(self, symbol: str, distances: Dict[str, float]):
+        self.symbol = symbol
+        self._distances = distances
+
+    def armed_distance(self, current_price: float) -> float:
+        return self._distances.get(self.symbol, 0.0)
+
+
+class ShardedMonitor(MonitorApp):
+    """
+    MonitorApp 的多进程版本：取价、写历史、发通知仍在主进程，策略评估分给工作进程。
+    可直接交给 MonitorJob / MonitorEngine（引擎在线程池里调用 collect_alerts，管道等待与补起进程不阻塞事件循环）；
+    用完调用 close() 停止工作进程并回收共享内存。
+    """
+    def __init__(self, fetcher, notifier: Notifier, rules: Sequence[dict], workers: int = 2,
+                 history=None, state=None, tick_timeout: float = 5.0, max_restarts: int = 5):
+        super().__init__(fetcher, notifier, history=history, state=state)
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.rules = [dict(rule) for rule in rules]
+        self.tick_timeout = tick_timeout
+        self.restarts_left = max_restarts
+        self._symbols = list(dict.fromkeys(rule["symbol"] for rule in self.rules))
+        self.distances: Dict[str, float] = {}
+        self.strategies = [_ReportedThreshold(symbol, self.distances) for symbol in self._symbols]
+        self.table = SharedPriceTable(self._symbols)
+        self.in_process = False
+        self._context = multiprocessing.get_context("spawn")
+        self.workers: List[_Worker] = [self._spawn() for _ in range(workers)]
+        self.rebalance(state.restore_states(self.rules).tolist() if state is not None else None)
+
+    @property
+    def symbols(self) -> List[str]:
+        return sorted(self._symbols)
+
+    def _spawn(self) -> _Worker:
+        parent, child = self._context.Pipe()
+        process = self._context.Process(target=worker_main, args=(self.table.name, self._symbols, child),
+                                        name="monitor-shard", daemon=True)
+        process.start()
+        child.close()
+        return _Worker(process, parent)
+
+    def rule_states(self) -> List[bool]:
+        """
+        每条规则当前的 already_alerted：等于其所在进程最后一次成功评估时该交易对价格下是否处于触发区；
+        该进程还没成功评估过时沿用分配时的种子状态
+        """
+        states = [False] * len(self.rules)
+        for worker in self.workers:
+            for rule_id in worker.rule_ids:
+                rule = self.rules[rule_id]
+                price = worker.last_prices.get(rule["symbol"])
+                states[rule_id] = worker.seed_alerted.get(rule_id, False) if price is None else triggered(rule, price)
+        return states
+
+    def rebalance(self, states: Optional[List[bool]] = None) -> None:
+        """按当前存活的工作进程重新分片，并把每条规则的状态随规则一起迁移"""
+        states = states if states is not None else self.rule_states()
+        plan = plan_shards(self.rules, len(self.workers))
+        for worker, rule_ids in zip(self.workers, plan):
+            worker.rule_ids = rule_ids
+            worker.seed_alerted = {i: states[i] for i in rule_ids}
+            worker.last_prices = {}
+            try:
+                worker.conn.send(("assign", [{**self.rules[i], "alerted": states[i]} for i in rule_ids]))
+            except (OSError, ValueError):
+                pass
+        failed = [worker for worker in self.workers if not self._receive(worker, "ready")]
+        if failed:
+            # 分配阶段就失败：处理掉失败的进程后用同一份状态重新分片
+            for worker in failed:
+                self._replace(worker)
+            return self.rebalance(states)
+        logging.info(f"Sharded {len(self.rules)} rules across {len(self.workers)} worker processes: "
+                     + ", ".join(str(len(w.rule_ids)) for w in self.workers))
+
+    def _receive(self, worker: _Worker, kind: str, deadline: Optional[float] = None):
+        deadline = deadline if deadline is not None else time.monotonic() + self.tick_timeout
+        try:
+            while worker.conn.poll(max(0.0, deadline - time.monotonic())):
+                message = worker.conn.recv()
+                if message[0] == kind:
+                    return message
+        except (EOFError, OSError):
+            pass
+        return None
+
+    def _replace(self, worker: _Worker) -> None:
+        """工作进程退出或失去响应：结束它；还有重启额度时补起新进程，否则由剩余进程分担"""
+        _stop_process(worker.process, 0.0)
+        worker.conn.close()
+        logging.warning(f"Shard worker pid {worker.process.pid} is unhealthy "
+                        f"(exit code {worker.process.exitcode}); rebalancing.")
+        index = self.workers.index(worker)
+        if self.restarts_left > 0:
+            self.restarts_left -= 1
+            self.workers[index] = self._spawn()
+        elif len(self.workers) > 1:
+            del self.workers[index]
+        else:
+            del self.workers[index]
+            raise RuntimeError("All shard workers failed and the restart budget is exhausted")
+
+    def collect_alerts(self, snapshot: Dict[str, float],
+                       trades: Optional[Dict[str, Tuple[float, float]]] = None) -> List[Alert]:
+        """
+        写入共享内存 -> 通知所有工作进程评估 -> 汇总触发的提醒；失败的分片重新分配后补评估。
+        工作进程只评估目标价规则，不需要 trades（成交时间与成交量）。
+        已退回进程内评估时直接由 MonitorApp 评估。
+        """
+        if self.in_process:
+            return super().collect_alerts(snapshot, trades)
+        observed_at = time.perf_counter()
+        version = self.table.publish(snapshot)
+        alerts: List[Alert] = []
+        distances: Dict[str, float] = {}
+        while True:
+            for worker in self.workers:
+                try:
+                    worker.conn.send(("tick", version))
+                except (OSError, ValueError):
+                    pass
+            deadline = time.monotonic() + self.tick_timeout
+            failed = []
+            for worker in self.workers:
+                reply = self._receive(worker, "alerts", deadline)
+                if reply is None:
+                    failed.append(worker)
+                    continue
+                fired = reply[2]
+                # 规则对象留在工作进程里，用 (交易对, 方向, 目标价) 标识触发的规则（供通知去重）
+                alerts.extend(Alert(symbol, price, title, message, (symbol, direction, target), observed_at)
+                              for symbol, price, title, message, direction, target in fired)
+                for symbol, distance in reply[3].items():
+                    distances[symbol] = min(distances.get(symbol, math.inf), distance)
+                for symbol, price in snapshot.items():
+                    if price > 0:
+                        worker.last_prices[symbol] = price
+            if not failed:
+                # 评估耗时在监督者这里统计：工作进程里的指标不会出现在主进程的 /metrics
+                STRATEGY_EVAL.observe(time.perf_counter() - observed_at)
+                self.distances.clear()
+                self.distances.update(distances)
+                if self.state is not None:
+                    self.state.record(snapshot, alerts)
+                return alerts
+            # 失败进程的规则按上一次成功评估的价格恢复状态，重新分片后整体重评当前价格：
+            # 本轮已评估过的规则在同一价格下不会重复触发，失败分片的规则得到补评估
+            states = self.rule_states()
+            try:
+                for worker in failed:
+                    self._replace(worker)
+                self.rebalance(states)
+            except RuntimeError as e:
+                logging.error(f"{e}; falling back to in-process strategy evaluation.")
+                self._fall_back(states)
+                if self.state is not None:
+                    # 先登记已由工作进程触发的提醒，下面写入价格时这些交易对同样等待投递确认
+                    self.state.record({}, alerts)
+                # 本轮已成功评估的规则状态已是当前价格下的结果，不会重复触发；其余规则在这里补评估
+                return alerts + super().collect_alerts(snapshot, trades)
+
+    def _fall_back(self, states: List[bool]) -> None:
+        """停止剩余工作进程，把全部规则连同状态收回主进程评估"""
+        for worker in self.workers:
+            _stop_process(worker.process, 0.0)
+            worker.conn.close()
+        self.workers = []
+        self.strategies = build_targets(self.rules, states)
+        self.in_process = True
+
+    def close(self) -> None:
+        for worker in self.workers:
+            try:
+                worker.conn.send(("stop",))
+            except (OSError, ValueError):
+                pass
+        for worker in self.workers:
+            _stop_process(worker.process, 2.0)
+            worker.conn.close()
+        self.workers = []
+        self.table.close()
+
+
+def _stop_process(process, grace: float) -> None:
+    """先等它自行退出，再 SIGTERM，最后 SIGKILL（被挂起的进程收不到 SIGTERM）"""
+    process.join(grace)
+    if process.is_alive():
+        process.terminate()
+        process.join(1.0)
+    if process.is_alive():
+        process.kill()
+        process.join()
@@ -0,0 +1,123 @@
+import io
+import os
+import importlib.util
+
+import pytest
+
+import btc_monitor
+from alert_state import RECORD_SIZE, AlertStateStore
+from btc_monitor import Alert, MonitorApp, build_strategies
+from dispatch import AlertDispatcher, StdoutSink
+
+RULES = [
+    {"symbol": "BTCUSDT", "price": 100.0, "direction": "greater"},
+    {"symbol": "BTCUSDT", "price": 50.0, "direction": "less"},
+    {"symbol": "ETHUSDT", "price": 10.0, "direction": "greater"},
+]
+
+
+def crash(store):
+    """模拟进程崩溃：后台 fsync 线程停止，不写最终快照"""
+    store.sync()
+    store._stop.set()
+    store._syncer.join()
+
+
+def alert(symbol, price):
+    return Alert(symbol, price, "title", "message", None, 0.0)
+
+
+def test_wal_replay_restores_states(tmp_path):
+    store = AlertStateStore(str(tmp_path), RULES)
+    store.record({"BTCUSDT": 120.0, "ETHUSDT": 5.0})
+    crash(store)
+    restored = AlertStateStore(str(tmp_path), RULES)
+    try:
+        assert restored.restore_states().tolist() == [True, False, False]
+    finally:
+        restored.close()
+
+
+def test_torn_record_is_truncated(tmp_path):
+    store = AlertStateStore(str(tmp_path), RULES)
+    store.record({"BTCUSDT": 40.0})
+    crash(store)
+    with open(store.wal_path, 'ab') as f:
+        f.write(b'\x01' * (RECORD_SIZE - 3))
+    restored = AlertStateStore(str(tmp_path), RULES)
+    try:
+        assert restored.last_prices == {"BTCUSDT": 40.0}
+        assert restored.restore_states().tolist() == [False, True, False]
+    finally:
+        restored.close()
+
+
+def test_price_is_persisted_only_after_delivery(tmp_path):
+    store = AlertStateStore(str(tmp_path), RULES)
+    store.record({"BTCUSDT": 120.0, "ETHUSDT": 5.0}, [alert("BTCUSDT", 120.0)])
+    store.record({"BTCUSDT": 130.0})
+    crash(store)
+    # 提醒还没投递就崩溃：BTCUSDT 保持未记录，重启后会重新提醒
+    restored = AlertStateStore(str(tmp_path), RULES)
+    assert restored.last_prices == {"ETHUSDT": 5.0}
+    restored.record({"BTCUSDT": 120.0}, [alert("BTCUSDT", 120.0)])
+    restored.delivered(alert("BTCUSDT", 120.0))
+    restored.close()
+    again = AlertStateStore(str(tmp_path), RULES)
+    try:
+        assert again.restore_states().tolist() == [True, False, False]
+    finally:
+        again.close()
+
+
+def test_symbols_are_validated_when_rules_load(tmp_path):
+    with pytest.raises(ValueError):
+        AlertStateStore(str(tmp_path), [{"symbol": "X" * 17, "price": 1.0, "direction": "greater"}])
+    rules = [{"symbol": "币安人生USDT", "price": 1.0, "direction": "greater"}]
+    store = AlertStateStore(str(tmp_path), rules)
+    store.record({"币安人生USDT": 2.0, "NOT" * 10: 3.0})
+    crash(store)
+    restored = AlertStateStore(str(tmp_path), rules)
+    try:
+        assert restored.restore_states().tolist() == [True]
+    finally:
+        restored.close()
+
+
+def test_restore_matches_rules_from_a_second_module_copy(tmp_path):
+    # python btc_monitor.py 时策略来自 __main__，与 btc_monitor.TargetPriceStrategy 不是同一个类
+    spec = importlib.util.spec_from_file_location("__monitor_copy__", btc_monitor.__file__)
+    copy = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(copy)
+    store = AlertStateStore(str(tmp_path), RULES)
+    store.record({"BTCUSDT": 120.0})
+    store.close()
+    restored = AlertStateStore(str(tmp_path), RULES)
+    try:
+        strategies = copy.build_strategies(RULES)
+        assert restored.restore(strategies) == 1
+    finally:
+        restored.close()
+
+
+def run_monitor(directory, snapshot):
+    """一次完整的运行：恢复状态 -> 评估 -> 经分发队列投递 -> 关闭"""
+    out = io.StringIO()
+    state = AlertStateStore(directory, RULES)
+    strategies = build_strategies(RULES)
+    restored = state.restore(strategies)
+    dispatcher = AlertDispatcher([StdoutSink(out)], coalesce_window=0, rate=0)
+    app = MonitorApp(None, dispatcher, *strategies, state=state)
+    app.evaluate(snapshot)
+    dispatcher.close()
+    state.close()
+    return restored, out.getvalue()
+
+
+def test_restart_does_not_repeat_delivered_alerts(tmp_path):
+    directory = str(tmp_path)
+    restored, output = run_monitor(directory, {"BTCUSDT": 120.0, "ETHUSDT": 5.0})
+    assert restored == 0 and output.count("Price Alert") == 1
+    restored, output = run_monitor(directory, {"BTCUSDT": 125.0, "ETHUSDT": 5.0})
+    assert restored == 1 and output == ""
+    assert os.path.getsize(os.path.join(directory, "alert_state.wal")) > 0
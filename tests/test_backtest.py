@@ -0,0 +1,73 @@
+import os
+import random
+
+import numpy as np
+
+from backtest import Replayer, book_fire_indices, fire_indices, load_series
+from btc_monitor import TargetPriceStrategy
+from price_history import SymbolHistory
+from rulebook import ThresholdRuleBook
+
+
+def make_rules(count, seed=3):
+    rng = random.Random(seed)
+    return [TargetPriceStrategy(round(rng.uniform(95, 105), 2), rng.choice(("greater", "less")))
+            for _ in range(count)]
+
+
+def random_prices(ticks, seed=4):
+    rng = np.random.default_rng(seed)
+    return np.round(100 + np.cumsum(rng.normal(0, 0.4, ticks)), 2)
+
+
+def test_book_replay_matches_per_rule_replay():
+    prices = random_prices(3000)
+    rules = make_rules(400)
+    for rule in rules[::7]:
+        rule.already_alerted = True
+    reference = [TargetPriceStrategy(r.target_price, r.direction) for r in rules]
+    for ref, rule in zip(reference, rules):
+        ref.already_alerted = rule.already_alerted
+
+    expected = sorted((i, int(index)) for i, ref in enumerate(reference) for index in fire_indices(prices, ref))
+    book = ThresholdRuleBook(rules=rules)
+    position = {id(rule): i for i, rule in enumerate(rules)}
+    events = sorted((position[id(rule)], index) for rule, index in book_fire_indices(prices, book))
+    assert events == expected
+    assert [r.already_alerted for r in rules] == [r.already_alerted for r in reference]
+
+
+def test_replayer_with_rule_book_continues_live():
+    prices = random_prices(500)
+    rules = make_rules(100)
+    book = ThresholdRuleBook(rules=rules)
+    replayer = Replayer([book])
+    ts = np.arange(len(prices), dtype=np.float64)
+    fired = replayer.run({"BTCUSDT": (ts, prices)})
+    assert [a.ts for a in fired] == sorted(a.ts for a in fired)
+    assert book.last_price == prices[-1]
+    # 回放后规则簿的状态与逐条 should_alert 的结果一致
+    naive = [TargetPriceStrategy(r.target_price, r.direction) for r in rules]
+    for price in prices:
+        for rule in naive:
+            rule.should_alert(float(price))
+    assert [r.already_alerted for r in rules] == [r.already_alerted for r in naive]
+
+
+def test_ticks_file_is_opened_read_only(tmp_path):
+    path = str(tmp_path / "ETHUSDT.ticks")
+    history = SymbolHistory(path)
+    for i in range(4):
+        history.append(100 + i, 3000.0 + i)
+    history.close()
+    with open(path, 'ab') as f:
+        f.write(b'\x00' * 5)          # 写了一半的记录
+    size, mtime = os.path.getsize(path), os.stat(path).st_mtime_ns
+    os.chmod(path, 0o444)
+
+    series = load_series(path)
+    ts, prices = series["ETHUSDT"]
+    assert prices.tolist() == [3000.0, 3001.0, 3002.0, 3003.0]
+    assert ts.tolist() == [100.0, 101.0, 102.0, 103.0]
+    assert (os.path.getsize(path), os.stat(path).st_mtime_ns) == (size, mtime)
+    assert list(load_series(path, symbol="ETHBTC")) == ["ETHBTC"]
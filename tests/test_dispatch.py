@@ -0,0 +1,129 @@
+import io
+import os
+import json
+import queue
+import subprocess
+import sys
+import threading
+import importlib.util
+
+import btc_monitor
+from btc_monitor import Alert
+from dispatch import AlertDispatcher, JsonlSink, StdoutSink
+from stand_in_server import StandInTickerServer
+
+
+class RecordingSink:
+    def __init__(self, fail_first=0):
+        self.fail_first = fail_first
+        self.notifications = []
+        self.received = threading.Semaphore(0)
+
+    def deliver(self, notification):
+        if self.fail_first:
+            self.fail_first -= 1
+            raise RuntimeError("sink down")
+        self.notifications.append(notification)
+        self.received.release()
+
+    def send_notification(self, title, message):
+        pass
+
+    def wait(self, count, timeout=5.0):
+        return all(self.received.acquire(timeout=timeout) for _ in range(count))
+
+
+def alert(symbol, price, target, module=btc_monitor):
+    strategy = module.TargetPriceStrategy(target, "greater", symbol)
+    return module.Alert(symbol, price, f"{symbol} Price Alert", f"{symbol}\n${price}", strategy, 0.0)
+
+
+def test_alerts_are_delivered_one_by_one_by_default():
+    sink = RecordingSink()
+    dispatcher = AlertDispatcher([sink])
+    for target in (100.0, 110.0, 120.0):
+        assert dispatcher.submit(alert("BTCUSDT", 130.0, target))
+    assert sink.wait(3)
+    dispatcher.close()
+    assert [len(n.alerts) for n in sink.notifications] == [1, 1, 1]
+
+
+def test_coalescing_is_opt_in():
+    sink = RecordingSink()
+    dispatcher = AlertDispatcher([sink], coalesce_window=0.3)
+    for target in (100.0, 110.0, 120.0):
+        dispatcher.submit(alert("BTCUSDT", 130.0, target))
+    assert sink.wait(1)
+    dispatcher.close()
+    assert len(sink.notifications) == 1 and len(sink.notifications[0].alerts) == 3
+
+
+def test_alerts_from_a_second_module_copy_are_still_summarized(tmp_path):
+    # python btc_monitor.py 时提醒来自 __main__ 里的另一份 Alert 类
+    spec = importlib.util.spec_from_file_location("__monitor_copy__", btc_monitor.__file__)
+    copy = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(copy)
+    path = str(tmp_path / "alerts.jsonl")
+    out = io.StringIO()
+    dispatcher = AlertDispatcher([StdoutSink(out), JsonlSink(path)])
+    for target in (100.0, 110.0):
+        assert dispatcher.submit(alert("BTCUSDT", 130.0, target, module=copy))
+    dispatcher.close()
+    with open(path, encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f]
+    assert [len(line["alerts"]) for line in lines] == [1, 1]
+    assert out.getvalue().count("BTCUSDT Price Alert") == 2
+
+
+def test_failing_sink_keeps_its_thread_alive():
+    sink = RecordingSink(fail_first=1)
+    delivered = []
+    dispatcher = AlertDispatcher([sink])
+    dispatcher.on_delivered = delivered.append
+    dispatcher.submit(alert("BTCUSDT", 130.0, 100.0))
+    dispatcher.submit(alert("BTCUSDT", 130.0, 110.0))
+    assert sink.wait(1)
+    dispatcher.close()
+    assert [a.strategy.target_price for n in sink.notifications for a in n.alerts] == [110.0]
+    # 失败的投递同样确认，状态库不会一直暂缓该交易对
+    assert len(delivered) == 2
+
+
+def test_dropped_alert_is_not_recorded_as_sent():
+    sink = RecordingSink()
+    delivered = []
+    dispatcher = AlertDispatcher([sink])
+    dispatcher.on_delivered = delivered.append
+    first = alert("BTCUSDT", 130.0, 100.0)
+    assert dispatcher.submit(first)
+    assert sink.wait(1)
+    assert not dispatcher.submit(first)           # dedup_window 内重复
+    original, dispatcher._queue = dispatcher._queue, queue.Queue(1)
+    dispatcher._queue.put_nowait(object())
+    second = alert("BTCUSDT", 130.0, 110.0)
+    assert not dispatcher.submit(second)          # 队列已满被丢弃
+    dispatcher._queue = original
+    assert dispatcher.submit(second)              # 重试不会被当作重复
+    assert sink.wait(1)
+    dispatcher.close()
+    assert len(delivered) == 4
+
+
+def test_script_entry_point_delivers_and_persists(tmp_path):
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({"interval": 1, "rules": [
+        {"symbol": "BTCUSDT", "price": 100.0, "direction": "greater"},
+        {"symbol": "ETHUSDT", "price": 10.0, "direction": "greater"}]}))
+    jsonl = tmp_path / "alerts.jsonl"
+    script = os.path.join(os.path.dirname(btc_monitor.__file__), "btc_monitor.py")
+    with StandInTickerServer({"BTCUSDT": 120.0, "ETHUSDT": 12.0}) as server:
+        argv = [sys.executable, script, "--headless", "--config", str(config), "--once",
+                "--base-url", server.base_url, "--weight-limit", "0", "--retries", "0",
+                "--sinks", f"jsonl:{jsonl}", "stdout", "--state-dir", str(tmp_path / "state")]
+        for _ in range(2):
+            result = subprocess.run(argv, capture_output=True, text=True, timeout=60)
+            assert result.returncode == 0, result.stderr
+    with open(jsonl, encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f]
+    # 第二次运行从持久化的状态继续，不会重复提醒
+    assert sorted(a["symbol"] for line in lines for a in line["alerts"]) == ["BTCUSDT", "ETHUSDT"]
@@ -0,0 +1,129 @@
+import time
+import asyncio
+
+from btc_monitor import MonitorApp, TargetPriceStrategy
+from engine import FakeClock, MonitorEngine, MonitorJob
+
+
+class ScriptedFetcher:
+    """按顺序返回预设价格；价格为异常实例时抛出它"""
+    def __init__(self, symbol, prices, delay=0.0):
+        self.symbol = symbol
+        self.prices = list(prices)
+        self.delay = delay
+        self.calls = 0
+
+    def fetch_prices(self, symbols=None):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        price = self.prices[min(self.calls, len(self.prices)) - 1]
+        if isinstance(price, Exception):
+            raise price
+        return {self.symbol: price}
+
+
+class CaptureNotifier:
+    def __init__(self):
+        self.sent = []
+
+    def send_notification(self, title, message):
+        self.sent.append(title)
+
+
+def make_job(symbol, prices, interval, target=100.0, notifier=None, **kwargs):
+    fetcher = ScriptedFetcher(symbol, prices)
+    app = MonitorApp(fetcher, notifier or CaptureNotifier(), TargetPriceStrategy(target, "greater", symbol))
+    return MonitorJob(app, interval=interval, **kwargs), fetcher
+
+
+async def run_for(engine, clock, seconds, step=1.0):
+    task = asyncio.create_task(engine.run())
+    elapsed = 0.0
+    while elapsed < seconds:
+        await clock.advance(step)
+        elapsed += step
+    engine.stop()
+    await task
+
+
+def test_jobs_run_at_their_own_intervals():
+    clock = FakeClock()
+    fast, fast_fetcher = make_job("BTCUSDT", [1.0], interval=10)
+    slow, slow_fetcher = make_job("ETHUSDT", [1.0], interval=25)
+    engine = MonitorEngine([fast, slow], clock=clock, offload=False)
+    asyncio.run(run_for(engine, clock, 100))
+    # t=0 立即执行一次，之后按各自间隔
+    assert fast_fetcher.calls == 11
+    assert slow_fetcher.calls == 5
+
+
+def test_alerts_are_delivered_once_per_crossing():
+    clock = FakeClock()
+    notifier = CaptureNotifier()
+    job, _ = make_job("BTCUSDT", [90.0, 101.0, 102.0, 95.0, 103.0], interval=5, notifier=notifier)
+    engine = MonitorEngine([job], clock=clock, offload=False)
+    asyncio.run(run_for(engine, clock, 20))
+    assert notifier.sent == ["BTC Price Alert", "BTC Price Alert"]
+
+
+def test_failures_do_not_stop_scheduling():
+    clock = FakeClock()
+    job, fetcher = make_job("BTCUSDT", [ConnectionError("down"), 1.0], interval=10)
+
+    calls = {"n": 0}
+    original = job.app.collect_alerts
+
+    def flaky(snapshot, trades=None):
+        calls["n"] += 1
+        if calls["n"] <= 3:
+            raise RuntimeError("strategy bug")
+        return original(snapshot, trades)
+    job.app.collect_alerts = flaky
+
+    engine = MonitorEngine([job], clock=clock, offload=False)
+    asyncio.run(run_for(engine, clock, 100))
+    assert fetcher.calls == 11
+    assert job.failures == 3
+    assert calls["n"] == 10
+
+
+def test_slow_fetch_times_out_without_blocking_other_jobs():
+    async def scenario():
+        slow, slow_fetcher = make_job("BTCUSDT", [1.0], interval=60, fetch_timeout=0.05)
+        slow_fetcher.delay = 0.5
+        fast, fast_fetcher = make_job("ETHUSDT", [1.0], interval=0.02)
+        engine = MonitorEngine([slow, fast])
+        task = asyncio.create_task(engine.run())
+        await asyncio.sleep(0.3)
+        engine.stop()
+        await asyncio.wait_for(task, 5)
+        return slow_fetcher.calls, fast_fetcher.calls
+    slow_calls, fast_calls = asyncio.run(scenario())
+    assert slow_calls == 1
+    assert fast_calls >= 5
+
+
+def test_slow_evaluation_times_out_and_is_not_overlapped():
+    async def scenario():
+        job, fetcher = make_job("BTCUSDT", [1.0], interval=0.05, evaluate_timeout=0.05)
+        original = job.app.collect_alerts
+        running = {"now": 0, "max": 0}
+
+        def slow(snapshot, trades=None):
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+            time.sleep(0.3)
+            running["now"] -= 1
+            return original(snapshot, trades)
+        job.app.collect_alerts = slow
+        engine = MonitorEngine([job])
+        task = asyncio.create_task(engine.run())
+        await asyncio.sleep(0.5)
+        engine.stop()
+        await asyncio.wait_for(task, 5)
+        return fetcher.calls, running["max"]
+    calls, max_running = asyncio.run(scenario())
+    # 评估超时不会卡住调度，但也不会有两个评估同时修改策略状态
+    assert calls >= 4
+    assert max_running == 1
@@ -0,0 +1,82 @@
+import time
+from contextlib import ExitStack
+
+from btc_monitor import BinancePriceFetcher
+from hedged_fetcher import HedgedPriceFetcher, PriceSource
+from http_client import HttpSession
+from stand_in_server import StandInTickerServer
+
+
+def make_sources(servers):
+    # 与 build_fetcher 一致：对冲代替重试，源会话不再重试
+    session = HttpSession(max_retries=0, read_timeout=2.0)
+    return [PriceSource(f"stand-in-{i}", BinancePriceFetcher(base_url=server.base_url, session=session))
+            for i, server in enumerate(servers)], session
+
+
+def start_servers(stack, *configs):
+    return [stack.enter_context(StandInTickerServer({"BTCUSDT": price}, **kwargs)) for price, kwargs in configs]
+
+
+def test_slow_primary_is_hedged_by_next_source():
+    with ExitStack() as stack:
+        slow, fast = start_servers(stack, (100.0, {"delay": 0.5}), (200.0, {}))
+        sources, session = make_sources([slow, fast])
+        fetcher = HedgedPriceFetcher(sources, hedge_delay=0.05, timeout=2.0)
+        try:
+            start = time.perf_counter()
+            assert fetcher.fetch_prices(["BTCUSDT"]) == {"BTCUSDT": 200.0}
+            assert time.perf_counter() - start < 0.4
+            assert slow.requests == 1 and fast.requests == 1
+        finally:
+            fetcher.close()
+            session.close()
+
+
+def test_median_mode_filters_outlier_source():
+    with ExitStack() as stack:
+        servers = start_servers(stack, (100.0, {}), (101.0, {}), (500.0, {}))
+        sources, session = make_sources(servers)
+        fetcher = HedgedPriceFetcher(sources, mode="median", deadline=0.5, timeout=2.0)
+        try:
+            assert fetcher.fetch_prices(["BTCUSDT"]) == {"BTCUSDT": 101.0}
+        finally:
+            fetcher.close()
+            session.close()
+
+
+def test_normal_rest_latency_does_not_ban_source():
+    with ExitStack() as stack:
+        server, = start_servers(stack, (100.0, {"delay": 0.15}))
+        sources, session = make_sources([server])
+        fetcher = HedgedPriceFetcher(sources, hedge_delay=0.05, timeout=2.0, ban_after=1)
+        try:
+            for _ in range(3):
+                assert fetcher.fetch_prices(["BTCUSDT"]) == {"BTCUSDT": 100.0}
+            assert sources[0].banned_until == 0.0 and sources[0].strikes == 0
+        finally:
+            fetcher.close()
+            session.close()
+
+
+def test_failing_source_is_banned_and_skipped():
+    now = [1000.0]
+    with ExitStack() as stack:
+        broken, healthy = start_servers(stack, (100.0, {"fail_every": 1}), (200.0, {}))
+        sources, session = make_sources([broken, healthy])
+        fetcher = HedgedPriceFetcher(sources, hedge_delay=0.05, timeout=2.0, ban_after=2,
+                                     ban_seconds=60, clock=lambda: now[0])
+        try:
+            for _ in range(2):
+                assert fetcher.fetch_prices(["BTCUSDT"]) == {"BTCUSDT": 200.0}
+            # 失败的源会被排到健康源之后；连续失败 ban_after 次后被禁用
+            assert sources[0].failures >= 1
+            sources[0].latency = 0.0
+            fetcher.fetch_prices(["BTCUSDT"])
+            assert sources[0].banned_until == 1060.0
+            assert [s.name for s in fetcher.ranked_sources()] == ["stand-in-1"]
+            now[0] = 1061.0
+            assert len(fetcher.ranked_sources()) == 2
+        finally:
+            fetcher.close()
+            session.close()
@@ -0,0 +1,64 @@
+import pytest
+
+from http_client import HttpError, HttpSession
+from stand_in_server import StandInTickerServer
+
+
+class FakeResponse:
+    def __init__(self, status):
+        self.status_code = status
+        self.reason = "Service Unavailable" if status == 503 else "OK"
+        self.headers = {}
+        self.closed = False
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.responses = []
+
+    def get(self, url, params=None, stream=False, timeout=None):
+        response = FakeResponse(self.statuses.pop(0))
+        self.responses.append(response)
+        return response
+
+    def close(self):
+        pass
+
+
+def make_session(statuses, max_retries=3):
+    session = HttpSession(max_retries=max_retries, sleep=lambda delay: None)
+    session.session = FakeSession(statuses)
+    return session
+
+
+def test_retryable_responses_are_closed_before_retry():
+    session = make_session([503, 503, 200])
+    response = session.get("http://stand-in/api", stream=True)
+    assert response.status_code == 200 and not response.closed
+    assert [r.closed for r in session.session.responses] == [True, True, False]
+
+
+def test_exhausted_retries_close_every_response():
+    session = make_session([503, 503], max_retries=1)
+    with pytest.raises(HttpError):
+        session.get("http://stand-in/api", stream=True)
+    assert all(r.closed for r in session.session.responses)
+
+
+def test_retries_against_stand_in_server():
+    with StandInTickerServer({"BTCUSDT": 50000.0}, fail_every=2) as server:
+        session = HttpSession(sleep=lambda delay: None)
+        url = server.base_url + "/api/v3/ticker/price"
+        assert session.get_json(url, {"symbol": "BTCUSDT"})["price"] == "50000.00000000"
+        # 第 2 个请求返回 503，重试后成功
+        assert session.get_json(url, {"symbol": "BTCUSDT"})["symbol"] == "BTCUSDT"
+        assert server.requests == 3
+        assert [t.status for t in session.recent_timings()] == [200, 503, 200]
+        session.close()
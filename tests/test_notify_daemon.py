@@ -0,0 +1,106 @@
+import json
+import socket
+import time
+
+import pytest
+
+from notify_daemon import DaemonNotifier, NotifyDaemon
+
+
+class CaptureNotifier:
+    def __init__(self):
+        self.sent = []
+
+    def send_notification(self, title, message):
+        self.sent.append(title)
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    server = NotifyDaemon(port=0, token_file=str(tmp_path / "notify.token"))
+    server.start_server()
+    yield server
+    server.stop_server()
+
+
+def exchange(port, *lines):
+    with socket.create_connection(("127.0.0.1", port), timeout=2) as sock:
+        sock.sendall("".join(json.dumps(line) + "\n" for line in lines).encode())
+        reader = sock.makefile('r')
+        return json.loads(reader.readline())
+
+
+def test_token_file_is_private(daemon):
+    import os
+    import stat
+    assert stat.S_IMODE(os.stat(daemon.token_file).st_mode) == 0o600
+    assert len(daemon.token) == 32
+
+
+def test_client_without_token_is_rejected(daemon):
+    reply = exchange(daemon.port, {"op": "notify", "id": 1, "title": "x", "message": "y"})
+    assert reply == {"status": "unauthorized"}
+    reply = exchange(daemon.port, {"op": "auth", "token": "0" * 32}, {"op": "ping"})
+    assert reply == {"status": "unauthorized"}
+    assert daemon.inbox.empty()
+
+
+def test_authenticated_client_is_queued(daemon):
+    assert exchange(daemon.port, {"op": "auth", "token": daemon.token}, {"op": "ping"}) == {"status": "pong"}
+    fallback = CaptureNotifier()
+    notifier = DaemonNotifier(port=daemon.port, spawn=False, token_file=daemon.token_file, fallback=fallback)
+    notifier.send_notification("BTC Price Alert", "price")
+    assert daemon.inbox.get_nowait()[1] == "BTC Price Alert"
+    assert fallback.sent == []
+    notifier.close()
+
+
+def test_dead_daemon_is_respawned(tmp_path):
+    token_file = str(tmp_path / "notify.token")
+    probe = socket.socket()
+    probe.bind(("127.0.0.1", 0))
+    port = probe.getsockname()[1]
+    probe.close()
+
+    daemons = []
+    fallback = CaptureNotifier()
+    notifier = DaemonNotifier(port=port, token_file=token_file, fallback=fallback,
+                              respawn_interval=0.0, ack_timeout=2.0)
+
+    def spawn():
+        notifier._spawned_at = time.monotonic()
+        daemon = NotifyDaemon(port=port, token_file=token_file)
+        daemon.start_server()
+        daemons.append(daemon)
+    notifier._spawn_daemon = spawn
+
+    notifier.send_notification("first", "")
+    assert len(daemons) == 1 and daemons[0].inbox.qsize() == 1
+    daemons[0].stop_server()
+    # 服务进程退出时已建立的连接随之断开
+    notifier._sock.shutdown(socket.SHUT_RDWR)
+    # 下一条通知重新启动服务进程，而不是永远退回 fallback
+    deadline = time.monotonic() + 2
+    while notifier._sock is not None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    notifier.send_notification("second", "")
+    assert len(daemons) == 2 and daemons[1].inbox.get_nowait()[1] == "second"
+    assert fallback.sent == []
+    notifier.close()
+    daemons[1].stop_server()
+
+
+def test_respawn_is_rate_limited(tmp_path):
+    fallback = CaptureNotifier()
+    notifier = DaemonNotifier(port=1, token_file=str(tmp_path / "t"), fallback=fallback, respawn_interval=60.0)
+    spawns = []
+
+    def spawn():
+        notifier._spawned_at = time.monotonic()
+        spawns.append(1)
+    notifier._spawn_daemon = spawn
+    notifier._wait_for_daemon = lambda: (_ for _ in ()).throw(OSError("not listening"))
+    notifier.send_notification("a", "")
+    notifier.send_notification("b", "")
+    assert len(spawns) == 1
+    assert fallback.sent == ["a", "b"]
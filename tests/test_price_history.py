@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+
+from price_history import PriceHistory, SymbolHistory
+
+
+def test_append_range_and_ohlc(tmp_path):
+    history = SymbolHistory(str(tmp_path / "BTCUSDT.ticks"))
+    for i, price in enumerate([10.0, 12.0, 9.0, 11.0, 20.0]):
+        history.append(1000 + i * 30, price)
+    assert len(history) == 5
+    assert history.range(1030, 1090)['price'].tolist() == [12.0, 9.0]
+    bars = history.ohlc(60)
+    # 桶按整分钟对齐：[960, 1020) [1020, 1080) [1080, 1140)
+    assert bars['ts'].tolist() == [960_000, 1_020_000, 1_080_000]
+    assert bars['open'].tolist() == [10.0, 12.0, 11.0]
+    assert bars['low'].tolist() == [10.0, 9.0, 11.0]
+    assert bars['count'].tolist() == [1, 2, 2]
+    history.close()
+
+
+def test_reopen_truncates_partial_record(tmp_path):
+    path = str(tmp_path / "BTCUSDT.ticks")
+    history = SymbolHistory(path)
+    history.append(1.0, 100.0)
+    history.append(2.0, 101.0)
+    history.close()
+    with open(path, 'ab') as f:
+        f.write(b'\x01\x02\x03')
+    reopened = SymbolHistory(path)
+    assert len(reopened) == 2
+    assert reopened.view()['price'].tolist() == [100.0, 101.0]
+    reopened.close()
+    assert os.path.getsize(path) == 16 + 2 * 16
+
+
+def test_view_releases_previous_map(tmp_path):
+    history = SymbolHistory(str(tmp_path / "BTCUSDT.ticks"))
+    history.append(1.0, 100.0)
+    view = history.view()
+    first = history._mm
+    history.append(2.0, 101.0)
+    assert len(history.view()) == 2
+    # 旧视图还在用时不能关闭映射，数据仍可读
+    assert view['price'].tolist() == [100.0]
+    del view
+    second = history._mm
+    history.append(3.0, 102.0)
+    history.view()
+    assert second.closed
+    assert first is not second
+    history.close()
+
+
+def test_close_flushes_buffered_ticks(tmp_path):
+    store = PriceHistory(str(tmp_path), flush_every=1000, flush_interval=3600)
+    store.record({"BTCUSDT": 100.0, "ETHUSDT": 0.0}, ts=1.0)
+    store.record({"BTCUSDT": 101.0}, ts=2.0)
+    store.close()
+    reopened = SymbolHistory(str(tmp_path / "BTCUSDT.ticks"))
+    assert np.array_equal(reopened.view()['price'], [100.0, 101.0])
+    assert store.symbols() == ["BTCUSDT"]
+    reopened.close()
@@ -0,0 +1,132 @@
+import time
+import threading
+
+import pytest
+
+from price_stream import BinanceStreamFetcher
+from stand_in_server import StandInStreamServer
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class RecordingFetcher:
+    """resync_fetcher 替身：记录每次 fetch_prices 请求的交易对"""
+    def __init__(self, prices):
+        self.prices = prices
+        self.calls = []
+
+    def fetch_prices(self, symbols=None):
+        self.calls.append(list(symbols))
+        return {s: self.prices[s] for s in symbols if s in self.prices}
+
+
+def mini_ticker(symbol, price, event_time):
+    return {"stream": f"{symbol.lower()}@miniTicker", "data": {"e": "24hrMiniTicker", "E": event_time, "s": symbol,
+                                                               "c": str(price)}}
+
+
+def trade(symbol, price, trade_id, quantity=0.5):
+    return {"stream": f"{symbol.lower()}@trade", "data": {"e": "trade", "E": 1000 + trade_id, "s": symbol,
+                                                          "t": trade_id, "p": str(price), "q": str(quantity)}}
+
+
+@pytest.fixture
+def server():
+    with StandInStreamServer() as stand_in:
+        yield stand_in
+
+
+def start_stream(server, updates, **kwargs):
+    stream = BinanceStreamFetcher(kwargs.pop('symbols', ["BTCUSDT", "ETHUSDT"]), url=server.base_url,
+                                  reconnect_base=0.01, reconnect_cap=0.05, **kwargs)
+    lock = threading.Lock()
+
+    def on_update(*args):
+        with lock:
+            updates.append(args)
+    stream.start(on_update)
+    assert server.wait_connections(1)
+    return stream
+
+
+def test_pushes_reach_callback_and_cache(server):
+    updates = []
+    stream = start_stream(server, updates)
+    try:
+        assert server.paths[0] == "/stream?streams=btcusdt@miniTicker/ethusdt@miniTicker"
+        server.push(mini_ticker("BTCUSDT", 50000.5, 1000))
+        server.push(mini_ticker("ETHUSDT", 3000.25, 1001))
+        assert wait_for(lambda: len(updates) == 2)
+        assert updates[0] == ("BTCUSDT", 50000.5, 1000, 0.0)
+        assert stream.fetch_prices() == {"BTCUSDT": 50000.5, "ETHUSDT": 3000.25}
+    finally:
+        stream.stop()
+
+
+def test_trade_id_gap_is_reported_with_volume(server):
+    updates, gaps = [], []
+    stream = start_stream(server, updates, symbols=["BTCUSDT"], stream="trade",
+                          on_gap=lambda symbol, reason: gaps.append((symbol, reason)))
+    try:
+        for trade_id in (1, 2, 5):
+            server.push(trade("BTCUSDT", 100.0 + trade_id, trade_id, quantity=0.25))
+        assert wait_for(lambda: len(updates) == 3)
+        assert gaps == [("BTCUSDT", "missed trades 3..4")]
+        assert updates[-1][3] == 0.25
+    finally:
+        stream.stop()
+
+
+def test_quiet_mini_ticker_is_not_a_gap_by_default(server):
+    updates, gaps = [], []
+    stream = start_stream(server, updates, on_gap=lambda symbol, reason: gaps.append(symbol))
+    try:
+        server.push(mini_ticker("BTCUSDT", 1.0, 1000))
+        server.push(mini_ticker("BTCUSDT", 2.0, 1000 + 10 * 60 * 1000))
+        assert wait_for(lambda: len(updates) == 2)
+        assert gaps == [] and stream.gap_count == 0
+    finally:
+        stream.stop()
+
+
+def test_reconnect_resyncs_all_symbols_in_one_request(server):
+    updates = []
+    resync = RecordingFetcher({"BTCUSDT": 50001.0, "ETHUSDT": 3001.0})
+    stream = start_stream(server, updates, resync_fetcher=resync)
+    try:
+        server.push(mini_ticker("BTCUSDT", 50000.0, 1000))
+        assert wait_for(lambda: len(updates) == 1)
+        server.drop()
+        assert server.wait_connections(2)
+        assert wait_for(lambda: len(updates) == 3)
+        assert resync.calls == [["BTCUSDT", "ETHUSDT"]]
+        assert stream.gap_count == 2 and stream.reconnect_count == 1
+        assert stream.fetch_prices() == {"BTCUSDT": 50001.0, "ETHUSDT": 3001.0}
+    finally:
+        stream.stop()
+
+
+def test_heartbeat_ping_keeps_quiet_connection(server):
+    stream = start_stream(server, [], heartbeat_timeout=0.1)
+    try:
+        assert wait_for(lambda: server.pings >= 3)
+        assert stream.reconnect_count == 0
+    finally:
+        stream.stop()
+
+
+def test_unanswered_heartbeat_reconnects():
+    with StandInStreamServer(silent=True) as server:
+        stream = start_stream(server, [], heartbeat_timeout=0.1)
+        try:
+            assert server.wait_connections(2)
+            assert stream.reconnect_count >= 1
+        finally:
+            stream.stop()
@@ -0,0 +1,56 @@
+import random
+
+from btc_monitor import TargetPriceStrategy
+from rulebook import ThresholdRuleBook
+
+
+def make_rules(count, seed=1):
+    rng = random.Random(seed)
+    return [TargetPriceStrategy(round(rng.uniform(90, 110), 1), rng.choice(("greater", "less")))
+            for _ in range(count)]
+
+
+def clone(rules):
+    return [TargetPriceStrategy(r.target_price, r.direction, r.symbol) for r in rules]
+
+
+def walk(ticks, seed=2):
+    rng = random.Random(seed)
+    price, prices = 100.0, []
+    for _ in range(ticks):
+        price = min(115.0, max(85.0, price + rng.choice((-1, 1)) * rng.choice((0.0, 0.1, 0.5, 2.0))))
+        prices.append(round(price, 1))
+    return prices
+
+
+def test_matches_per_rule_should_alert():
+    rules = make_rules(500)
+    naive = clone(rules)
+    book = ThresholdRuleBook(rules=rules)
+    for price in walk(2000):
+        fired = {id(r) for r in book.fired_rules(price)}
+        expected = {i for i, r in enumerate(naive) if r.should_alert(price)}
+        assert {i for i, r in enumerate(rules) if id(r) in fired} == expected
+        assert [r.already_alerted for r in rules] == [r.already_alerted for r in naive]
+
+
+def test_rules_added_later_and_removed():
+    book = ThresholdRuleBook(rules=[TargetPriceStrategy(105.0)])
+    assert book.fired_rules(100.0) == []
+    late = TargetPriceStrategy(95.0, "less")
+    book.add(late)
+    # 新规则在下一个 tick 单独评估一次：价格已在触发区也会提醒
+    assert book.fired_rules(94.0) == [late]
+    assert book.remove(late) and len(book) == 1
+    assert book.fired_rules(93.0) == []
+    assert not book.remove(late)
+
+
+def test_armed_distance_skips_fired_rules():
+    low, high = TargetPriceStrategy(101.0), TargetPriceStrategy(104.0)
+    book = ThresholdRuleBook(rules=[low, high, TargetPriceStrategy(90.0, "less")])
+    assert book.armed_distance(100.0) == 0.0        # 还没评估过
+    book.fired_rules(100.0)
+    assert book.armed_distance(100.0) == 1.0
+    assert book.fired_rules(102.0) == [low]
+    assert book.armed_distance(102.0) == 2.0
@@ -0,0 +1,44 @@
+from metrics import STRATEGY_EVAL
+from supervisor import ShardedMonitor, plan_shards
+
+RULES = [
+    {"symbol": "BTCUSDT", "price": 100.0, "direction": "greater"},
+    {"symbol": "BTCUSDT", "price": 50.0, "direction": "less"},
+    {"symbol": "ETHUSDT", "price": 10.0, "direction": "greater"},
+]
+
+
+def fired(alerts):
+    return sorted((a.symbol, a.price) for a in alerts)
+
+
+def test_plan_shards_balances_rule_counts():
+    rules = [{"symbol": "A"}] * 5 + [{"symbol": "B"}] * 2
+    shards = plan_shards(rules, 3)
+    assert sorted(len(s) for s in shards) == [2, 2, 3]
+    assert sorted(i for shard in shards for i in shard) == list(range(7))
+
+
+def test_workers_evaluate_and_metrics_are_recorded_in_parent():
+    app = ShardedMonitor(None, None, RULES, workers=2)
+    try:
+        before = STRATEGY_EVAL.count()
+        assert fired(app.collect_alerts({"BTCUSDT": 120.0, "ETHUSDT": 5.0})) == [("BTCUSDT", 120.0)]
+        assert app.collect_alerts({"BTCUSDT": 130.0, "ETHUSDT": 5.0}) == []
+        assert STRATEGY_EVAL.count() == before + 2
+    finally:
+        app.close()
+
+
+def test_exhausted_restart_budget_falls_back_to_in_process_evaluation():
+    app = ShardedMonitor(None, None, RULES, workers=1, max_restarts=0, tick_timeout=2.0)
+    try:
+        assert fired(app.collect_alerts({"BTCUSDT": 120.0, "ETHUSDT": 5.0})) == [("BTCUSDT", 120.0)]
+        app.workers[0].process.kill()
+        app.workers[0].process.join()
+        # 工作进程全部失败：本轮在主进程内补评估，已提醒过的规则不会重复触发
+        assert fired(app.collect_alerts({"BTCUSDT": 125.0, "ETHUSDT": 11.0})) == [("ETHUSDT", 11.0)]
+        assert app.in_process and app.workers == []
+        assert fired(app.collect_alerts({"BTCUSDT": 40.0, "ETHUSDT": 12.0})) == [("BTCUSDT", 40.0)]
+    finally:
+        app.close()
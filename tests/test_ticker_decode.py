@@ -0,0 +1,47 @@
+import json
+
+import ticker_decode
+from ticker_decode import TickerDecoder
+
+TICKERS = [
+    {"symbol": "BTC", "price": "1.00000000"},
+    {"symbol": "BTCUSDT", "price": "60000.50000000"},
+    {"symbol": "ETHUSDT", "price": "3000.25000000"},
+    {"symbol": "币安人生USDT", "price": "0.12340000"},
+    {"symbol": "XRPUSDT", "price": "0.50000000"},
+]
+
+
+def body(ensure_ascii=False):
+    return json.dumps(TICKERS, ensure_ascii=ensure_ascii, separators=(',', ':')).encode('utf-8')
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def test_decodes_only_watched_symbols_across_chunk_boundaries():
+    decoder = TickerDecoder(["ETHUSDT", "BTCUSDT", "DOGEUSDT"])
+    data = body()
+    for size in (7, 64, len(data)):
+        assert decoder.decode(chunked(data, size)).tolist() == [3000.25, 60000.5, 0.0]
+    assert decoder.decode_dict([data]) == {"ETHUSDT": 3000.25, "BTCUSDT": 60000.5}
+
+
+def test_prefix_symbols_are_told_apart():
+    decoder = TickerDecoder(["BTC", "BTCUSDT"])
+    assert decoder.decode([body()]).tolist() == [1.0, 60000.5]
+
+
+def test_non_ascii_symbols_match_raw_and_escaped_json():
+    decoder = TickerDecoder(["币安人生USDT", "BTCUSDT"])
+    expected = {"币安人生USDT": 0.1234, "BTCUSDT": 60000.5}
+    # 多字节字符被切在块边界上也能拼回
+    assert decoder.decode_dict(chunked(body(), 5)) == expected
+    assert decoder.decode_dict(chunked(body(ensure_ascii=True), 5)) == expected
+
+
+def test_generic_pattern_above_trie_limit(monkeypatch):
+    monkeypatch.setattr(ticker_decode, "TRIE_LIMIT", 1)
+    decoder = TickerDecoder(["币安人生USDT", "XRPUSDT"])
+    assert decoder.decode_dict(chunked(body(), 11)) == {"币安人生USDT": 0.1234, "XRPUSDT": 0.5}
@@ -0,0 +1,84 @@
+"""
+行情列表的流式过滤解码 - 全量 /api/v3/ticker/price 响应有数千条，而我们只关心其中的订阅交易对
+- 按块读取响应正文（iter_content），不在内存里拼出完整正文，也不为每一条构造 dict / str
+- 每块用一个预编译的字节正则扫描：订阅的交易对按前缀树编进正则，
+  其余条目在正则引擎（C 层）里读到第一个不匹配的字符就被跳过；
+  订阅非常多时前缀树不再划算，改为匹配所有条目再按字节串查下标
+- 价格直接写入预分配的 float64 数组（未出现的交易对为 0），解码器可在每轮轮询间复用
+- 块边界上被截断的条目留到下一块拼接
+"""
+import re
+import json
+from typing import Dict, Iterable, Sequence
+
+import numpy as np
+
+# 订阅交易对不超过该数量时编成前缀树正则；再多时通用匹配 + 查表更快
+TRIE_LIMIT = 256
+CHUNK_SIZE = 64 * 1024
+
+_ENTRY = rb'"symbol"\s*:\s*"(%s)"\s*,\s*"price"\s*:\s*"([^"]+)"'
+
+
+def trie_pattern(words: Iterable[bytes]) -> bytes:
+    """
+    把一组字节串编成前缀树形式的正则（BTCUSDT|BTCFDUSD -> BTC(?:USDT|FDUSD)）。
+    re 的分支是逐个尝试的，前缀树让每个条目最多比较到第一个不同的字符。
+    """
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for byte in word:
+            node = node.setdefault(byte, {})
+        node[None] = None
+
+    def build(node: dict) -> bytes:
+        branches = [re.escape(bytes([byte])) + build(child)
+                    for byte, child in sorted((k, v) for k, v in node.items() if k is not None)]
+        if not branches:
+            return b''
+        body = branches[0] if len(branches) == 1 else b'(?:' + b'|'.join(branches) + b')'
+        # 某个词是另一个词的前缀（BTC 与 BTCUSDT）：这一段可以不出现
+        return b'(?:' + body + b')?' if None in node else body
+
+    return build(trie)
+
+
+class TickerDecoder:
+    """把 [{"symbol": ..., "price": ...}, ...] 中订阅交易对的价格解码进 prices 数组（与 symbols 顺序一致）"""
+    def __init__(self, symbols: Sequence[str]):
+        self.symbols = list(symbols)
+        self.prices = np.zeros(len(self.symbols), dtype=np.float64)
+        # 与 JSON 正文的字节一致：交易对名按 UTF-8 编码（币安有非 ASCII 名称的交易对），
+        # 服务端把它们转义成 \uXXXX 时也能匹配
+        self._slots: Dict[bytes, int] = {}
+        for i, symbol in enumerate(self.symbols):
+            self._slots[symbol.encode('utf-8')] = i
+            self._slots.setdefault(json.dumps(symbol)[1:-1].encode('ascii'), i)
+        if len(self._slots) <= TRIE_LIMIT:
+            self._pattern = re.compile(_ENTRY % trie_pattern(self._slots))
+        else:
+            self._pattern = re.compile(_ENTRY % rb'[^"]+')
+
+    def decode(self, chunks: Iterable[bytes]) -> np.ndarray:
+        """逐块解码一份响应；返回的是内部数组，下一次 decode 会覆盖"""
+        prices = self.prices
+        prices.fill(0.0)
+        slots = self._slots
+        findall = self._pattern.findall
+        tail = b""
+        for chunk in chunks:
+            buffer = tail + chunk if tail else chunk
+            # 只扫描到最后一个完整条目，剩下的半条留给下一块
+            end = buffer.rfind(b'}') + 1
+            for symbol, price in findall(buffer, 0, end):
+                slot = slots.get(symbol)
+                if slot is not None:
+                    prices[slot] = float(price)
+            tail = buffer[end:]
+        return prices
+
+    def decode_dict(self, chunks: Iterable[bytes]) -> Dict[str, float]:
+        """decode 后转成 symbol -> price（只含出现在响应里的交易对）"""
+        prices = self.decode(chunks).tolist()
+        return {symbol: price for symbol, price in zip(self.symbols, prices) if price > 0}
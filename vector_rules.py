@@ -0,0 +1,255 @@
+"""
+向量化指标规则 - 多个交易对的涨跌幅、均线交叉、波动带提醒，每份快照一次 NumPy 批量评估
+- 所有交易对的最近价格保存在预分配的环形矩阵 ring[capacity, 交易对] 中，每份快照写入一行；
+  快照里缺失的交易对沿用上一个价格，因此窗口长度以快照数（检查次数）计
+- 每个用到的窗口长度维护一组按交易对的滚动和 / 平方和，每行只做一次"加新减旧"，
+  每写满一圈从环形矩阵重新精确求和，消除浮点累积误差
+- 同一类规则的参数与状态保存为并列数组，一次布尔运算得到全部触发的规则，
+  Python 循环只发生在真正触发的规则上
+触发语义与 TargetPriceStrategy 一致：条件成立时提醒一次，条件不成立后重新武装；
+均线交叉只在交叉发生时提醒，数据刚攒够窗口时已处于交叉后状态的不提醒。
+配置：{"indicators": [{"symbol": "BTCUSDT", "type": "change", "window": 12, "threshold": 3}, ...]}
+"""
+import math
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from btc_monitor import DEFAULT_SYMBOL, Alert, asset_name
+
+INDICATOR_KINDS = ("change", "ma_cross", "band")
+
+
+class IndicatorRule(NamedTuple):
+    """
+    一条指标规则，状态由 IndicatorEngine 保存。
+    - change：window 次检查内涨跌幅达到 threshold%（greater 为涨、less 为跌）
+    - ma_cross：fast 期均线上穿（greater）/ 下穿（less）window 期均线
+    - band：价格突破 window 期均值 ± threshold 倍标准差（greater 为上轨、less 为下轨）
+    """
+    symbol: str
+    kind: str
+    direction: str = "greater"
+    window: int = 20
+    fast: int = 0
+    threshold: float = 0.0
+
+
+def normalize_indicator(item: dict) -> dict:
+    """校验并规范化一条指标规则配置，格式错误时抛出 ValueError"""
+    kind = item.get("type")
+    if kind not in INDICATOR_KINDS:
+        raise ValueError(f"indicator type must be one of {INDICATOR_KINDS}: {item}")
+    direction = item.get("direction", "greater")
+    if direction not in ("greater", "less"):
+        raise ValueError(f"indicator direction must be 'greater' or 'less': {item}")
+    window = int(item.get("window", 20))
+    fast = int(item.get("fast", 0)) if kind == "ma_cross" else 0
+    threshold = float(item.get("threshold", 2.0 if kind == "band" else 0.0))
+    if window < 1:
+        raise ValueError(f"indicator window must be at least 1: {item}")
+    if kind == "ma_cross" and not 1 <= fast < window:
+        raise ValueError(f"ma_cross needs 1 <= fast < window: {item}")
+    if kind == "band" and window < 2:
+        raise ValueError(f"band window must be at least 2: {item}")
+    if kind != "ma_cross" and threshold <= 0:
+        raise ValueError(f"indicator threshold must be positive: {item}")
+    normalized = {"symbol": item.get("symbol", DEFAULT_SYMBOL).upper(), "type": kind,
+                  "direction": direction, "window": window, "threshold": threshold}
+    if kind == "ma_cross":
+        normalized["fast"] = fast
+        del normalized["threshold"]
+    return normalized
+
+
+def rule_from_config(item: dict) -> IndicatorRule:
+    item = normalize_indicator(item)
+    return IndicatorRule(item["symbol"], item["type"], item["direction"], item["window"],
+                         item.get("fast", 0), item.get("threshold", 0.0))
+
+
+class _RuleGroup:
+    """同一类规则的并列数组"""
+    def __init__(self, engine: "IndicatorEngine", ids: List[int]):
+        rules = [engine.rules[i] for i in ids]
+        self.ids = np.array(ids, dtype=np.intp)
+        self.sym = np.array([engine._index[r.symbol] for r in rules], dtype=np.intp)
+        self.greater = np.array([r.direction == "greater" for r in rules], dtype=bool)
+        self.window = np.array([r.window for r in rules], dtype=np.intp)
+        self.slot = np.array([engine._slot.get(r.window, 0) for r in rules], dtype=np.intp)
+        self.fast_slot = np.array([engine._slot.get(r.fast, 0) for r in rules], dtype=np.intp)
+        self.threshold = np.array([r.threshold for r in rules], dtype=np.float64)
+        self.alerted = np.zeros(len(rules), dtype=bool)
+        self.primed = np.zeros(len(rules), dtype=bool)
+
+
+class IndicatorEngine:
+    """
+    可直接作为 MonitorApp 的策略：实现 fired_alerts(snapshot) 整份快照批量接口。
+    capacity 为环形矩阵行数，默认取规则需要的最长回看长度。
+    """
+    def __init__(self, rules: Iterable[IndicatorRule], capacity: Optional[int] = None):
+        self.rules: List[IndicatorRule] = list(rules)
+        for rule in self.rules:
+            if rule.kind not in INDICATOR_KINDS:
+                raise ValueError(f"Unknown indicator kind: {rule.kind}")
+        self.symbols = list(dict.fromkeys(r.symbol for r in self.rules))
+        self._index = {s: i for i, s in enumerate(self.symbols)}
+        # 涨跌幅要和 window 次之前的价格比较，需要 window + 1 行
+        needed = max([r.window + (r.kind == "change") for r in self.rules], default=1)
+        self.capacity = max(needed, capacity or 0)
+        windows = sorted({r.window for r in self.rules if r.kind != "change"}
+                         | {r.fast for r in self.rules if r.kind == "ma_cross"})
+        self.windows = np.array(windows, dtype=np.intp)
+        self._slot = {w: i for i, w in enumerate(windows)}
+
+        n = len(self.symbols)
+        self.ring = np.zeros((self.capacity, n), dtype=np.float64)
+        self.last = np.zeros(n, dtype=np.float64)        # 各交易对最近一个有效价格
+        self.filled = np.zeros(n, dtype=np.int64)        # 首个有效价格以来写入的行数
+        self.rows = 0
+        # 滚动和基于 (价格 - ref)，ref 取重新求和时的价格，避免平方和的大数相消
+        self.ref = np.zeros(n, dtype=np.float64)
+        self.sums = np.zeros((len(windows), n), dtype=np.float64)
+        self.squares = np.zeros((len(windows), n), dtype=np.float64)
+        self._groups: Dict[str, _RuleGroup] = {}
+        for kind in INDICATOR_KINDS:
+            ids = [i for i, r in enumerate(self.rules) if r.kind == kind]
+            if ids:
+                self._groups[kind] = _RuleGroup(self, ids)
+
+    @classmethod
+    def from_config(cls, items: Sequence[dict], capacity: Optional[int] = None) -> "IndicatorEngine":
+        return cls([rule_from_config(item) for item in items], capacity)
+
+    # ---------- 写入 ----------
+
+    def update(self, snapshot: Dict[str, float]) -> np.ndarray:
+        """写入一行价格并更新滚动和，返回本份快照中有有效价格的交易对掩码"""
+        n = len(self.symbols)
+        prices = np.fromiter((snapshot.get(s, 0.0) for s in self.symbols), dtype=np.float64, count=n)
+        present = prices > 0
+        first = present & (self.filled == 0)
+        if first.any():
+            # 首个价格填满整列：滚出窗口的行与新行同值，滚动和保持为 0
+            self.ring[:, first] = prices[first]
+            self.ref[first] = prices[first]
+            self.sums[:, first] = 0.0
+            self.squares[:, first] = 0.0
+        np.copyto(self.last, prices, where=present)
+
+        head = self.rows % self.capacity
+        if len(self.windows):
+            new = self.last - self.ref
+            old = self.ring[(head - self.windows) % self.capacity] - self.ref
+            self.sums += new - old
+            self.squares += new * new - old * old
+        self.ring[head] = self.last
+        self.rows += 1
+        self.filled[(self.filled > 0) | first] += 1
+        if self.rows % self.capacity == 0:
+            self._resync()
+        return present
+
+    def _resync(self) -> None:
+        """从环形矩阵重新精确计算所有窗口的滚动和"""
+        self.ref = self.last.copy()
+        newest = (self.rows - 1) % self.capacity
+        for slot, window in enumerate(self.windows.tolist()):
+            rows = self.ring[(newest - np.arange(window)) % self.capacity] - self.ref
+            self.sums[slot] = rows.sum(axis=0)
+            self.squares[slot] = (rows * rows).sum(axis=0)
+
+    def mean(self, window: int) -> np.ndarray:
+        """各交易对最近 window 行的均值（window 须为规则用到的窗口）"""
+        return self.ref + self.sums[self._slot[window]] / window
+
+    def std(self, window: int) -> np.ndarray:
+        slot = self._slot[window]
+        mean = self.sums[slot] / window
+        return np.sqrt(np.maximum(self.squares[slot] / window - mean * mean, 0.0))
+
+    # ---------- 评估 ----------
+
+    def evaluate(self, snapshot: Dict[str, float]) -> List[tuple]:
+        """写入快照并评估全部规则，返回触发的 (规则, 当前价, 指标值...)"""
+        if not self.rules:
+            return []
+        present = self.update(snapshot)
+        fired = []
+        for kind, group in self._groups.items():
+            fired.extend(getattr(self, f"_eval_{kind}")(group, present))
+        return fired
+
+    def _settle(self, group: _RuleGroup, evaluated: np.ndarray, condition: np.ndarray,
+                edge: bool = False) -> np.ndarray:
+        """按 already_alerted 语义更新状态，返回触发的组内下标"""
+        fire = evaluated & condition & ~group.alerted
+        if edge:
+            fire &= group.primed
+            group.primed |= evaluated
+        group.alerted = np.where(evaluated, condition, group.alerted)
+        return np.flatnonzero(fire)
+
+    def _eval_change(self, group: _RuleGroup, present: np.ndarray):
+        newest = (self.rows - 1) % self.capacity
+        old = self.ring[(newest - group.window) % self.capacity, group.sym]
+        current = self.last[group.sym]
+        change = (current / np.where(old > 0, old, np.nan) - 1.0) * 100.0
+        evaluated = present[group.sym] & (self.filled[group.sym] > group.window) & (old > 0)
+        with np.errstate(invalid='ignore'):
+            condition = np.where(group.greater, change >= group.threshold, change <= -group.threshold)
+        return self._fired(group, self._settle(group, evaluated, condition), current, change)
+
+    def _eval_ma_cross(self, group: _RuleGroup, present: np.ndarray):
+        means = self.ref + self.sums / self.windows[:, None]
+        fast = means[group.fast_slot, group.sym]
+        slow = means[group.slot, group.sym]
+        evaluated = present[group.sym] & (self.filled[group.sym] >= group.window)
+        condition = np.where(group.greater, fast > slow, fast < slow)
+        current = self.last[group.sym]
+        return self._fired(group, self._settle(group, evaluated, condition, edge=True), current, fast, slow)
+
+    def _eval_band(self, group: _RuleGroup, present: np.ndarray):
+        windows = group.window.astype(np.float64)
+        offset = self.sums[group.slot, group.sym] / windows
+        std = np.sqrt(np.maximum(self.squares[group.slot, group.sym] / windows - offset * offset, 0.0))
+        mean = self.ref[group.sym] + offset
+        current = self.last[group.sym]
+        bound = np.where(group.greater, mean + group.threshold * std, mean - group.threshold * std)
+        # 价格完全不动时标准差只剩舍入误差，不算突破
+        evaluated = present[group.sym] & (self.filled[group.sym] >= group.window) & (std > current * 1e-9)
+        condition = np.where(group.greater, current > bound, current < bound)
+        return self._fired(group, self._settle(group, evaluated, condition), current, bound)
+
+    def _fired(self, group: _RuleGroup, index: np.ndarray, *columns: np.ndarray) -> List[tuple]:
+        """只对触发的规则取值并转成 Python 对象，一列一次 tolist()"""
+        if not len(index):
+            return []
+        rules = [self.rules[i] for i in group.ids[index].tolist()]
+        return list(zip(rules, *(column[index].tolist() for column in columns)))
+
+    def fired_alerts(self, snapshot: Dict[str, float], observed_at: float = 0.0) -> List[Alert]:
+        return [build_indicator_alert(rule, price, *values, observed_at=observed_at)
+                for rule, price, *values in self.evaluate(snapshot)]
+
+
+def build_indicator_alert(rule: IndicatorRule, price: float, *values: float, observed_at: float = 0.0) -> Alert:
+    asset = asset_name(rule.symbol)
+    if rule.kind == "change":
+        word = "涨幅" if rule.direction == "greater" else "跌幅"
+        msg = (f"{asset} {rule.window} 次检查内{word}已达 {values[0]:+.2f}%（设定 {rule.threshold:g}%）\n"
+               f"当前价格: ${price}")
+    elif rule.kind == "ma_cross":
+        word = "上穿" if rule.direction == "greater" else "下穿"
+        msg = (f"{asset} MA{rule.fast} {word} MA{rule.window}: {_fmt(values[0])} / {_fmt(values[1])}\n"
+               f"当前价格: ${price}")
+    else:
+        word = "上轨" if rule.direction == "greater" else "下轨"
+        msg = (f"{asset} 价格突破波动带{word}（MA{rule.window} {'+' if rule.direction == 'greater' else '-'}"
+               f" {rule.threshold:g}σ = {_fmt(values[0])}）\n当前价格: ${price}")
+    return Alert(rule.symbol, price, f"{asset} Indicator Alert", msg, rule, observed_at)
+
+
+def _fmt(value: float) -> str:
+    return f"${value:.2f}" if math.isfinite(value) else "n/a"